@@ -1,6 +1,12 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
-from .models import Achievement, UserAchievement, User, UserProgress, Trick, AchievementType
+from .models import Achievement, UserAchievement, User, UserProgress, AchievementType, UserStats
+from .events import broker, user_channel, mark_leaderboard_dirty
+from .read_models import LeaderboardRow, load_user_achievements
+from .user_stats_service import UserStatsService
+from .learned_sets import LearnedSetService, catalog_masks
+from .leaderboards import LeaderboardService
+from .sync import record_changes
 from typing import List, Optional
 import json
 from datetime import datetime, timedelta
@@ -170,17 +176,21 @@ class AchievementsService:
         all_achievements = self.db.query(Achievement).filter(Achievement.is_active == True).all()
         
         # Получаем уже полученные достижения пользователя
-        earned_achievement_ids = set(
-            self.db.query(UserAchievement.achievement_id)
+        earned_achievement_ids = {
+            row.achievement_id
+            for row in self.db.query(UserAchievement.achievement_id)
             .filter(UserAchievement.user_id == user_id)
-            .scalar_subquery()
-        )
+        }
+
+        stats_service = UserStatsService(self.db)
+        stats = stats_service.get(user_id)
+        learned, _ = LearnedSetService(self.db).get(user_id)
 
         for achievement in all_achievements:
             if achievement.id in earned_achievement_ids:
                 continue  # Уже получено
 
-            if self._check_achievement_condition(user_id, achievement):
+            if self._check_achievement_condition(user_id, achievement, stats, learned):
                 # Выдаем достижение
                 user_achievement = UserAchievement(
                     user_id=user_id,
@@ -190,37 +200,54 @@ class AchievementsService:
                 new_achievements.append(achievement)
 
         if new_achievements:
+            # Счетчики меняются в той же транзакции, что и выдача
+            earned_points = sum(ach.points for ach in new_achievements)
+            stats_service.increment(
+                user_id,
+                achievements_count=len(new_achievements),
+                total_points=earned_points
+            )
+            LeaderboardService(self.db).record_achievements(user_id, earned_points, len(new_achievements))
+            record_changes(self.db, "achievement", [ach.id for ach in new_achievements], user_id=user_id)
             self.db.commit()
+            broker.publish(user_channel(user_id), "achievements", [
+                {
+                    "name": ach.name,
+                    "description": ach.description,
+                    "icon": ach.icon,
+                    "points": ach.points
+                }
+                for ach in new_achievements
+            ])
+            mark_leaderboard_dirty()
 
         return new_achievements
 
-    def _check_achievement_condition(self, user_id: int, achievement: Achievement) -> bool:
+    def _check_achievement_condition(self, user_id: int, achievement: Achievement, stats=None,
+                                     learned: Optional[int] = None) -> bool:
         """Проверяет выполнение условия достижения"""
         condition_type = achievement.condition_type
         condition_value = achievement.condition_value
         condition_data = json.loads(achievement.condition_data) if achievement.condition_data else {}
 
+        if stats is None:
+            stats = UserStatsService(self.db).get(user_id)
+
         if condition_type == "tricks_learned":
-            learned_count = self.db.query(UserProgress).filter(UserProgress.user_id == user_id).count()
-            return learned_count >= condition_value
+            return stats.learned_count >= condition_value
 
         elif condition_type == "category_mastered":
             category = condition_data.get("category")
             if not category:
                 return False
             
-            # Получаем все трюки в категории
-            total_in_category = self.db.query(Trick).filter(Trick.category == category).count()
-            if total_in_category == 0:
+            # Категория освоена, если все биты ее маски есть в карте изученных
+            mask = catalog_masks(self.db).category(category)
+            if not mask:
                 return False
-            
-            # Получаем изученные трюки в категории
-            learned_in_category = self.db.query(UserProgress).join(Trick).filter(
-                UserProgress.user_id == user_id,
-                Trick.category == category
-            ).count()
-            
-            return learned_in_category == total_in_category
+            if learned is None:
+                learned, _ = LearnedSetService(self.db).get(user_id)
+            return learned & mask == mask
 
         elif condition_type == "daily_streak":
             # Проверяем количество дней подряд с изученными трюками
@@ -228,11 +255,7 @@ class AchievementsService:
             return streak_days >= condition_value
 
         elif condition_type == "tricks_suggested":
-            from .models import TrickSuggestion
-            suggested_count = self.db.query(TrickSuggestion).filter(
-                TrickSuggestion.suggested_by == user_id
-            ).count()
-            return suggested_count >= condition_value
+            return stats.suggestions_count >= condition_value
 
         return False
 
@@ -266,44 +289,49 @@ class AchievementsService:
 
     def get_user_achievements(self, user_id: int) -> dict:
         """Получает все достижения пользователя с статистикой"""
-        user_achievements = self.db.query(UserAchievement).filter(
-            UserAchievement.user_id == user_id
-        ).join(Achievement).order_by(UserAchievement.earned_at.desc()).all()
-
-        total_points = sum(ua.achievement.points for ua in user_achievements)
+        user_achievements = load_user_achievements(self.db, user_id)
+        stats = UserStatsService(self.db).get(user_id)
         
         return {
-            "total_points": total_points,
-            "achievements_count": len(user_achievements),
+            "total_points": stats.total_points,
+            "achievements_count": stats.achievements_count,
             "achievements": user_achievements,
             "recent_achievements": user_achievements[:5]  # Последние 5
         }
 
-    def get_leaderboard(self, limit: int = 10) -> List[dict]:
-        """Получает топ пользователей по очкам"""
-        # Подсчитываем очки для каждого пользователя
+    def get_leaderboard(self, limit: int = 10, window: str = "all",
+                        category: Optional[str] = None) -> List[LeaderboardRow]:
+        """Получает топ пользователей по очкам (за все время, неделю, месяц или по категории)"""
+        if window != "all" or category:
+            return LeaderboardService(self.db).top(window, category, limit)
+
+        # Очки уже посчитаны в user_stats: top-N по индексу без агрегации
         user_points = self.db.query(
             User.id,
             User.username,
-            func.coalesce(func.sum(Achievement.points), 0).label('total_points'),
-            func.count(UserAchievement.id).label('achievements_count')
-        ).outerjoin(
-            UserAchievement, User.id == UserAchievement.user_id
-        ).outerjoin(
-            Achievement, UserAchievement.achievement_id == Achievement.id
-        ).group_by(
-            User.id, User.username
+            UserStats.total_points,
+            UserStats.achievements_count,
+            UserStats.learned_count
+        ).join(
+            UserStats, UserStats.user_id == User.id
         ).order_by(
-            func.coalesce(func.sum(Achievement.points), 0).desc()
+            UserStats.total_points.desc(), User.id
         ).limit(limit).all()
 
         return [
-            {
-                "user_id": row.id,
-                "username": row.username,
-                "total_points": int(row.total_points),
-                "achievements_count": row.achievements_count,
-                "rank": idx + 1
-            }
+            LeaderboardRow(row.id, row.username, row.total_points, row.achievements_count, idx + 1, row.learned_count)
             for idx, row in enumerate(user_points)
         ]
+
+    def get_user_rank(self, user_id: int) -> dict:
+        """Место пользователя в лидерборде (тот же порядок: очки по убыванию, затем id)"""
+        stats = UserStatsService(self.db).get(user_id)
+        ahead = self.db.query(func.count(UserStats.user_id)).filter(
+            (UserStats.total_points > stats.total_points) |
+            ((UserStats.total_points == stats.total_points) & (UserStats.user_id < user_id))
+        ).scalar()
+        return {
+            "rank": ahead + 1,
+            "total_points": stats.total_points,
+            "achievements_count": stats.achievements_count
+        }
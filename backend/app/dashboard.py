@@ -0,0 +1,37 @@
+"""Сводный ответ для страниц прогресса и достижений: одна авторизация и один
+запрос вместо четырех-пяти с мобильной сети.
+
+Разделы выполняются по очереди на одной сессии: сессия SQLAlchemy не
+потокобезопасна, а каждый раздел - выборка по первичному ключу или индексу
+(user_stats, user_learned_sets), так что параллельный запуск на отдельных
+соединениях съел бы больше, чем сэкономил.
+"""
+from typing import Callable, Dict, Iterable, List
+
+from sqlalchemy.orm import Session
+
+from .achievements_service import AchievementsService
+from .learned_sets import LearnedSetService
+from .read_models import load_active_achievements, load_learned_tricks
+
+DASHBOARD_SECTIONS: Dict[str, Callable[[Session, int], object]] = {
+    "stats": lambda db, user_id: LearnedSetService(db).progress_stats(user_id),
+    "learned": load_learned_tricks,
+    "achievements": lambda db, user_id: AchievementsService(db).get_user_achievements(user_id),
+    "all_achievements": lambda db, user_id: load_active_achievements(db),
+    "rank": lambda db, user_id: AchievementsService(db).get_user_rank(user_id),
+}
+DEFAULT_SECTIONS = "stats,learned,achievements,rank"
+
+
+def parse_sections(include: str) -> List[str]:
+    """Список разделов из ?include=a,b; неизвестные имена - ValueError"""
+    sections = list(dict.fromkeys(name.strip() for name in include.split(",") if name.strip()))
+    unknown = [name for name in sections if name not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise ValueError(", ".join(unknown))
+    return sections
+
+
+def build_dashboard(db: Session, user_id: int, sections: Iterable[str]) -> dict:
+    return {name: DASHBOARD_SECTIONS[name](db, user_id) for name in sections}
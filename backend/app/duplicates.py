@@ -0,0 +1,187 @@
+"""Поиск похожих трюков и предложений (возможных дубликатов).
+
+Название и описание нормализуются и режутся на символьные n-граммы, по ним
+считается MinHash-подпись. Подписи разбиты на полосы (LSH): кандидаты -
+записи, совпавшие хотя бы в одной полосе, поэтому поиск не сравнивает
+предложение со всем каталогом. Кандидаты проверяются точным коэффициентом
+Жаккара по названию и по тексту целиком.
+
+Индекс живет в памяти воркера: строится одним запросом по каталогу и
+ожидающим предложениям, обновляется при изменениях в этом воркере и
+перестраивается раз в DUPLICATE_INDEX_TTL секунд, чтобы увидеть остальные.
+"""
+import os
+import re
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .models import SuggestionStatus, Trick, TrickSuggestion
+
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.6"))
+DUPLICATE_INDEX_TTL = float(os.getenv("DUPLICATE_INDEX_TTL", "300"))
+NUM_HASHES = 60
+BANDS = 20           # 3 строки в полосе: при сходстве 0.6 кандидат находится с вероятностью 99%
+NAME_NGRAM = 3
+TEXT_NGRAM = 5
+MAX_RESULTS = 5
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240101)
+_A = _rng.integers(1, _PRIME, NUM_HASHES, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_HASHES, dtype=np.uint64)
+_NON_WORD = re.compile(r"[^\w]+")
+
+Key = Tuple[str, int]  # ("trick" | "suggestion", id)
+
+
+def normalize(text: Optional[str]) -> str:
+    return _NON_WORD.sub(" ", (text or "").lower().replace("ё", "е")).strip()
+
+
+def shingles(text: str, size: int) -> FrozenSet[int]:
+    """Хэши символьных n-грамм (с пробелами по краям, чтобы короткие слова тоже давали n-граммы)"""
+    padded = f" {text} "
+    return frozenset(
+        zlib.crc32(padded[i:i + size].encode("utf-8"))
+        for i in range(max(len(padded) - size + 1, 1))
+    )
+
+
+def minhash(values: FrozenSet[int]) -> np.ndarray:
+    x = np.fromiter(values, np.uint64, len(values))
+    return ((_A[:, None] * x[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def _bands(signature: np.ndarray) -> List[bytes]:
+    # Значения меньше 2^31 - хватает 4 байт; срезы bytes заметно быстрее np.split
+    raw = signature.astype(np.uint32).tobytes()
+    step = len(raw) // BANDS
+    return [raw[i:i + step] for i in range(0, len(raw), step)]
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass(frozen=True)
+class Entry:
+    name: str
+    name_shingles: FrozenSet[int]
+    text_shingles: FrozenSet[int]
+    name_bands: List[bytes]
+    text_bands: List[bytes]
+
+
+def make_entry(name: str, description: Optional[str]) -> Entry:
+    normalized_name = normalize(name)
+    name_shingles = shingles(normalized_name, NAME_NGRAM)
+    text_shingles = shingles(f"{normalized_name} {normalize(description)}", TEXT_NGRAM)
+    return Entry(name, name_shingles, text_shingles, _bands(minhash(name_shingles)), _bands(minhash(text_shingles)))
+
+
+class DuplicateIndex:
+    def __init__(self):
+        self.entries: Dict[Key, Entry] = {}
+        self.buckets: Dict[Tuple[str, int, bytes], Set[Key]] = {}
+        self.built_at = time.monotonic()
+
+    def _bucket_keys(self, entry: Entry):
+        for band, value in enumerate(entry.name_bands):
+            yield ("name", band, value)
+        for band, value in enumerate(entry.text_bands):
+            yield ("text", band, value)
+
+    def add(self, key: Key, name: str, description: Optional[str]) -> None:
+        self.remove(key)
+        entry = make_entry(name, description)
+        self.entries[key] = entry
+        for bucket in self._bucket_keys(entry):
+            self.buckets.setdefault(bucket, set()).add(key)
+
+    def remove(self, key: Key) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for bucket in self._bucket_keys(entry):
+            keys = self.buckets.get(bucket)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.buckets[bucket]
+
+    def find(self, name: str, description: Optional[str], exclude: Optional[Key] = None,
+             limit: int = MAX_RESULTS, threshold: float = DUPLICATE_THRESHOLD) -> List[dict]:
+        """Похожие записи по убыванию сходства: максимум из сходства названий и текстов"""
+        probe = make_entry(name, description)
+        candidates: Set[Key] = set()
+        for bucket in self._bucket_keys(probe):
+            candidates.update(self.buckets.get(bucket, ()))
+        candidates.discard(exclude)
+
+        matches = []
+        for key in candidates:
+            entry = self.entries[key]
+            score = max(
+                jaccard(probe.name_shingles, entry.name_shingles),
+                jaccard(probe.text_shingles, entry.text_shingles)
+            )
+            if score >= threshold:
+                matches.append({"type": key[0], "id": key[1], "name": entry.name, "score": round(score, 3)})
+        matches.sort(key=lambda match: (-match["score"], match["type"], match["id"]))
+        return matches[:limit]
+
+
+def build_index(db: Session) -> DuplicateIndex:
+    """Индекс по каталогу и ожидающим модерации предложениям"""
+    index = DuplicateIndex()
+    for trick_id, name, description in db.execute(select(Trick.id, Trick.name, Trick.description)):
+        index.add(("trick", trick_id), name, description)
+    pending = select(TrickSuggestion.id, TrickSuggestion.name, TrickSuggestion.description).where(
+        TrickSuggestion.status == SuggestionStatus.PENDING
+    )
+    for suggestion_id, name, description in db.execute(pending):
+        index.add(("suggestion", suggestion_id), name, description)
+    return index
+
+
+_index: Optional[DuplicateIndex] = None
+
+
+def duplicate_index(db: Session) -> DuplicateIndex:
+    global _index
+    index = _index
+    if index is None or time.monotonic() - index.built_at >= DUPLICATE_INDEX_TTL:
+        index = build_index(db)
+        _index = index
+    return index
+
+
+def index_trick(trick_id: int, name: str, description: Optional[str]) -> None:
+    """Добавляет или обновляет трюк в уже построенном индексе (без индекса - ничего не делает)"""
+    if _index is not None:
+        _index.add(("trick", trick_id), name, description)
+
+
+def index_suggestion(suggestion_id: int, name: str, description: Optional[str]) -> None:
+    if _index is not None:
+        _index.add(("suggestion", suggestion_id), name, description)
+
+
+def forget(kind: str, item_id: int) -> None:
+    """Убирает трюк или предложение (удаленное или уже отмодерированное)"""
+    if _index is not None:
+        _index.remove((kind, item_id))
+
+
+def reset_index() -> None:
+    """Сбрасывает индекс целиком (после массовых изменений), следующий поиск построит его заново"""
+    global _index
+    _index = None
@@ -0,0 +1,128 @@
+"""Заголовки общего кэша (nginx proxy_cache, CDN) для гостевых GET-запросов.
+
+Эндпоинты каталога помечаются зависимостью edge_cache("ключ", ...). Ответ
+гостю (запрос без Authorization) получает Cache-Control: public, s-maxage и
+Surrogate-Key, ответ вошедшему пользователю - private; в обоих Vary:
+Authorization. nginx (nginx/conf.d/api_cache.conf) кэширует только первые,
+так что гостевой трафик каталога до uvicorn не доходит.
+
+После изменений каталога purge() перезапрашивает затронутые URL через
+служебный server nginx (EDGE_CACHE_PURGE_URL): он всегда ходит в бэкенд и
+перезаписывает запись кэша свежим ответом. Ключи из Surrogate-Key
+соответствуют группам URL в _urls(); для CDN с purge по ключам их можно
+отправлять как есть.
+"""
+import json
+import os
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import List, Set
+
+from fastapi import Request
+from starlette.datastructures import Headers, MutableHeaders
+
+EDGE_CACHE_SECONDS = int(os.getenv("EDGE_CACHE_SECONDS", "300"))
+EDGE_CACHE_PURGE_URL = os.getenv("EDGE_CACHE_PURGE_URL", "").rstrip("/")  # Например http://nginx:8081; пусто - без purge
+LEADERBOARD_CACHE_SECONDS = 15  # Меняется постоянно: короткий срок вместо purge
+PURGE_TIMEOUT = 5
+CACHEABLE_STATUSES = (200, 404)  # 404 тоже кэшируем: purge удаленного трюка заменит старый 200
+
+
+def edge_cache(*keys: str, seconds: int = EDGE_CACHE_SECONDS):
+    """Зависимость FastAPI; в ключах можно ссылаться на параметры пути: "trick-{trick_id}" """
+    def dependency(request: Request):
+        request.state.edge_cache = ([key.format(**request.path_params) for key in keys], seconds)
+    return dependency
+
+
+class EdgeCacheMiddleware:
+    """ASGI middleware: проставляет заголовки кэша ответам эндпоинтов с edge_cache"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        anonymous = "authorization" not in Headers(scope=scope)
+
+        async def send_with_cache_headers(message):
+            policy = scope.get("state", {}).get("edge_cache")
+            if message["type"] == "http.response.start" and policy is not None:
+                keys, seconds = policy
+                headers = MutableHeaders(scope=message)
+                headers.add_vary_header("Authorization")
+                if not anonymous:
+                    headers["Cache-Control"] = "private, no-cache"
+                elif message["status"] in CACHEABLE_STATUSES:
+                    # Браузер каждый раз спрашивает общий кэш, общий кэш держит ответ seconds секунд
+                    headers["Cache-Control"] = f"public, max-age=0, s-maxage={seconds}"
+                    headers["Surrogate-Key"] = " ".join(keys)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_headers)
+
+
+def _fetch(path: str) -> bytes:
+    # Без Authorization: обновляется та же (гостевая) запись, что отдается гостям
+    with urllib.request.urlopen(EDGE_CACHE_PURGE_URL + path, timeout=PURGE_TIMEOUT) as response:
+        return response.read()
+
+
+def _fetch_json(path: str):
+    try:
+        return json.loads(_fetch(path))
+    except Exception:
+        return []
+
+
+def category_key(category: str) -> str:
+    """Ключ списка трюков категории; передавать старую и новую категорию измененного трюка"""
+    return "category-" + urllib.parse.quote(category, safe="")
+
+
+def _urls(keys: Set[str]) -> List[str]:
+    """URL группы ключа; список категорий берется из только что обновленного ответа"""
+    urls: List[str] = []
+    if "tricks" in keys:
+        urls.append("/api/tricks")
+        urls += [
+            "/api/tricks?category=" + urllib.parse.quote(category, safe="")
+            for category in _fetch_json("/api/categories")
+        ]
+    for key in keys:
+        if key.startswith("trick-") and key[6:].isdigit():
+            urls.append(f"/api/tricks/{key[6:]}")
+        elif key.startswith("category-"):
+            # Категории, оставшейся без трюков, уже нет в /api/categories - ее список обновляем по ключу
+            urls.append("/api/tricks?category=" + key[9:])
+    if "achievements" in keys:
+        urls.append("/api/achievements")
+    return list(dict.fromkeys(urls))
+
+
+def _refresh(keys: Set[str]) -> None:
+    refreshed = failed = 0
+    for path in _urls(keys):
+        try:
+            _fetch(path)
+            refreshed += 1
+        except urllib.error.HTTPError as e:
+            # 404 удаленного трюка - тоже свежий ответ, он заменил запись в кэше
+            refreshed += e.code == 404
+            failed += e.code != 404
+        except Exception:
+            failed += 1
+    if failed:
+        print(f"Обновление кэша nginx ({' '.join(sorted(keys))}): обновлено {refreshed}, ошибок {failed}")
+
+
+def purge(*keys: str) -> None:
+    """Обновляет записи общего кэша по ключам в фоне; вызывать после коммита"""
+    if not EDGE_CACHE_PURGE_URL or not keys:
+        return
+    threading.Thread(target=_refresh, args=(set(keys),), daemon=True).start()
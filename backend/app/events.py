@@ -0,0 +1,190 @@
+import asyncio
+import dataclasses
+import json
+import os
+from typing import Callable, Iterable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+# Настройки push-канала (SSE)
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", os.getenv("REDIS_URL"))
+EVENTS_REDIS_CHANNEL = "snowbetter:events"
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+LEADERBOARD_PUSH_INTERVAL = float(os.getenv("LEADERBOARD_PUSH_INTERVAL", "2"))
+LEADERBOARD_PUSH_LIMIT = 50
+PUBLISH_TIMEOUT_SECONDS = 2
+
+LEADERBOARD_CHANNEL = "leaderboard"
+
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def _json_default(value):
+    # Модели чтения (dataclass) отдаем как словари, остальное (даты, enum) - строкой
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    return str(value)
+
+
+class Subscription:
+    """Очередь событий одного SSE-клиента"""
+
+    def __init__(self, channels: Iterable[str]):
+        self.channels = set(channels)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, message: str) -> None:
+        # Медленный клиент не должен копить память: переполнился - отключаем
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class EventBroker:
+    """Рассылает события подписчикам: в памяти процесса или через Redis pub/sub"""
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url
+        self._subscriptions = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._redis = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._publish_tasks = set()
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if not self.redis_url:
+            return
+        try:
+            import redis.asyncio as redis_async
+        except ImportError:
+            print("Пакет redis не установлен, события рассылаются только внутри процесса")
+            return
+        self._redis = redis_async.Redis.from_url(self.redis_url)
+        self._listener_task = asyncio.create_task(self._listen_redis(self._redis))
+
+    async def stop(self) -> None:
+        if self._listener_task:
+            self._listener_task.cancel()
+        for task in list(self._publish_tasks):
+            task.cancel()
+        self._loop = None
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        subscription = Subscription(channels)
+        for channel in subscription.channels:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for channel in subscription.channels:
+            subscribers = self._subscriptions.get(channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[channel]
+
+    def publish(self, channel: str, event: str, data) -> None:
+        """Публикует событие; можно вызывать из любого потока"""
+        if self._loop is None:
+            return
+        message = json.dumps({"channel": channel, "event": event, "data": data}, ensure_ascii=False, default=_json_default)
+        if self._redis is not None:
+            # Сеть до Redis - только в задаче цикла: медленный Redis не блокирует обработчики и SSE
+            self._loop.call_soon_threadsafe(self._start_publish, message)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, message)
+
+    def _start_publish(self, message: str) -> None:
+        task = asyncio.create_task(self._publish_redis(message))
+        self._publish_tasks.add(task)
+        task.add_done_callback(self._publish_tasks.discard)
+
+    async def _publish_redis(self, message: str) -> None:
+        try:
+            await asyncio.wait_for(self._redis.publish(EVENTS_REDIS_CHANNEL, message), PUBLISH_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Redis недоступен: хотя бы подписчики этого процесса получат событие
+            print(f"Ошибка публикации события в Redis: {e}")
+            self._deliver(message)
+
+    def _deliver(self, message: str) -> None:
+        channel = json.loads(message)["channel"]
+        for subscription in list(self._subscriptions.get(channel, ())):
+            subscription.offer(message)
+
+    async def _listen_redis(self, client) -> None:
+        while True:
+            try:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(EVENTS_REDIS_CHANNEL)
+                async for item in pubsub.listen():
+                    if item["type"] == "message":
+                        self._deliver(item["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Ошибка подписки на события Redis: {e}")
+                await asyncio.sleep(1)
+
+
+broker = EventBroker(EVENTS_REDIS_URL)
+
+
+def format_sse(message: str) -> str:
+    payload = json.loads(message)
+    return f"event: {payload['event']}\ndata: {json.dumps(payload['data'], ensure_ascii=False)}\n\n"
+
+
+async def event_stream(subscription: Subscription, is_disconnected: Callable):
+    """Генератор SSE: события подписки и heartbeat, пока клиент на связи"""
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    break
+                yield ": heartbeat\n\n"
+                continue
+            yield format_sse(message)
+            if subscription.overflowed:
+                # Клиент отстал: просим переподключиться и перечитать состояние
+                yield "event: reset\ndata: {}\n\n"
+                break
+    finally:
+        broker.unsubscribe(subscription)
+
+
+# Лидерборд: изменения копятся и отправляются не чаще раза в интервал
+_leaderboard_dirty = False
+
+
+def mark_leaderboard_dirty() -> None:
+    global _leaderboard_dirty
+    _leaderboard_dirty = True
+
+
+async def leaderboard_publisher(snapshot: Callable[[int], list]) -> None:
+    """Периодически рассылает свежий топ, если он менялся"""
+    global _leaderboard_dirty
+    while True:
+        await asyncio.sleep(LEADERBOARD_PUSH_INTERVAL)
+        if not _leaderboard_dirty:
+            continue
+        _leaderboard_dirty = False
+        try:
+            leaderboard = await run_in_threadpool(snapshot, LEADERBOARD_PUSH_LIMIT)
+            broker.publish(LEADERBOARD_CHANNEL, "leaderboard", leaderboard)
+        except Exception as e:
+            print(f"Ошибка рассылки лидерборда: {e}")
@@ -0,0 +1,84 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, exists, select
+from .models import CardReview, Trick
+from .read_models import FlashcardRead, load_due_flashcards
+from typing import List, Optional
+from datetime import datetime, timedelta
+
+# Параметры SM-2
+MIN_EASE_FACTOR = 1.3
+DEFAULT_EASE_FACTOR = 2.5
+LAPSE_INTERVAL = timedelta(minutes=10)  # Забытую карточку показываем снова в ту же сессию
+PASSING_GRADE = 3
+
+
+def schedule_review(review: CardReview, grade: int, now: datetime) -> None:
+    """Пересчитывает интервал и следующую дату показа по алгоритму SM-2"""
+    ease = review.ease_factor or DEFAULT_EASE_FACTOR
+    repetitions = review.repetitions or 0
+    interval_days = review.interval_days or 0
+
+    if grade < PASSING_GRADE:
+        review.repetitions = 0
+        review.lapses = (review.lapses or 0) + 1
+        review.interval_days = 0
+        review.due_at = now + LAPSE_INTERVAL
+    else:
+        if repetitions == 0:
+            interval_days = 1
+        elif repetitions == 1:
+            interval_days = 6
+        else:
+            interval_days = round(interval_days * ease, 2)
+        review.repetitions = repetitions + 1
+        review.interval_days = interval_days
+        review.due_at = now + timedelta(days=interval_days)
+
+    review.ease_factor = max(MIN_EASE_FACTOR, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    review.last_reviewed_at = now
+
+
+class FlashcardsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_due_cards(self, user_id: int, limit: int, category: Optional[str] = None) -> List[FlashcardRead]:
+        """Следующие N карточек: сначала просроченные повторения, затем новые трюки"""
+        cards = load_due_flashcards(self.db, user_id, datetime.utcnow(), limit, category)
+
+        remaining = limit - len(cards)
+        if remaining > 0:
+            # Новые карточки: трюки без записи повторения (anti-join по unique_user_card)
+            new_query = select(Trick.id, Trick.name, Trick.category, Trick.description, Trick.image_url).where(
+                ~exists().where(and_(CardReview.user_id == user_id, CardReview.trick_id == Trick.id))
+            )
+            if category:
+                new_query = new_query.where(Trick.category == category)
+            cards.extend(
+                FlashcardRead(*row, due_at=None, repetitions=0)
+                for row in self.db.execute(new_query.order_by(Trick.id).limit(remaining))
+            )
+
+        return cards
+
+    def review(self, user_id: int, trick_id: int, grade: int) -> CardReview:
+        """Записывает ответ пользователя и планирует следующий показ"""
+        review = self.db.query(CardReview).filter(
+            CardReview.user_id == user_id,
+            CardReview.trick_id == trick_id
+        ).first()
+        if not review:
+            review = CardReview(
+                user_id=user_id,
+                trick_id=trick_id,
+                ease_factor=DEFAULT_EASE_FACTOR,
+                interval_days=0,
+                repetitions=0,
+                lapses=0
+            )
+            self.db.add(review)
+
+        schedule_review(review, grade, datetime.utcnow())
+        self.db.commit()
+        self.db.refresh(review)
+        return review
@@ -0,0 +1,179 @@
+"""Сборка мусора в каталоге загрузок.
+
+Удаляет файлы под uploads/images, на которые не ссылается ни один трюк или
+неотклоненное предложение и которые старше grace-периода (чтобы не удалить только что
+загруженное изображение, форма с которым еще не сохранена). Хранилище
+обходится пачками (os.scandir на диске, list_objects_v2 в S3), перед
+удалением каждой пачки ссылки перепроверяются в БД.
+
+Запуск: python -m app.image_gc [--dry-run] [--grace-hours 24] [--batch-size 500]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Set
+
+from sqlalchemy import select, union
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .database import SessionLocal
+from .models import StoredImage, SuggestionStatus, Trick, TrickSuggestion
+from .storage import UPLOADS_URL_PREFIX, storage as default_storage
+
+GC_GRACE_HOURS = float(os.getenv("UPLOADS_GC_GRACE_HOURS", "24"))
+GC_BATCH_SIZE = int(os.getenv("UPLOADS_GC_BATCH_SIZE", "500"))
+GC_INTERVAL_HOURS = float(os.getenv("UPLOADS_GC_INTERVAL_HOURS", "0"))  # 0 - периодический запуск выключен
+
+
+@dataclass
+class GCStats:
+    dry_run: bool
+    scanned: int = 0
+    referenced: int = 0
+    too_recent: int = 0
+    deleted: int = 0
+    deleted_bytes: int = 0
+    errors: int = 0
+    batches: int = 0
+    started_at: float = field(default_factory=time.time)
+    duration_ms: float = 0
+
+
+_gc_lock = threading.Lock()
+_last_stats: Optional[GCStats] = None
+
+
+def gc_running() -> bool:
+    return _gc_lock.locked()
+
+
+def last_gc_stats() -> Optional[GCStats]:
+    return _last_stats
+
+
+def _relative_path(url: str) -> Optional[str]:
+    if not url or not url.startswith(UPLOADS_URL_PREFIX):
+        return None
+    return url[len(UPLOADS_URL_PREFIX):]
+
+
+def referenced_paths(db: Session, paths: Optional[List[str]] = None) -> Set[str]:
+    """Пути загрузок, на которые ссылаются трюки и неотклоненные предложения (все или из списка)"""
+    trick_urls = select(Trick.image_url).where(Trick.image_url.like(f"{UPLOADS_URL_PREFIX}%"))
+    suggestion_urls = select(TrickSuggestion.image_url).where(
+        TrickSuggestion.image_url.like(f"{UPLOADS_URL_PREFIX}%"),
+        TrickSuggestion.status != SuggestionStatus.REJECTED
+    )
+    if paths is not None:
+        urls = [UPLOADS_URL_PREFIX + path for path in paths]
+        trick_urls = trick_urls.where(Trick.image_url.in_(urls))
+        suggestion_urls = suggestion_urls.where(TrickSuggestion.image_url.in_(urls))
+    return {_relative_path(url) for url in db.execute(union(trick_urls, suggestion_urls)).scalars()}
+
+
+def collect_garbage(db: Session, dry_run: bool = False, grace_hours: float = GC_GRACE_HOURS,
+                    batch_size: int = GC_BATCH_SIZE, storage=default_storage) -> GCStats:
+    """Удаляет неиспользуемые файлы загрузок старше grace-периода"""
+    stats = GCStats(dry_run=dry_run)
+    started = time.perf_counter()
+    cutoff = time.time() - grace_hours * 3600
+    referenced = referenced_paths(db)
+
+    objects = storage.iter_objects("images/")
+    while True:
+        batch = list(itertools.islice(objects, batch_size))
+        if not batch:
+            break
+        stats.batches += 1
+
+        candidates = {}
+        for item in batch:
+            stats.scanned += 1
+            if item.key in referenced:
+                stats.referenced += 1
+            elif item.modified > cutoff:
+                stats.too_recent += 1
+            else:
+                candidates[item.key] = item.size
+
+        if not candidates:
+            continue
+
+        # Ссылка могла появиться после построения индекса
+        fresh = referenced_paths(db, list(candidates))
+        stats.referenced += len(fresh)
+        for key in fresh:
+            del candidates[key]
+
+        deleted_keys = []
+        for key, size in candidates.items():
+            if not dry_run:
+                try:
+                    if not storage.delete(key):
+                        continue
+                except Exception as e:
+                    stats.errors += 1
+                    print(f"Не удалось удалить {key}: {e}")
+                    continue
+                deleted_keys.append(key)
+            stats.deleted += 1
+            stats.deleted_bytes += size
+
+        if deleted_keys:
+            db.query(StoredImage).filter(StoredImage.path.in_(deleted_keys)).delete(synchronize_session=False)
+            db.commit()
+
+    stats.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    return stats
+
+
+def run_gc(dry_run: bool = False, **kwargs) -> Optional[GCStats]:
+    """Один проход GC со своей сессией; None, если проход уже идет"""
+    global _last_stats
+    if not _gc_lock.acquire(blocking=False):
+        return None
+    db = SessionLocal()
+    try:
+        stats = collect_garbage(db, dry_run=dry_run, **kwargs)
+        _last_stats = stats
+        print(json.dumps({"event": "uploads_gc", **asdict(stats)}, ensure_ascii=False))
+        return stats
+    finally:
+        db.close()
+        _gc_lock.release()
+
+
+async def periodic_gc(interval_hours: float = GC_INTERVAL_HOURS) -> None:
+    """Фоновый запуск GC по расписанию, не блокируя event loop"""
+    while True:
+        await asyncio.sleep(interval_hours * 3600)
+        try:
+            await run_in_threadpool(run_gc)
+        except Exception as e:
+            print(f"Ошибка очистки загрузок: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Удаление неиспользуемых загрузок")
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать, ничего не удалять")
+    parser.add_argument("--grace-hours", type=float, default=GC_GRACE_HOURS)
+    parser.add_argument("--batch-size", type=int, default=GC_BATCH_SIZE)
+    args = parser.parse_args()
+
+    stats = run_gc(
+        dry_run=args.dry_run,
+        grace_hours=args.grace_hours,
+        batch_size=args.batch_size
+    )
+    if stats is None:
+        print("Очистка уже выполняется")
+
+
+if __name__ == "__main__":
+    main()
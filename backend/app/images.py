@@ -0,0 +1,173 @@
+"""Хранение загруженных изображений с адресацией по содержимому.
+
+Файл называется SHA-256 обработанного результата и лежит в шардированном
+каталоге images/ab/cd/<sha256>.webp. Содержимое по имени никогда не меняется,
+поэтому такие файлы можно кэшировать на год. Повторная загрузка того же
+исходника находится по хэшу исходных байт и не проходит через Pillow.
+"""
+import hashlib
+import io
+import os
+import re
+from collections import Counter
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .models import StoredImage
+from .storage import CHUNK_SIZE, UPLOADS_URL_PREFIX, iter_chunks, storage
+
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+MAX_IMAGE_SIZE = (800, 600)
+
+# Имя файла = хэш содержимого: images/ab/cd/abcdef...webp
+CONTENT_ADDRESSED_PATH = re.compile(r"^images/([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})\.webp$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def validate_image_file(file: UploadFile) -> bool:
+    """Валидация загружаемого файла изображения"""
+    # Проверка расширения файла
+    file_extension = os.path.splitext(file.filename.lower())[1] if file.filename else ''
+    if file_extension not in ALLOWED_EXTENSIONS:
+        return False
+
+    # Проверка MIME типа
+    if not file.content_type or not file.content_type.startswith('image/'):
+        return False
+
+    return True
+
+
+async def read_upload(file: UploadFile, limit: int = MAX_FILE_SIZE) -> bytes:
+    """Читает загрузку кусками и обрывает чтение, как только превышен лимит"""
+    content = bytearray()
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        content.extend(chunk)
+        if len(content) > limit:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Файл слишком большой. Максимальный размер: {limit // (1024*1024)}MB"
+            )
+    return bytes(content)
+
+
+def resize_image(content: bytes, max_size: tuple = MAX_IMAGE_SIZE) -> bytes:
+    """Уменьшает изображение и перекодирует в WebP"""
+    with Image.open(io.BytesIO(content)) as img:
+        # JPEG декодируется сразу в уменьшенном масштабе (для других форматов - no-op)
+        img.draft('RGB', max_size)
+
+        # WebP хранит прозрачность, остальные режимы приводим к RGB/RGBA
+        if img.mode not in ('RGB', 'RGBA'):
+            has_alpha = img.mode in ('LA', 'PA') or 'transparency' in img.info
+            img = img.convert('RGBA' if has_alpha else 'RGB')
+
+        # Изменяем размер с сохранением пропорций
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        img.save(output, format='WEBP', quality=85, method=2)
+        return output.getvalue()
+
+
+def content_path(sha256: str) -> str:
+    """Относительный путь файла внутри каталога uploads"""
+    return f"images/{sha256[:2]}/{sha256[2:4]}/{sha256}.webp"
+
+
+def image_url(path: str) -> str:
+    """Стабильный URL для БД; байты отдает StaticFiles/nginx или резолвер хранилища"""
+    return UPLOADS_URL_PREFIX + path
+
+
+def image_sha256(url: Optional[str]) -> Optional[str]:
+    """Хэш файла по его URL; None для внешних ссылок и старых имен на uuid"""
+    if not url or not url.startswith(UPLOADS_URL_PREFIX):
+        return None
+    match = CONTENT_ADDRESSED_PATH.match(url[len(UPLOADS_URL_PREFIX):])
+    return match.group(3) if match else None
+
+
+async def save_uploaded_image(db: Session, content: bytes) -> str:
+    """Сохраняет загрузку и возвращает URL; дубликаты не обрабатываются повторно"""
+    source_sha256 = hashlib.sha256(content).hexdigest()
+
+    # Тот же исходник уже загружали - отдаем готовый файл без Pillow
+    stored = db.query(StoredImage).filter(StoredImage.source_sha256 == source_sha256).first()
+    # Обновляем время изменения, чтобы GC не удалил файл до сохранения ссылки на него
+    if stored and await run_in_threadpool(storage.touch, stored.path):
+        return image_url(stored.path)
+
+    try:
+        processed = await run_in_threadpool(resize_image, content)
+    except (OSError, Image.DecompressionBombError) as e:
+        print(f"Ошибка при обработке изображения: {e}")
+        raise HTTPException(status_code=400, detail="Не удалось обработать изображение")
+
+    sha256 = hashlib.sha256(processed).hexdigest()
+    path = content_path(sha256)
+    if not await run_in_threadpool(storage.exists, path):
+        await storage.save(path, iter_chunks(processed), "image/webp", IMMUTABLE_CACHE_CONTROL)
+
+    if not db.query(StoredImage.id).filter(StoredImage.sha256 == sha256).first():
+        db.add(StoredImage(
+            sha256=sha256,
+            source_sha256=source_sha256,
+            path=path,
+            size_bytes=len(processed),
+            ref_count=0
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Параллельная загрузка того же файла уже создала запись
+            db.rollback()
+
+    return image_url(path)
+
+
+def track_image_reference(db: Session, old_url: Optional[str], new_url: Optional[str]) -> None:
+    """Переносит ссылку со старого изображения на новое (коммит - на вызывающем)"""
+    if old_url == new_url:
+        return
+    old_sha256 = image_sha256(old_url)
+    if old_sha256:
+        db.query(StoredImage).filter(
+            StoredImage.sha256 == old_sha256,
+            StoredImage.ref_count > 0
+        ).update({StoredImage.ref_count: StoredImage.ref_count - 1}, synchronize_session=False)
+    new_sha256 = image_sha256(new_url)
+    if new_sha256:
+        db.query(StoredImage).filter(
+            StoredImage.sha256 == new_sha256
+        ).update({StoredImage.ref_count: StoredImage.ref_count + 1}, synchronize_session=False)
+
+
+def add_image_references(db: Session, urls) -> None:
+    """Добавляет ссылки на несколько изображений сразу: по одному UPDATE на файл (коммит - на вызывающем)"""
+    counts = Counter(sha256 for sha256 in map(image_sha256, urls) if sha256)
+    for sha256, count in counts.items():
+        db.query(StoredImage).filter(
+            StoredImage.sha256 == sha256
+        ).update({StoredImage.ref_count: StoredImage.ref_count + count}, synchronize_session=False)
+
+
+def remove_image_references(db: Session, urls) -> None:
+    """Снимает ссылки с нескольких изображений сразу, не уходя ниже нуля (коммит - на вызывающем)"""
+    counts = Counter(sha256 for sha256 in map(image_sha256, urls) if sha256)
+    for sha256, count in counts.items():
+        db.query(StoredImage).filter(
+            StoredImage.sha256 == sha256
+        ).update({
+            StoredImage.ref_count: case((StoredImage.ref_count > count, StoredImage.ref_count - count), else_=0)
+        }, synchronize_session=False)
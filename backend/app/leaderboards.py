@@ -0,0 +1,215 @@
+"""Лидерборды за неделю, месяц и по категориям.
+
+Вместо сканирования user_achievements/user_progress с фильтром по датам
+агрегаты копятся в leaderboard_buckets по ключу (период, начало периода,
+категория, пользователь) в той же транзакции, что и сам прогресс. Чтение
+- top-N по индексу внутри одного периода. Недельные и месячные корзины
+старше LEADERBOARD_KEEP_WEEKS / LEADERBOARD_KEEP_MONTHS удаляются.
+
+Очки - это очки достижений, их нельзя отнести к категории, поэтому
+рейтинг по категории считается по числу изученных трюков.
+
+Пересборка по истории: python -m app.leaderboards --rebuild
+"""
+import argparse
+import asyncio
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .database import SessionLocal
+from .models import Achievement, LeaderboardBucket, Trick, User, UserAchievement, UserProgress
+from .read_models import LeaderboardRow
+
+ALL_TIME_START = date(1970, 1, 1)
+KEEP_WEEKS = int(os.getenv("LEADERBOARD_KEEP_WEEKS", "12"))
+KEEP_MONTHS = int(os.getenv("LEADERBOARD_KEEP_MONTHS", "12"))
+ROLL_OFF_INTERVAL_HOURS = 24
+
+BUCKET_KEY = ("period", "period_start", "category", "user_id")
+BUCKET_COUNTERS = ("points", "achievements_count", "learned_count")
+
+
+def period_start(period: str, day: date) -> date:
+    """Начало периода, в который попадает день (UTC)"""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return ALL_TIME_START
+
+
+def _months_back(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _today(when: Optional[datetime] = None) -> date:
+    return (when or datetime.utcnow()).date()
+
+
+class LeaderboardService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _upsert(self, keys: Iterable[Tuple[str, date, str]], user_id: int, **deltas: int) -> None:
+        """Один INSERT ... ON CONFLICT DO UPDATE x = x + n на все корзины; коммит - на вызывающем"""
+        values = {name: deltas.get(name, 0) for name in BUCKET_COUNTERS}
+        # Повтор ключа в одном ON CONFLICT Postgres не допускает
+        rows = [
+            {"period": period, "period_start": start, "category": category, "user_id": user_id, **values}
+            for period, start, category in dict.fromkeys(keys)
+        ]
+        insert = sqlite_insert if self.db.get_bind().dialect.name == "sqlite" else pg_insert
+        statement = insert(LeaderboardBucket).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(BUCKET_KEY),
+            set_={name: getattr(LeaderboardBucket, name) + statement.excluded[name] for name in deltas}
+        )
+        self.db.execute(statement)
+
+    def record_learned(self, user_id: int, category: str, when: Optional[datetime] = None) -> None:
+        day = _today(when)
+        keys = [
+            (period, period_start(period, day), key_category)
+            for period in ("week", "month")
+            for key_category in ("", category)
+        ]
+        keys.append(("all", ALL_TIME_START, category))
+        self._upsert(keys, user_id, learned_count=1)
+
+    def record_achievements(self, user_id: int, points: int, count: int, when: Optional[datetime] = None) -> None:
+        day = _today(when)
+        keys = [(period, period_start(period, day), "") for period in ("week", "month")]
+        self._upsert(keys, user_id, points=points, achievements_count=count)
+
+    def top(self, window: str, category: Optional[str] = None, limit: int = 10,
+            when: Optional[datetime] = None) -> List[LeaderboardRow]:
+        """Top-N за текущий период; по категории - по числу изученных трюков"""
+        bucket = LeaderboardBucket
+        if category:
+            order = (bucket.learned_count.desc(), bucket.points.desc())
+        else:
+            order = (bucket.points.desc(), bucket.learned_count.desc())
+        rows = self.db.query(
+            User.id, User.username, bucket.points, bucket.achievements_count, bucket.learned_count
+        ).join(
+            bucket, bucket.user_id == User.id
+        ).filter(
+            bucket.period == window,
+            bucket.period_start == period_start(window, _today(when)),
+            bucket.category == (category or "")
+        ).order_by(*order, bucket.user_id).limit(limit).all()
+
+        return [
+            LeaderboardRow(row.id, row.username, row.points, row.achievements_count, idx + 1, row.learned_count)
+            for idx, row in enumerate(rows)
+        ]
+
+    def roll_off(self, when: Optional[datetime] = None) -> int:
+        """Удаляет недельные и месячные корзины старше срока хранения"""
+        day = _today(when)
+        week_cutoff = period_start("week", day) - timedelta(weeks=KEEP_WEEKS)
+        month_cutoff = _months_back(period_start("month", day), KEEP_MONTHS)
+        deleted = 0
+        for period, cutoff in (("week", week_cutoff), ("month", month_cutoff)):
+            deleted += self.db.query(LeaderboardBucket).filter(
+                LeaderboardBucket.period == period,
+                LeaderboardBucket.period_start < cutoff
+            ).delete(synchronize_session=False)
+        self.db.commit()
+        return deleted
+
+    def rebuild(self, batch_size: int = 5000) -> int:
+        """Пересчитывает все корзины по user_progress и user_achievements"""
+        totals = Counter()
+        progress = self.db.execute(
+            select(UserProgress.user_id, UserProgress.learned_at, Trick.category)
+            .join(Trick, Trick.id == UserProgress.trick_id)
+        )
+        for user_id, learned_at, category in progress:
+            day = _today(learned_at)
+            for period in ("week", "month"):
+                start = period_start(period, day)
+                totals[(period, start, "", user_id, "learned_count")] += 1
+                totals[(period, start, category, user_id, "learned_count")] += 1
+            totals[("all", ALL_TIME_START, category, user_id, "learned_count")] += 1
+
+        earned = self.db.execute(
+            select(UserAchievement.user_id, UserAchievement.earned_at, Achievement.points)
+            .join(Achievement, Achievement.id == UserAchievement.achievement_id)
+        )
+        for user_id, earned_at, points in earned:
+            day = _today(earned_at)
+            for period in ("week", "month"):
+                start = period_start(period, day)
+                totals[(period, start, "", user_id, "points")] += points or 0
+                totals[(period, start, "", user_id, "achievements_count")] += 1
+
+        buckets = {}
+        for (*key, counter), value in totals.items():
+            row = buckets.setdefault(tuple(key), dict(zip(BUCKET_KEY, key), **dict.fromkeys(BUCKET_COUNTERS, 0)))
+            row[counter] = value
+
+        self.db.query(LeaderboardBucket).delete(synchronize_session=False)
+        rows = list(buckets.values())
+        for start in range(0, len(rows), batch_size):
+            self.db.execute(LeaderboardBucket.__table__.insert(), rows[start:start + batch_size])
+        self.db.commit()
+        self.roll_off()
+        return len(rows)
+
+    def needs_backfill(self) -> bool:
+        """Корзин нет, а история есть (первый запуск после обновления)"""
+        has_buckets = self.db.query(LeaderboardBucket.user_id).first() is not None
+        return not has_buckets and self.db.query(UserProgress.id).first() is not None
+
+
+def _roll_off() -> int:
+    db = SessionLocal()
+    try:
+        return LeaderboardService(db).roll_off()
+    finally:
+        db.close()
+
+
+async def periodic_roll_off(interval_hours: float = ROLL_OFF_INTERVAL_HOURS) -> None:
+    """Ежедневное удаление устаревших корзин, не блокируя event loop"""
+    while True:
+        try:
+            deleted = await run_in_threadpool(_roll_off)
+            if deleted:
+                print(f"Удалено устаревших корзин лидерборда: {deleted}")
+        except Exception as e:
+            print(f"Ошибка очистки лидербордов: {e}")
+        await asyncio.sleep(interval_hours * 3600)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Корзины лидербордов за периоды")
+    parser.add_argument("--rebuild", action="store_true", help="пересчитать корзины по истории")
+    parser.add_argument("--roll-off", action="store_true", help="удалить устаревшие корзины")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        service = LeaderboardService(db)
+        if args.rebuild:
+            print(f"Корзин после пересборки: {service.rebuild()}")
+        elif args.roll_off:
+            print(f"Удалено корзин: {service.roll_off()}")
+        else:
+            parser.print_help()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Изученные трюки пользователя в виде битовой карты.
+
+Бит N (младший бит байта первым) означает трюк с id N: на тысячи трюков
+это сотни байт. Проверка "изучен ли трюк" - сдвиг, освоение категории -
+AND с маской категории. Маски каталога строятся одним запросом и живут в
+памяти процесса: сбрасываются при изменении каталога в этом воркере и по
+CATALOG_MASKS_TTL, чтобы увидеть изменения, сделанные в других.
+
+Пересборка карт по user_progress: python -m app.learned_sets --rebuild
+"""
+import argparse
+import base64
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import Trick, UserLearnedSet, UserProgress
+
+CATALOG_MASKS_TTL = float(os.getenv("CATALOG_MASKS_TTL", "60"))
+
+_ONES = re.compile("1+")
+
+
+def bits_from_bytes(data: bytes) -> int:
+    return int.from_bytes(data or b"", "little")
+
+
+def bits_to_bytes(bits: int) -> bytes:
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+
+def bits_from_ids(ids) -> int:
+    bits = 0
+    for trick_id in ids:
+        bits |= 1 << trick_id
+    return bits
+
+
+def encode_bitset(bits: int) -> str:
+    return base64.b64encode(bits_to_bytes(bits)).decode("ascii")
+
+
+def encode_ranges(bits: int) -> List[List[int]]:
+    """Непрерывные диапазоны id [начало, конец] включительно"""
+    # Двоичная строка задом наперед: позиция символа = id трюка
+    return [[match.start(), match.end() - 1] for match in _ONES.finditer(bin(bits)[:1:-1])]
+
+
+@dataclass(frozen=True)
+class CatalogMasks:
+    all: int = 0
+    categories: Dict[str, int] = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+    def category(self, name: str) -> int:
+        return self.categories.get(name, 0)
+
+
+_masks: Optional[CatalogMasks] = None
+_catalog_version = 0
+
+
+def invalidate_catalog() -> None:
+    """Сбрасывает маски и другие производные каталога после его изменения"""
+    global _masks, _catalog_version
+    _masks = None
+    _catalog_version += 1
+
+
+def catalog_version() -> int:
+    """Номер версии каталога в этом воркере: растет при каждом invalidate_catalog"""
+    return _catalog_version
+
+
+def catalog_masks(db: Session) -> CatalogMasks:
+    """Маски всех трюков и каждой категории"""
+    global _masks
+    masks = _masks
+    if masks is not None and time.monotonic() - masks.loaded_at < CATALOG_MASKS_TTL:
+        return masks
+
+    categories: Dict[str, int] = {}
+    for trick_id, category in db.execute(select(Trick.id, Trick.category)):
+        categories[category] = categories.get(category, 0) | (1 << trick_id)
+    everything = 0
+    for mask in categories.values():
+        everything |= mask
+    masks = CatalogMasks(everything, categories, time.monotonic())
+    _masks = masks
+    return masks
+
+
+class LearnedSetService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, user_id: int) -> Tuple[int, int]:
+        """Битовая карта и ее версия; без строки - расчет по user_progress (версия 0)"""
+        row = self.db.execute(
+            select(UserLearnedSet.bits, UserLearnedSet.version).where(UserLearnedSet.user_id == user_id)
+        ).first()
+        if row is None:
+            return self._compute(user_id), 0
+        return bits_from_bytes(row.bits), row.version
+
+    def progress_stats(self, user_id: int) -> dict:
+        """Прогресс по каталогу и категориям: popcount по маскам, без COUNT-запросов"""
+        learned, _ = self.get(user_id)
+        masks = catalog_masks(self.db)
+        total_tricks = masks.all.bit_count()
+        learned_tricks = (learned & masks.all).bit_count()
+
+        categories_stats = {}
+        for category, mask in masks.categories.items():
+            total_in_category = mask.bit_count()
+            learned_in_category = (learned & mask).bit_count()
+            categories_stats[category] = {
+                "total": total_in_category,
+                "learned": learned_in_category,
+                "percentage": round((learned_in_category / total_in_category) * 100, 1) if total_in_category > 0 else 0
+            }
+
+        return {
+            "total_tricks": total_tricks,
+            "learned_tricks": learned_tricks,
+            "progress_percentage": round((learned_tricks / total_tricks) * 100, 1) if total_tricks > 0 else 0,
+            "categories": categories_stats
+        }
+
+    def _compute(self, user_id: int) -> int:
+        return bits_from_ids(self.db.scalars(select(UserProgress.trick_id).where(UserProgress.user_id == user_id)))
+
+    def add(self, user_id: int, trick_id: int) -> None:
+        """Ставит бит трюка; коммит - на вызывающем"""
+        self.add_many(user_id, [trick_id])
+
+    def add_many(self, user_id: int, trick_ids: List[int]) -> None:
+        """Ставит биты трюков одним обновлением строки; коммит - на вызывающем"""
+        added = bits_from_ids(trick_ids)
+        row = self.db.scalars(
+            select(UserLearnedSet).where(UserLearnedSet.user_id == user_id).with_for_update()
+        ).first()
+        if row is not None:
+            row.bits = bits_to_bytes(bits_from_bytes(row.bits) | added)
+            row.version += 1
+            return
+
+        # Строки еще нет: строим по user_progress, куда уже добавлены эти трюки
+        self.db.flush()
+        try:
+            with self.db.begin_nested():
+                self.db.add(UserLearnedSet(user_id=user_id, bits=bits_to_bytes(self._compute(user_id)), version=1))
+        except IntegrityError:
+            # Параллельная транзакция создала строку первой
+            self.add_many(user_id, trick_ids)
+
+    def rebuild(self) -> int:
+        """Пересобирает все карты по user_progress; возвращает число измененных"""
+        actual: Dict[int, int] = {}
+        for user_id, trick_id in self.db.execute(select(UserProgress.user_id, UserProgress.trick_id)):
+            actual[user_id] = actual.get(user_id, 0) | (1 << trick_id)
+
+        changed = 0
+        for row in self.db.scalars(select(UserLearnedSet)):
+            bits = actual.pop(row.user_id, 0)
+            if bits_from_bytes(row.bits) != bits:
+                # Версия растет, чтобы клиенты не получили 304 на старые данные
+                row.bits = bits_to_bytes(bits)
+                row.version += 1
+                changed += 1
+        for user_id, bits in actual.items():
+            self.db.add(UserLearnedSet(user_id=user_id, bits=bits_to_bytes(bits), version=1))
+            changed += 1
+        self.db.commit()
+        return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Битовые карты изученных трюков")
+    parser.add_argument("--rebuild", action="store_true", help="пересобрать карты по user_progress")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return
+
+    db = SessionLocal()
+    try:
+        changed = LearnedSetService(db).rebuild()
+    finally:
+        db.close()
+    print(f"Обновлено карт: {changed}")
+
+
+if __name__ == "__main__":
+    main()
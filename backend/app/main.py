@@ -1,25 +1,25 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Query, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 from typing import List, Optional
 from datetime import timedelta, datetime
+import asyncio
 import json
 import os
-import uuid
 import shutil
-from PIL import Image
-import aiofiles
 
 from .database import SessionLocal, engine, get_db
-from .models import Base, Trick, User, UserProgress, UserRole, TrickSuggestion, SuggestionStatus, Achievement, UserAchievement, AchievementType
+from .models import Base, Trick, User, UserProgress, UserRole, TrickSuggestion, SuggestionStatus, Achievement, UserAchievement, AchievementType, UserStats, UserLearnedSet, LeaderboardBucket, TrickPrerequisite, PurgeJob, RefreshToken, QuizAnswer, QuizTrickStats, CardReview
 from .schemas import (
     TrickCreate, TrickResponse, UserCreate, UserResponse, UserProgressResponse,
-    UserLogin, Token, UserUpdate, PasswordChange, TrickSuggestionCreate,
-    TrickSuggestionResponse, TrickSuggestionWithUsers, ModerationRequest,
-    AchievementCreate, AchievementResponse, UserAchievementResponse, UserWithAchievements
+    UserLogin, Token, RefreshRequest, SessionResponse, UserUpdate, PasswordChange, TrickSuggestionCreate,
+    TrickSuggestionResponse, TrickSuggestionCreated, TrickSuggestionWithUsers, ModerationRequest, DuplicateCandidate,
+    BatchModerationRequest, PurgeRequest, SyncUpload, QuizAnswersRequest,
+    AchievementCreate, AchievementResponse, UserAchievementResponse, UserWithAchievements,
+    FlashcardResponse, CardReviewRequest, CardReviewResponse, TrickPrerequisitesUpdate
 )
 from .auth import (
     authenticate_user, create_access_token, get_current_user, 
@@ -27,69 +27,56 @@ from .auth import (
     get_password_hash, verify_password, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from .achievements_service import AchievementsService
-
-# Функции для работы с изображениями
-ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
-
-def validate_image_file(file: UploadFile) -> bool:
-    """Валидация загружаемого файла изображения"""
-    # Проверка расширения файла
-    file_extension = os.path.splitext(file.filename.lower())[1] if file.filename else ''
-    if file_extension not in ALLOWED_EXTENSIONS:
-        return False
-    
-    # Проверка MIME типа
-    if not file.content_type or not file.content_type.startswith('image/'):
-        return False
-    
-    return True
-
-def resize_image(image_path: str, max_size: tuple = (800, 600)) -> None:
-    """Изменение размера изображения для оптимизации"""
-    try:
-        with Image.open(image_path) as img:
-            # Конвертируем в RGB если нужно (для JPEG)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-            
-            # Изменяем размер с сохранением пропорций
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Сохраняем оптимизированное изображение
-            img.save(image_path, optimize=True, quality=85)
-    except Exception as e:
-        print(f"Ошибка при обработке изображения: {e}")
-
-async def save_uploaded_image(file: UploadFile) -> str:
-    """Сохранение загруженного изображения"""
-    # Генерируем уникальное имя файла
-    file_extension = os.path.splitext(file.filename.lower())[1] if file.filename else '.jpg'
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
-    
-    # Сохраняем файл
-    async with aiofiles.open(file_path, 'wb') as buffer:
-        content = await file.read()
-        await buffer.write(content)
-    
-    # Оптимизируем изображение
-    resize_image(file_path)
-    
-    # Возвращаем URL для доступа к файлу
-    return f"/uploads/images/{unique_filename}"
+from .flashcards_service import FlashcardsService
+from .user_stats_service import UserStatsService
+from .dashboard import DEFAULT_SECTIONS, build_dashboard, parse_sections
+from .leaderboards import LeaderboardService, periodic_roll_off
+from .recommendations import REBUILD_MINUTES, periodic_rebuild, recommender
+from .learned_sets import LearnedSetService, catalog_masks, encode_bitset, encode_ranges, invalidate_catalog
+from .trick_graph import trick_graph
+from .duplicates import duplicate_index, forget, index_suggestion, index_trick
+from .moderation import ALREADY_MODERATED, APPROVED, LOCKED, NOT_FOUND, REJECTED, ModerationService
+from .refresh_tokens import RefreshTokenService
+from .quiz_answers import answer_buffer, pick_weak_trick, quiz_stats, record_answers, trick_difficulty
+from .sync import DELETE, SyncService, periodic_prune, record_change
+from .purge import PURGE_SYNC_ROWS, PurgeService, create_job, job_status, run_purge_job
+from .responses import DefaultResponse, trusted_response
+from .edge_cache import LEADERBOARD_CACHE_SECONDS, EdgeCacheMiddleware, category_key, edge_cache, purge
+from .read_models import (
+    load_active_achievements, load_learned_tricks, load_quiz_tricks, load_suggestions_with_users, load_trick,
+    load_tricks, load_user, load_user_progress, load_user_suggestions, load_users, user_exists
+)
+from .profiling import ProfilingMiddleware, ProfiledRoute, install_sql_profiler
+from .rate_limit import rate_limit
+from .images import read_upload, save_uploaded_image, track_image_reference, validate_image_file
+from .storage import LocalStorage, storage
+from .upload_serving import upload_response
+from .image_gc import GC_INTERVAL_HOURS, gc_running, last_gc_stats, periodic_gc, run_gc
+from .events import (
+    broker, event_stream, leaderboard_publisher, user_channel, LEADERBOARD_CHANNEL
+)
 
 # Создание таблиц
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Уже лучше - Snowboard Tricks Learning App", version="1.0.0")
+app = FastAPI(
+    title="Уже лучше - Snowboard Tricks Learning App",
+    version="1.0.0",
+    default_response_class=DefaultResponse
+)
+app.router.route_class = ProfiledRoute
+
+# Профилирование SQL-запросов (по заголовку X-Profile-Request или семплированию)
+install_sql_profiler(engine)
 
 # Создание папки для загруженных изображений
-UPLOAD_DIR = "uploads/images"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+if isinstance(storage, LocalStorage):
+    os.makedirs(storage.local_path("images"), exist_ok=True)
 
-# Настройка статических файлов
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Загрузки: проверка доступа здесь, байты отдает nginx (X-Accel-Redirect) или объектное хранилище
+@app.api_route("/uploads/{key:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_upload(key: str, request: Request):
+    return await upload_response(request, key)
 
 # CORS настройки для работы с frontend
 app.add_middleware(
@@ -98,7 +85,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(ProfilingMiddleware)
+# Заголовки общего кэша для гостевых ответов каталога
+app.add_middleware(EdgeCacheMiddleware)
+
+# Пробуем разные возможные пути к tricks.json
+TRICKS_JSON_PATHS = [
+    "/app/tricks.json",  # Путь в Docker контейнере
+    os.path.join(os.path.dirname(__file__), "..", "..", "tricks.json"),  # Относительный путь
+    "tricks.json",  # Текущая директория
+]
+
+def find_tricks_json() -> Optional[str]:
+    for path in TRICKS_JSON_PATHS:
+        if os.path.exists(path):
+            return path
+    print("Файл tricks.json не найден ни в одном из путей:", TRICKS_JSON_PATHS)
+    return None
 
 # Загрузка трюков из JSON файла при запуске
 def load_tricks_from_json():
@@ -110,21 +115,8 @@ def load_tricks_from_json():
             return
             
         # Загружаем из JSON файла
-        # Пробуем разные возможные пути
-        possible_paths = [
-            "/app/tricks.json",  # Путь в Docker контейнере
-            os.path.join(os.path.dirname(__file__), "..", "..", "tricks.json"),  # Относительный путь
-            "tricks.json",  # Текущая директория
-        ]
-        
-        json_path = None
-        for path in possible_paths:
-            if os.path.exists(path):
-                json_path = path
-                break
-        
+        json_path = find_tricks_json()
         if not json_path:
-            print("Файл tricks.json не найден ни в одном из путей:", possible_paths)
             return
             
         with open(json_path, "r", encoding="utf-8") as f:
@@ -159,6 +151,36 @@ def load_tricks_from_json():
     finally:
         db.close()
 
+# Зависимости между трюками из tricks.json (по названиям: id в базе могут отличаться)
+def load_prerequisites_from_json():
+    db = SessionLocal()
+    try:
+        if db.query(TrickPrerequisite.trick_id).first():
+            return
+        json_path = find_tricks_json()
+        if not json_path:
+            return
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        
+        trick_ids = dict(db.query(Trick.name, Trick.id).all())
+        edges = {
+            (trick_ids[trick_data["name"]], trick_ids[name])
+            for trick_data in data["tricks"]
+            for name in trick_data.get("prerequisites", [])
+            if trick_data["name"] in trick_ids and name in trick_ids
+        }
+        for trick_id, prerequisite_id in edges:
+            db.add(TrickPrerequisite(trick_id=trick_id, prerequisite_id=prerequisite_id))
+        db.commit()
+        if edges:
+            print(f"Загружено {len(edges)} зависимостей между трюками")
+    except Exception as e:
+        print(f"Ошибка при загрузке зависимостей трюков: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
 # Создание админа по умолчанию
 def create_default_admin():
     db = SessionLocal()
@@ -197,43 +219,105 @@ def create_default_achievements():
     finally:
         db.close()
 
+def leaderboard_snapshot(limit: int) -> list:
+    db = SessionLocal()
+    try:
+        return AchievementsService(db).get_leaderboard(limit)
+    finally:
+        db.close()
+
+def backfill_user_stats():
+    """Создание счетчиков для пользователей, у которых их еще нет"""
+    db = SessionLocal()
+    try:
+        created = UserStatsService(db).backfill()
+        if created:
+            print(f"Созданы счетчики для {created} пользователей")
+    finally:
+        db.close()
+
+def backfill_leaderboards():
+    """Первичное заполнение корзин лидербордов по накопленной истории"""
+    db = SessionLocal()
+    try:
+        service = LeaderboardService(db)
+        if service.needs_backfill():
+            print(f"Заполнены корзины лидербордов: {service.rebuild()}")
+    finally:
+        db.close()
+
 # Загружаем трюки при старте приложения
 @app.on_event("startup")
 async def startup_event():
     load_tricks_from_json()
+    load_prerequisites_from_json()
     create_default_admin()
     create_default_achievements()
+    backfill_user_stats()
+    backfill_leaderboards()
+    await broker.start()
+    answer_buffer.start()
+    asyncio.create_task(leaderboard_publisher(leaderboard_snapshot))
+    asyncio.create_task(periodic_roll_off())
+    asyncio.create_task(periodic_rebuild(REBUILD_MINUTES))
+    asyncio.create_task(periodic_prune())
+    if GC_INTERVAL_HOURS > 0:
+        asyncio.create_task(periodic_gc(GC_INTERVAL_HOURS))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Ответы викторины из буфера - в БД до выхода процесса
+    await answer_buffer.stop()
+    await broker.stop()
 
 @app.get("/")
 async def root():
     return {"message": "Уже лучше - API для изучения трюков сноуборда"}
 
 # API для трюков
-@app.get("/api/tricks", response_model=List[TrickResponse])
+@app.get("/api/tricks", response_model=List[TrickResponse], dependencies=[Depends(edge_cache("tricks"))])
 async def get_tricks(
     category: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(Trick)
-    if category:
-        query = query.filter(Trick.category == category)
-    tricks = query.all()
-    return tricks
+    return trusted_response(load_tricks(db, category))
 
-@app.get("/api/tricks/{trick_id}", response_model=TrickResponse)
+@app.get("/api/tricks/{trick_id}", response_model=TrickResponse, dependencies=[Depends(edge_cache("trick-{trick_id}"))])
 async def get_trick(trick_id: int, db: Session = Depends(get_db)):
-    trick = db.query(Trick).filter(Trick.id == trick_id).first()
+    trick = load_trick(db, trick_id)
     if not trick:
         raise HTTPException(status_code=404, detail="Трюк не найден")
-    return trick
+    return trusted_response(trick)
+
+@app.get("/api/tricks/{trick_id}/path")
+async def get_trick_path(trick_id: int, db: Session = Depends(get_db)):
+    """Все трюки, которые нужно освоить до этого, в порядке изучения (последний - сам трюк)"""
+    graph = trick_graph(db)
+    if trick_id not in graph.names:
+        raise HTTPException(status_code=404, detail="Трюк не найден")
+    
+    return {
+        "trick_id": trick_id,
+        "depth": graph.depth[trick_id],
+        "path": [
+            {
+                "id": step_id,
+                "name": graph.names[step_id],
+                "category": graph.categories[step_id],
+                "depth": graph.depth[step_id],
+                "requires": graph.prerequisites(step_id)
+            }
+            for step_id in graph.path(trick_id)
+        ]
+    }
 
-@app.get("/api/categories")
+@app.get("/api/categories", dependencies=[Depends(edge_cache("tricks"))])
 async def get_categories(db: Session = Depends(get_db)):
     categories = db.query(Trick.category).distinct().all()
     return [cat[0] for cat in categories]
 
 # API для аутентификации
-@app.post("/api/auth/register", response_model=UserResponse)
+@app.post("/api/auth/register", response_model=UserResponse, dependencies=[Depends(rate_limit("auth"))])
 async def register(user: UserCreate, db: Session = Depends(get_db)):
     # Проверяем, существует ли уже пользователь
     db_user = db.query(User).filter(
@@ -251,19 +335,13 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         role=UserRole.USER
     )
     db.add(db_user)
+    db.flush()
+    db.add(UserStats(user_id=db_user.id, learned_count=0, total_points=0, achievements_count=0, suggestions_count=0))
     db.commit()
     db.refresh(db_user)
     return db_user
 
-@app.post("/api/auth/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Неверное имя пользователя или пароль",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+def token_response(user: User, refresh_token: str) -> dict:
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
@@ -271,14 +349,54 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     return {
         "access_token": access_token,
         "token_type": "bearer",
+        "refresh_token": refresh_token,
         "user": user
     }
 
+@app.post("/api/auth/login", response_model=Token, dependencies=[Depends(rate_limit("auth"))])
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = authenticate_user(db, form_data.username, form_data.password)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Неверное имя пользователя или пароль",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    refresh_token = RefreshTokenService(db).issue(user.id, request.headers.get("user-agent"))
+    return token_response(user, refresh_token)
+
+@app.post("/api/auth/refresh", response_model=Token, dependencies=[Depends(rate_limit("refresh"))])
+async def refresh_access_token(data: RefreshRequest, db: Session = Depends(get_db)):
+    # Без bcrypt: поиск сессии по HMAC токена и ротация одним UPDATE
+    user, refresh_token = RefreshTokenService(db).rotate(data.refresh_token)
+    return token_response(user, refresh_token)
+
+@app.post("/api/auth/logout")
+async def logout(data: RefreshRequest, db: Session = Depends(get_db)):
+    RefreshTokenService(db).revoke_token(data.refresh_token)
+    return {"message": "Сессия завершена"}
+
+@app.get("/api/auth/sessions", response_model=List[SessionResponse])
+async def get_sessions(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+    return RefreshTokenService(db).active_sessions(current_user.id)
+
+@app.delete("/api/auth/sessions/{session_id}")
+async def revoke_session(
+    session_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    session = db.get(RefreshToken, session_id)
+    if not session or session.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Сессия не найдена")
+    RefreshTokenService(db).revoke(session_id)
+    return {"message": "Сессия завершена"}
+
 @app.get("/api/auth/me", response_model=UserResponse)
 async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
     return current_user
 
-@app.post("/api/auth/change-password")
+@app.post("/api/auth/change-password", dependencies=[Depends(rate_limit("auth"))])
 async def change_password(
     password_data: PasswordChange,
     current_user: User = Depends(get_current_active_user),
@@ -301,20 +419,22 @@ async def change_password(
     # Обновляем пароль
     current_user.password_hash = get_password_hash(password_data.new_password)
     db.commit()
+    # Остальные устройства должны войти с новым паролем
+    RefreshTokenService(db).revoke_all(current_user.id, keep_token=password_data.refresh_token)
     
     return {"message": "Пароль успешно изменен"}
 
 # API для пользователей (старый эндпоинт для совместимости)
-@app.post("/api/users", response_model=UserResponse)
+@app.post("/api/users", response_model=UserResponse, dependencies=[Depends(rate_limit("auth"))])
 async def create_user_legacy(user: UserCreate, db: Session = Depends(get_db)):
     return await register(user, db)
 
 @app.get("/api/users/{user_id}", response_model=UserResponse)
 async def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = load_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
-    return user
+    return trusted_response(user)
 
 # Админские эндпоинты для управления трюками
 @app.get("/api/admin/tricks", response_model=List[TrickResponse])
@@ -322,8 +442,7 @@ async def get_tricks_for_admin(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_manager_or_admin_user)
 ):
-    tricks = db.query(Trick).all()
-    return tricks
+    return trusted_response(load_tricks(db))
 
 @app.post("/api/admin/tricks", response_model=TrickResponse)
 async def create_trick(
@@ -337,8 +456,15 @@ async def create_trick(
     
     db_trick = Trick(**trick_data)
     db.add(db_trick)
+    track_image_reference(db, None, db_trick.image_url)
+    db.flush()
+    record_change(db, "trick", db_trick.id)
     db.commit()
+    invalidate_catalog()
+    # Гость мог запросить трюк до создания: закэшированный 404 под тем же id тоже обновляем
+    purge("tricks", f"trick-{db_trick.id}", category_key(db_trick.category))
     db.refresh(db_trick)
+    index_trick(db_trick.id, db_trick.name, db_trick.description)
     return db_trick
 
 @app.put("/api/admin/tricks/{trick_id}", response_model=TrickResponse)
@@ -352,11 +478,17 @@ async def update_trick(
     if not db_trick:
         raise HTTPException(status_code=404, detail="Трюк не найден")
     
+    old_category = db_trick.category
+    track_image_reference(db, db_trick.image_url, trick.image_url)
     for field, value in trick.dict().items():
         setattr(db_trick, field, value)
+    record_change(db, "trick", trick_id)
     
     db.commit()
+    invalidate_catalog()
+    purge("tricks", f"trick-{trick_id}", category_key(old_category), category_key(trick.category))
     db.refresh(db_trick)
+    index_trick(db_trick.id, db_trick.name, db_trick.description)
     return db_trick
 
 @app.delete("/api/admin/tricks/{trick_id}")
@@ -369,10 +501,48 @@ async def delete_trick(
     if not db_trick:
         raise HTTPException(status_code=404, detail="Трюк не найден")
     
+    category = db_trick.category
+    track_image_reference(db, db_trick.image_url, None)
+    db.query(TrickPrerequisite).filter(
+        (TrickPrerequisite.trick_id == trick_id) | (TrickPrerequisite.prerequisite_id == trick_id)
+    ).delete(synchronize_session=False)
+    db.query(QuizAnswer).filter(QuizAnswer.trick_id == trick_id).delete(synchronize_session=False)
+    db.query(QuizTrickStats).filter(QuizTrickStats.trick_id == trick_id).delete(synchronize_session=False)
+    db.query(CardReview).filter(CardReview.trick_id == trick_id).delete(synchronize_session=False)
     db.delete(db_trick)
+    record_change(db, "trick", trick_id, DELETE)
     db.commit()
+    invalidate_catalog()
+    purge("tricks", f"trick-{trick_id}", category_key(category))
+    forget("trick", trick_id)
     return {"message": "Трюк удален"}
 
+@app.put("/api/admin/tricks/{trick_id}/prerequisites")
+async def update_trick_prerequisites(
+    trick_id: int,
+    data: TrickPrerequisitesUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_manager_or_admin_user)
+):
+    """Заменяет прямые зависимости трюка"""
+    graph = trick_graph(db)
+    if trick_id not in graph.names:
+        raise HTTPException(status_code=404, detail="Трюк не найден")
+    
+    prerequisite_ids = sorted(set(data.prerequisite_ids))
+    unknown = [prerequisite_id for prerequisite_id in prerequisite_ids if prerequisite_id not in graph.names]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Трюки не найдены: {unknown}")
+    if graph.creates_cycle(trick_id, prerequisite_ids):
+        raise HTTPException(status_code=400, detail="Зависимость создает цикл")
+    
+    db.query(TrickPrerequisite).filter(TrickPrerequisite.trick_id == trick_id).delete(synchronize_session=False)
+    for prerequisite_id in prerequisite_ids:
+        db.add(TrickPrerequisite(trick_id=trick_id, prerequisite_id=prerequisite_id))
+    db.commit()
+    invalidate_catalog()
+    return {"trick_id": trick_id, "prerequisite_ids": prerequisite_ids}
+
 @app.post("/api/admin/fix-sequence")
 async def fix_tricks_sequence(
     db: Session = Depends(get_db),
@@ -388,14 +558,30 @@ async def fix_tricks_sequence(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Ошибка при исправлении sequence: {str(e)}")
 
+@app.post("/api/admin/uploads/gc", status_code=202)
+async def start_uploads_gc(
+    background_tasks: BackgroundTasks,
+    dry_run: bool = True,
+    current_user: User = Depends(get_admin_user)
+):
+    """Запускает очистку неиспользуемых загрузок в фоне (по умолчанию dry-run)"""
+    if gc_running():
+        raise HTTPException(status_code=409, detail="Очистка уже выполняется")
+    background_tasks.add_task(run_gc, dry_run=dry_run)
+    return {"message": "Очистка запущена", "dry_run": dry_run}
+
+@app.get("/api/admin/uploads/gc")
+async def get_uploads_gc_status(current_user: User = Depends(get_admin_user)):
+    """Статистика последнего прохода очистки загрузок"""
+    return {"running": gc_running(), "last_run": last_gc_stats()}
+
 # Админские эндпоинты для управления пользователями
 @app.get("/api/admin/users", response_model=List[UserResponse])
 async def get_all_users(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_admin_user)
 ):
-    users = db.query(User).all()
-    return users
+    return trusted_response(load_users(db))
 
 @app.put("/api/admin/users/{user_id}", response_model=UserResponse)
 async def update_user(
@@ -418,22 +604,93 @@ async def update_user(
 @app.delete("/api/admin/users/{user_id}")
 async def delete_user(
     user_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_admin_user)
 ):
     if user_id == current_user.id:
         raise HTTPException(status_code=400, detail="Нельзя удалить самого себя")
     
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if not db_user:
+    if not user_exists(db, user_id):
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    db.delete(db_user)
-    db.commit()
-    return {"message": "Пользователь удален"}
+    # Небольшой аккаунт удаляем сразу, крупный - фоновой задачей пачками
+    service = PurgeService(db)
+    if service.estimate_rows(user_id) <= PURGE_SYNC_ROWS:
+        service.purge_users([user_id])
+        return {"message": "Пользователь удален"}
+    
+    job = create_job(db, [user_id], current_user.id)
+    background_tasks.add_task(run_purge_job, job.id)
+    return DefaultResponse(
+        {"message": "Удаление пользователя запущено в фоне", "job_id": job.id},
+        status_code=202
+    )
+
+@app.post("/api/admin/users/purge", status_code=202)
+async def purge_users(
+    request: PurgeRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Массовое удаление пользователей (например, спам-аккаунтов) фоновой задачей"""
+    user_ids = list(dict.fromkeys(request.user_ids))
+    if current_user.id in user_ids:
+        raise HTTPException(status_code=400, detail="Нельзя удалить самого себя")
+    
+    job = create_job(db, user_ids, current_user.id)
+    background_tasks.add_task(run_purge_job, job.id)
+    return {"message": "Удаление запущено", "job_id": job.id, "users_total": job.users_total}
+
+@app.get("/api/admin/purge-jobs/{job_id}")
+async def get_purge_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_admin_user)
+):
+    """Прогресс задачи удаления пользователей"""
+    job = db.get(PurgeJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job_status(job)
+
+# API для синхронизации офлайн-клиентов
+@app.get("/api/sync")
+async def sync_changes(
+    since: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user)
+):
+    """Изменения каталога и своего прогресса после курсора; без курсора - полный снимок"""
+    user_id = current_user.id if current_user else None
+    return trusted_response(SyncService(db).changes(user_id, since))
+
+@app.post("/api/sync", dependencies=[Depends(rate_limit("achievements"))])
+async def sync_upload(
+    data: SyncUpload,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Отметки "изучено", накопленные без сети, одной пачкой"""
+    result = SyncService(db).upload_progress(current_user.id, [mark.dict() for mark in data.progress])
+    
+    new_achievements = []
+    if result["accepted"]:
+        new_achievements = AchievementsService(db).check_user_achievements(current_user.id)
+    result["new_achievements"] = [
+        {
+            "name": ach.name,
+            "description": ach.description,
+            "icon": ach.icon,
+            "points": ach.points
+        }
+        for ach in new_achievements
+    ]
+    return result
 
 # API для прогресса пользователя (только для авторизованных)
-@app.post("/api/users/{user_id}/progress/{trick_id}")
+@app.post("/api/users/{user_id}/progress/{trick_id}", dependencies=[Depends(rate_limit("achievements"))])
 async def mark_trick_learned(
     user_id: int, 
     trick_id: int, 
@@ -460,6 +717,10 @@ async def mark_trick_learned(
     
     progress = UserProgress(user_id=user_id, trick_id=trick_id)
     db.add(progress)
+    UserStatsService(db).increment(user_id, learned_count=1)
+    LearnedSetService(db).add(user_id, trick_id)
+    LeaderboardService(db).record_learned(user_id, trick.category)
+    record_change(db, "progress", trick_id, user_id=user_id)
     db.commit()
     
     # Проверяем новые достижения
@@ -482,102 +743,156 @@ async def mark_trick_learned(
 
 @app.get("/api/users/{user_id}/progress", response_model=List[UserProgressResponse])
 async def get_user_progress(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    if not user_exists(db, user_id):
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    progress = db.query(UserProgress).filter(UserProgress.user_id == user_id).all()
-    return progress
+    return trusted_response(load_user_progress(db, user_id))
 
 @app.get("/api/users/{user_id}/stats")
 async def get_user_stats(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    if not user_exists(db, user_id):
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    total_tricks = db.query(Trick).count()
-    learned_tricks = db.query(UserProgress).filter(UserProgress.user_id == user_id).count()
+    return LearnedSetService(db).progress_stats(user_id)
+
+@app.get("/api/users/{user_id}/dashboard")
+async def get_user_dashboard(
+    user_id: int,
+    include: str = DEFAULT_SECTIONS,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Несколько разделов профиля одним запросом: stats, learned, achievements, all_achievements, rank"""
+    # Как и для достижений: свои данные или любые для админов/менеджеров
+    if current_user.id != user_id and current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
     
-    # Статистика по категориям
-    categories_stats = {}
-    categories = db.query(Trick.category).distinct().all()
+    try:
+        sections = parse_sections(include)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Неизвестные разделы: {e}")
     
-    for cat in categories:
-        category = cat[0]
-        total_in_category = db.query(Trick).filter(Trick.category == category).count()
-        learned_in_category = db.query(UserProgress).join(Trick).filter(
-            UserProgress.user_id == user_id,
-            Trick.category == category
-        ).count()
-        
-        categories_stats[category] = {
-            "total": total_in_category,
-            "learned": learned_in_category,
-            "percentage": round((learned_in_category / total_in_category) * 100, 1) if total_in_category > 0 else 0
-        }
+    if not user_exists(db, user_id):
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    return {
-        "total_tricks": total_tricks,
-        "learned_tricks": learned_tricks,
-        "progress_percentage": round((learned_tricks / total_tricks) * 100, 1) if total_tricks > 0 else 0,
-        "categories": categories_stats
-    }
+    return trusted_response(build_dashboard(db, user_id, sections))
+
+@app.get("/api/users/{user_id}/recommendations")
+async def get_user_recommendations(
+    user_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Что изучить дальше: неизученные трюки, которые чаще всего учат вместе и после изученных"""
+    if current_user.id != user_id and current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    if not recommender.ready():
+        raise HTTPException(status_code=503, detail="Рекомендации еще не готовы, попробуйте позже")
+    
+    # Матрица уже в памяти: из БД нужна только строка с битовой картой пользователя
+    learned, _ = LearnedSetService(db).get(user_id)
+    return recommender.recommend(learned, catalog_masks(db).all, limit)
+
+@app.get("/api/users/{user_id}/learned-set")
+async def get_user_learned_set(
+    user_id: int,
+    request: Request,
+    encoding: str = Query("bitset", pattern="^(bitset|ranges)$"),
+    db: Session = Depends(get_db)
+):
+    """Изученные трюки компактно: base64-битсет (бит N = трюк с id N) или диапазоны id"""
+    if not user_exists(db, user_id):
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    
+    learned, version = LearnedSetService(db).get(user_id)
+    headers = {"ETag": f'"{user_id}-{version}-{encoding}"', "Cache-Control": "private, no-cache"}
+    if version and request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    
+    data = encode_bitset(learned) if encoding == "bitset" else encode_ranges(learned)
+    return DefaultResponse({"encoding": encoding, "count": learned.bit_count(), "data": data}, headers=headers)
+
+@app.get("/api/users/{user_id}/unlocked-tricks")
+async def get_user_unlocked_tricks(user_id: int, db: Session = Depends(get_db)):
+    """Неизученные трюки, все зависимости которых пользователь уже освоил"""
+    if not user_exists(db, user_id):
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    
+    learned, _ = LearnedSetService(db).get(user_id)
+    graph = trick_graph(db)
+    return [
+        {
+            "id": trick_id,
+            "name": graph.names[trick_id],
+            "category": graph.categories[trick_id],
+            "depth": graph.depth[trick_id]
+        }
+        for trick_id in graph.unlocked(learned)
+    ]
 
 @app.get("/api/users/{user_id}/learned-tricks")
 async def get_user_learned_tricks(user_id: int, db: Session = Depends(get_db)):
     """Получить список изученных трюков пользователя"""
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    if not user_exists(db, user_id):
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    # Получаем изученные трюки с информацией о трюке и дате изучения
-    learned_tricks = db.query(UserProgress, Trick).join(
-        Trick, UserProgress.trick_id == Trick.id
-    ).filter(
-        UserProgress.user_id == user_id
-    ).order_by(UserProgress.learned_at.desc()).all()
-    
-    result = []
-    for progress, trick in learned_tricks:
-        result.append({
-            "learned_at": progress.learned_at,
-            "trick": {
-                "id": trick.id,
-                "name": trick.name,
-                "category": trick.category,
-                "description": trick.description,
-                "image_url": trick.image_url,
-                "technique": trick.technique,
-                "video_url": trick.video_url
-            }
-        })
+    # Изученные трюки с информацией о трюке и дате изучения
+    return trusted_response(load_learned_tricks(db, user_id))
+
+# API для флешкарт (интервальное повторение)
+@app.get("/api/flashcards/due", response_model=List[FlashcardResponse])
+async def get_due_flashcards(
+    limit: int = Query(20, ge=1, le=100),
+    category: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Следующие карточки к повторению (просроченные, затем новые)"""
+    flashcards_service = FlashcardsService(db)
+    return trusted_response(flashcards_service.get_due_cards(current_user.id, limit, category))
+
+@app.post("/api/flashcards/{trick_id}/review", response_model=CardReviewResponse)
+async def review_flashcard(
+    trick_id: int,
+    review: CardReviewRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Записать ответ по карточке и запланировать следующий показ"""
+    if not db.query(Trick.id).filter(Trick.id == trick_id).first():
+        raise HTTPException(status_code=404, detail="Трюк не найден")
     
-    return result
+    flashcards_service = FlashcardsService(db)
+    return flashcards_service.review(current_user.id, trick_id, review.grade)
 
 # API для викторин
 @app.get("/api/quiz/random")
 async def get_random_quiz_question(
     category: Optional[str] = None,
     user_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    adaptive: bool = True,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user)
 ):
-    """Получить случайный вопрос для викторины"""
+    """Получить случайный вопрос для викторины; вошедшему пользователю чаще - трюки, где он ошибается"""
     import random
     
-    query = db.query(Trick)
-    if category:
-        query = query.filter(Trick.category == category)
-    
-    tricks = query.all()
+    # Один запрос четырех колонок: и вопрос, и неправильные варианты берутся из этого списка
+    tricks = load_quiz_tricks(db, category)
     if not tricks:
         raise HTTPException(status_code=404, detail="Трюки не найдены")
     
     # Выбираем случайный трюк для вопроса
-    correct_trick = random.choice(tricks)
+    if current_user and adaptive:
+        tricks_by_id = {trick.id: trick for trick in tricks}
+        correct_trick = tricks_by_id[pick_weak_trick(db, current_user.id, list(tricks_by_id))]
+    else:
+        correct_trick = random.choice(tricks)
     
     # Создаем варианты ответов (правильный + 3 неправильных)
-    all_tricks = db.query(Trick).filter(Trick.id != correct_trick.id).all()
-    wrong_answers = random.sample(all_tricks, min(3, len(all_tricks)))
+    other_tricks = [trick for trick in tricks if trick.id != correct_trick.id]
+    wrong_answers = random.sample(other_tricks, min(3, len(other_tricks)))
     
     options = [correct_trick] + wrong_answers
     random.shuffle(options)
@@ -590,22 +905,67 @@ async def get_random_quiz_question(
         "correct_answer_id": correct_trick.id
     }
 
+@app.post("/api/quiz/answers", status_code=202)
+async def record_quiz_answers(
+    data: QuizAnswersRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Ответы викторины: кладутся в буфер и пишутся в БД пачкой"""
+    # Проверка по битовой карте каталога в памяти, без запроса в БД
+    catalog = catalog_masks(db).all
+    unknown = sorted({
+        trick_id
+        for answer in data.answers
+        for trick_id in (answer.trick_id, answer.chosen_trick_id)
+        if trick_id < 0 or not catalog >> trick_id & 1
+    })
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Трюки не найдены: {unknown}")
+    
+    accepted = record_answers(current_user.id, [answer.dict() for answer in data.answers])
+    return {"accepted": accepted}
+
+@app.get("/api/quiz/stats")
+async def get_quiz_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Точность своих ответов по трюкам, от слабых к сильным"""
+    return quiz_stats(db, current_user.id)
+
+@app.get("/api/quiz/difficulty")
+async def get_quiz_difficulty(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_manager_or_admin_user)
+):
+    """Сложность трюков по ответам всех пользователей"""
+    return trick_difficulty(db)
+
 # API для предложений трюков
-@app.post("/api/suggestions/tricks", response_model=TrickSuggestionResponse)
+@app.post("/api/suggestions/tricks", response_model=TrickSuggestionCreated)
 async def suggest_trick(
     suggestion: TrickSuggestionCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Предложить новый трюк (для авторизованных пользователей)"""
+    # Похожие трюки и предложения ищем до добавления, чтобы не найти само предложение
+    possible_duplicates = duplicate_index(db).find(suggestion.name, suggestion.description)
     db_suggestion = TrickSuggestion(
         **suggestion.dict(),
         suggested_by=current_user.id
     )
     db.add(db_suggestion)
+    track_image_reference(db, None, db_suggestion.image_url)
+    UserStatsService(db).increment(current_user.id, suggestions_count=1)
     db.commit()
     db.refresh(db_suggestion)
-    return db_suggestion
+    index_suggestion(db_suggestion.id, db_suggestion.name, db_suggestion.description)
+    
+    response = TrickSuggestionCreated.model_validate(db_suggestion)
+    response.possible_duplicates = [DuplicateCandidate(**item) for item in possible_duplicates]
+    return response
 
 @app.get("/api/suggestions/tricks", response_model=List[TrickSuggestionWithUsers])
 async def get_trick_suggestions(
@@ -614,35 +974,15 @@ async def get_trick_suggestions(
     current_user: User = Depends(get_manager_or_admin_user)
 ):
     """Получить список предложений трюков (для модераторов)"""
-    query = db.query(TrickSuggestion)
-    if status:
-        query = query.filter(TrickSuggestion.status == status)
-    
-    suggestions = query.order_by(TrickSuggestion.created_at.desc()).all()
-    
-    # Добавляем информацию о пользователях
-    result = []
-    for suggestion in suggestions:
-        suggestion_dict = {
-            "id": suggestion.id,
-            "name": suggestion.name,
-            "category": suggestion.category,
-            "description": suggestion.description,
-            "image_url": suggestion.image_url,
-            "technique": suggestion.technique,
-            "video_url": suggestion.video_url,
-            "suggested_by": suggestion.suggested_by,
-            "status": suggestion.status,
-            "moderated_by": suggestion.moderated_by,
-            "moderation_comment": suggestion.moderation_comment,
-            "created_at": suggestion.created_at,
-            "moderated_at": suggestion.moderated_at,
-            "suggester": suggestion.suggester,
-            "moderator": suggestion.moderator
-        }
-        result.append(suggestion_dict)
+    # Один запрос с авторами и модераторами вместо ленивой загрузки на каждую строку
+    suggestions = load_suggestions_with_users(db, status)
     
-    return result
+    # Возможные дубликаты среди трюков и других ожидающих предложений - по индексу в памяти
+    index = duplicate_index(db)
+    for item in suggestions:
+        if item.status == SuggestionStatus.PENDING:
+            item.possible_duplicates = index.find(item.name, item.description, exclude=("suggestion", item.id))
+    return trusted_response(suggestions)
 
 @app.get("/api/users/{user_id}/suggestions", response_model=List[TrickSuggestionResponse])
 async def get_user_suggestions(
@@ -655,11 +995,7 @@ async def get_user_suggestions(
     if current_user.id != user_id and current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(status_code=403, detail="Доступ запрещен")
     
-    suggestions = db.query(TrickSuggestion).filter(
-        TrickSuggestion.suggested_by == user_id
-    ).order_by(TrickSuggestion.created_at.desc()).all()
-    
-    return suggestions
+    return trusted_response(load_user_suggestions(db, user_id))
 
 @app.put("/api/suggestions/tricks/{suggestion_id}/moderate")
 async def moderate_suggestion(
@@ -669,37 +1005,45 @@ async def moderate_suggestion(
     current_user: User = Depends(get_manager_or_admin_user)
 ):
     """Модерировать предложение трюка"""
-    suggestion = db.query(TrickSuggestion).filter(TrickSuggestion.id == suggestion_id).first()
-    if not suggestion:
-        raise HTTPException(status_code=404, detail="Предложение не найдено")
+    if moderation.status == SuggestionStatus.PENDING:
+        raise HTTPException(status_code=400, detail="Статус должен быть approved или rejected")
     
-    if suggestion.status != SuggestionStatus.PENDING:
+    # Та же пачка из одного элемента: блокировка строки не даст одобрить предложение дважды
+    decision = {"id": suggestion_id, "status": moderation.status, "comment": moderation.comment}
+    result = ModerationService(db).moderate([decision], current_user.id)[0]["result"]
+    if result == NOT_FOUND:
+        raise HTTPException(status_code=404, detail="Предложение не найдено")
+    if result == ALREADY_MODERATED:
         raise HTTPException(status_code=400, detail="Предложение уже было модерировано")
-    
-    # Обновляем статус предложения
-    suggestion.status = moderation.status
-    suggestion.moderated_by = current_user.id
-    suggestion.moderation_comment = moderation.comment
-    suggestion.moderated_at = datetime.utcnow()
-    
-    # Если предложение одобрено, создаем трюк
-    if moderation.status == SuggestionStatus.APPROVED:
-        new_trick = Trick(
-            name=suggestion.name,
-            category=suggestion.category,
-            description=suggestion.description,
-            image_url=suggestion.image_url,
-            technique=suggestion.technique,
-            video_url=suggestion.video_url
-        )
-        db.add(new_trick)
-    
-    db.commit()
-    db.refresh(suggestion)
+    if result == LOCKED:
+        raise HTTPException(status_code=409, detail="Предложение сейчас модерирует другой модератор")
     
     return {
         "message": "Предложение успешно модерировано",
-        "status": suggestion.status.value
+        "status": moderation.status.value
+    }
+
+@app.post("/api/suggestions/tricks/moderate:batch")
+async def moderate_suggestions_batch(
+    batch: BatchModerationRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_manager_or_admin_user)
+):
+    """Модерировать несколько предложений одним запросом и одной транзакцией"""
+    ids = [item.id for item in batch.items]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Предложение указано в пачке несколько раз")
+    if any(item.status == SuggestionStatus.PENDING for item in batch.items):
+        raise HTTPException(status_code=400, detail="Статус должен быть approved или rejected")
+    
+    results = ModerationService(db).moderate([item.dict() for item in batch.items], current_user.id)
+    approved = sum(1 for item in results if item["result"] == APPROVED)
+    rejected = sum(1 for item in results if item["result"] == REJECTED)
+    return {
+        "processed": approved + rejected,
+        "approved": approved,
+        "rejected": rejected,
+        "results": results
     }
 
 @app.delete("/api/suggestions/tricks/{suggestion_id}")
@@ -717,16 +1061,19 @@ async def delete_suggestion(
     if suggestion.suggested_by != current_user.id and current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(status_code=403, detail="Доступ запрещен")
     
+    if suggestion.status != SuggestionStatus.REJECTED:  # Ссылку отклоненного сняли при модерации
+        track_image_reference(db, suggestion.image_url, None)
+    UserStatsService(db).increment(suggestion.suggested_by, suggestions_count=-1)
     db.delete(suggestion)
     db.commit()
+    forget("suggestion", suggestion_id)
     return {"message": "Предложение удалено"}
 
 # API для достижений
-@app.get("/api/achievements", response_model=List[AchievementResponse])
+@app.get("/api/achievements", response_model=List[AchievementResponse], dependencies=[Depends(edge_cache("achievements"))])
 async def get_achievements(db: Session = Depends(get_db)):
     """Получить все активные достижения"""
-    achievements = db.query(Achievement).filter(Achievement.is_active == True).all()
-    return achievements
+    return trusted_response(load_active_achievements(db))
 
 @app.get("/api/users/{user_id}/achievements")
 async def get_user_achievements(
@@ -740,18 +1087,22 @@ async def get_user_achievements(
         raise HTTPException(status_code=403, detail="Доступ запрещен")
     
     achievements_service = AchievementsService(db)
-    return achievements_service.get_user_achievements(user_id)
+    return trusted_response(achievements_service.get_user_achievements(user_id))
 
-@app.get("/api/leaderboard")
+@app.get("/api/leaderboard", dependencies=[
+    Depends(rate_limit("leaderboard")), Depends(edge_cache("leaderboard", seconds=LEADERBOARD_CACHE_SECONDS))
+])
 async def get_leaderboard(
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=100),
+    window: str = Query("all", pattern="^(all|week|month)$"),
+    category: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Получить лидерборд по очкам"""
+    """Получить лидерборд по очкам: за все время, текущую неделю или месяц; по категории - по изученным трюкам"""
     achievements_service = AchievementsService(db)
-    return achievements_service.get_leaderboard(limit)
+    return trusted_response(achievements_service.get_leaderboard(limit, window, category))
 
-@app.post("/api/users/{user_id}/check-achievements")
+@app.post("/api/users/{user_id}/check-achievements", dependencies=[Depends(rate_limit("achievements"))])
 async def check_user_achievements(
     user_id: int,
     db: Session = Depends(get_db),
@@ -776,6 +1127,28 @@ async def check_user_achievements(
         ]
     }
 
+# Push-канал событий (Server-Sent Events)
+@app.get("/api/events")
+async def events_stream(request: Request, token: Optional[str] = None):
+    """Поток событий: новые достижения пользователя и обновления лидерборда"""
+    # EventSource не умеет передавать заголовки, поэтому токен приходит в query
+    channels = [LEADERBOARD_CHANNEL]
+    if token:
+        # Короткая сессия: соединение с БД не держится, пока открыт поток
+        db = SessionLocal()
+        try:
+            user = await get_current_user(token, db)
+        finally:
+            db.close()
+        channels.append(user_channel(user.id))
+
+    subscription = broker.subscribe(channels)
+    return StreamingResponse(
+        event_stream(subscription, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Админские эндпоинты для достижений
 @app.post("/api/admin/achievements", response_model=AchievementResponse)
 async def create_achievement(
@@ -787,31 +1160,19 @@ async def create_achievement(
     db_achievement = Achievement(**achievement.dict())
     db.add(db_achievement)
     db.commit()
+    purge("achievements")
     db.refresh(db_achievement)
     return db_achievement
 
 # Endpoint для загрузки изображений
-@app.post("/api/upload/image")
+@app.post("/api/upload/image", dependencies=[Depends(rate_limit("upload"))])
 async def upload_image(
     file: UploadFile = File(...),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Загрузка изображения на сервер"""
     
-    # Проверка размера файла
-    file_size = 0
-    content = await file.read()
-    file_size = len(content)
-    
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=413, 
-            detail=f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE // (1024*1024)}MB"
-        )
-    
-    # Сбрасываем указатель файла
-    await file.seek(0)
-    
     # Валидация файла
     if not validate_image_file(file):
         raise HTTPException(
@@ -819,9 +1180,12 @@ async def upload_image(
             detail="Неподдерживаемый формат файла. Разрешены: JPG, PNG, GIF, WebP"
         )
     
+    # Читаем кусками: слишком большой файл отклоняется, не занимая память целиком
+    content = await read_upload(file)
+    
     try:
-        # Сохраняем изображение
-        image_url = await save_uploaded_image(file)
+        # Сохраняем изображение (повторная загрузка того же файла вернет тот же URL)
+        image_url = await save_uploaded_image(db, content)
         
         return {
             "success": True,
@@ -829,6 +1193,8 @@ async def upload_image(
             "message": "Изображение успешно загружено"
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Ошибка при загрузке изображения: {e}")
         raise HTTPException(
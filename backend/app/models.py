@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, UniqueConstraint, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, UniqueConstraint, Enum, Float, Index, LargeBinary, Date
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -129,3 +129,155 @@ class UserAchievement(Base):
     __table_args__ = (
         UniqueConstraint('user_id', 'achievement_id', name='unique_user_achievement'),
     )
+
+class CardReview(Base):
+    __tablename__ = "card_reviews"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    trick_id = Column(Integer, ForeignKey("tricks.id"), nullable=False)
+    
+    # Состояние интервального повторения (SM-2)
+    due_at = Column(DateTime(timezone=True), nullable=False)  # Когда показать снова
+    interval_days = Column(Float, default=0, nullable=False)
+    ease_factor = Column(Float, default=2.5, nullable=False)
+    repetitions = Column(Integer, default=0, nullable=False)  # Успешных повторений подряд
+    lapses = Column(Integer, default=0, nullable=False)  # Сколько раз забывал
+    last_reviewed_at = Column(DateTime(timezone=True))
+    
+    # Связи
+    trick = relationship("Trick")
+    
+    __table_args__ = (
+        UniqueConstraint('user_id', 'trick_id', name='unique_user_card'),
+        # Очередь карточек к повторению: range scan по (user_id, due_at)
+        Index('ix_card_reviews_user_due', 'user_id', 'due_at'),
+    )
+
+class StoredImage(Base):
+    __tablename__ = "stored_images"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, nullable=False)  # Хэш обработанного файла (имя на диске)
+    source_sha256 = Column(String(64), nullable=False, index=True)  # Хэш исходной загрузки (для дедупликации до Pillow)
+    path = Column(String(200), nullable=False)  # Относительный путь: images/ab/cd/<sha256>.webp
+    size_bytes = Column(Integer, nullable=False)
+    ref_count = Column(Integer, default=0, nullable=False)  # Сколько трюков и предложений ссылаются на файл
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+    
+    # Денормализованные счетчики: обновляются в той же транзакции, что и исходные данные
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    learned_count = Column(Integer, default=0, nullable=False)
+    total_points = Column(Integer, default=0, nullable=False)
+    achievements_count = Column(Integer, default=0, nullable=False)
+    suggestions_count = Column(Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        # Лидерборд: top-N по очкам без агрегации
+        Index('ix_user_stats_points', 'total_points'),
+    )
+
+class UserLearnedSet(Base):
+    __tablename__ = "user_learned_sets"
+    
+    # Битовая карта изученных трюков: бит N (младший бит первым) = трюк с id N
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    bits = Column(LargeBinary, nullable=False, default=b"")
+    version = Column(Integer, nullable=False, default=1)  # Растет при каждом изменении (ETag)
+
+class LeaderboardBucket(Base):
+    __tablename__ = "leaderboard_buckets"
+    
+    # Агрегаты пользователя за период: week/month (с начала периода) или all (только по категориям)
+    period = Column(String(10), primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    category = Column(String(50), primary_key=True, default="")  # "" - все категории
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    points = Column(Integer, default=0, nullable=False)
+    achievements_count = Column(Integer, default=0, nullable=False)
+    learned_count = Column(Integer, default=0, nullable=False)
+    
+    __table_args__ = (
+        # Top-N внутри одного периода не зависит от объема истории
+        Index('ix_leaderboard_buckets_points', 'period', 'period_start', 'category', 'points'),
+        Index('ix_leaderboard_buckets_learned', 'period', 'period_start', 'category', 'learned_count'),
+    )
+
+class TrickPrerequisite(Base):
+    __tablename__ = "trick_prerequisites"
+    
+    # Ребро графа: trick_id нельзя учить раньше prerequisite_id
+    trick_id = Column(Integer, ForeignKey("tricks.id"), primary_key=True)
+    prerequisite_id = Column(Integer, ForeignKey("tricks.id"), primary_key=True, index=True)
+
+class PurgeJob(Base):
+    __tablename__ = "purge_jobs"
+    
+    # Фоновое удаление пользователей со всеми их данными (app.purge)
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), default="queued", nullable=False)  # queued, running, done, failed
+    user_ids = Column(Text, nullable=False)  # JSON-список id
+    requested_by = Column(Integer)  # Без внешнего ключа: администратора тоже могут удалить
+    users_total = Column(Integer, default=0, nullable=False)
+    users_done = Column(Integer, default=0, nullable=False)
+    rows_deleted = Column(Integer, default=0, nullable=False)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    
+    # Сессия устройства: одна строка на вход, при каждом обновлении токен в ней меняется
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False)  # HMAC-SHA256 текущего токена
+    previous_hash = Column(String(64), index=True)  # Предыдущий токен: его повторное использование - признак кражи
+    device = Column(String(200))  # User-Agent при входе
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True))
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True))
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+    
+    # Журнал изменений для дельта-синхронизации клиентов; id - монотонный курсор
+    id = Column(Integer, primary_key=True)
+    entity = Column(String(20), nullable=False)  # trick, progress, achievement
+    entity_id = Column(Integer, nullable=False)  # id трюка или достижения
+    op = Column(String(10), nullable=False)  # upsert, delete
+    user_id = Column(Integer, ForeignKey("users.id"))  # NULL - изменение каталога, видно всем
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    
+    __table_args__ = (
+        Index('ix_change_log_user', 'user_id', 'id'),
+        Index('ix_change_log_created', 'created_at'),
+        # SQLite без AUTOINCREMENT после очистки журнала выдал бы id заново - курсоры клиентов сломались бы
+        {'sqlite_autoincrement': True},
+    )
+
+class QuizAnswer(Base):
+    __tablename__ = "quiz_answers"
+    
+    # Ответы викторины: пишутся пачками из буфера в памяти (app.quiz_answers)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    trick_id = Column(Integer, ForeignKey("tricks.id"), nullable=False)  # Трюк в вопросе
+    chosen_trick_id = Column(Integer, nullable=False)  # Выбранный вариант
+    correct = Column(Boolean, nullable=False)
+    answered_at = Column(DateTime(timezone=True), nullable=False)
+
+class QuizTrickStats(Base):
+    __tablename__ = "quiz_trick_stats"
+    
+    # Точность ответов пользователя по трюку: обновляется при сбросе буфера ответов
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    trick_id = Column(Integer, ForeignKey("tricks.id"), primary_key=True, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    correct = Column(Integer, default=0, nullable=False)
+    last_answered_at = Column(DateTime(timezone=True))
@@ -0,0 +1,123 @@
+"""Модерация предложений трюков, в том числе пачкой.
+
+Все предложения пачки блокируются одним SELECT ... FOR UPDATE SKIP LOCKED:
+строки, которые сейчас модерирует кто-то другой, пропускаются (результат
+locked), а не ждут чужой транзакции. Одобренные трюки вставляются одним
+INSERT, статусы - одним UPDATE по первичным ключам, версия каталога
+сбрасывается один раз после коммита.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from .duplicates import forget, index_trick
+from .edge_cache import category_key, purge
+from .images import add_image_references, remove_image_references
+from .learned_sets import invalidate_catalog
+from .models import SuggestionStatus, Trick, TrickSuggestion
+from .sync import record_changes
+
+# Результаты по каждому предложению
+APPROVED = "approved"
+REJECTED = "rejected"
+NOT_FOUND = "not_found"
+ALREADY_MODERATED = "already_moderated"
+LOCKED = "locked"  # Модерируется параллельно другим запросом
+
+TRICK_FIELDS = ("name", "category", "description", "image_url", "technique", "video_url")
+
+
+class ModerationService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def moderate(self, decisions: List[dict], moderator_id: int) -> List[dict]:
+        """Решения [{id, status, comment}] в одной транзакции; результаты - в порядке запроса"""
+        ids = [decision["id"] for decision in decisions]
+        locked = {
+            row.id: row
+            for row in self.db.execute(
+                select(TrickSuggestion.id, *(getattr(TrickSuggestion, name) for name in TRICK_FIELDS))
+                .where(TrickSuggestion.id.in_(ids), TrickSuggestion.status == SuggestionStatus.PENDING)
+                .with_for_update(skip_locked=True)
+            )
+        }
+        skipped = self._skipped_results(set(ids) - set(locked))
+
+        moderated_at = datetime.utcnow()
+        status_updates, approved, rejected = [], [], []
+        for decision in decisions:
+            if decision["id"] not in locked:
+                continue
+            status_updates.append({
+                "id": decision["id"],
+                "status": decision["status"],
+                "moderated_by": moderator_id,
+                "moderation_comment": decision.get("comment"),
+                "moderated_at": moderated_at,
+            })
+            if decision["status"] == SuggestionStatus.APPROVED:
+                approved.append(decision["id"])
+            elif decision["status"] == SuggestionStatus.REJECTED:
+                rejected.append(decision["id"])
+
+        trick_ids: Dict[int, int] = {}
+        if status_updates:
+            self.db.execute(update(TrickSuggestion), status_updates)
+        if rejected:
+            # Отклоненное предложение изображение не держит: сборщик мусора удалит файл, если он больше нигде не нужен
+            remove_image_references(self.db, [locked[suggestion_id].image_url for suggestion_id in rejected])
+        if approved:
+            rows = [{name: getattr(locked[suggestion_id], name) for name in TRICK_FIELDS} for suggestion_id in approved]
+            created = self.db.scalars(
+                insert(Trick).returning(Trick.id, sort_by_parameter_order=True), rows
+            ).all()
+            trick_ids = dict(zip(approved, created))
+            add_image_references(self.db, [row["image_url"] for row in rows])
+            record_changes(self.db, "trick", created)
+        self.db.commit()
+
+        # Производные каталога в памяти воркера - только после успешного коммита
+        for suggestion_id in locked:
+            forget("suggestion", suggestion_id)
+        if approved:
+            invalidate_catalog()
+            purge(
+                "tricks",
+                *{category_key(locked[suggestion_id].category) for suggestion_id in approved},
+                *(f"trick-{trick_id}" for trick_id in created),
+            )
+            for suggestion_id in approved:
+                row = locked[suggestion_id]
+                index_trick(trick_ids[suggestion_id], row.name, row.description)
+
+        results = []
+        for decision in decisions:
+            suggestion_id = decision["id"]
+            if suggestion_id in skipped:
+                results.append({"id": suggestion_id, "result": skipped[suggestion_id]})
+            elif decision["status"] == SuggestionStatus.APPROVED:
+                results.append({"id": suggestion_id, "result": APPROVED, "trick_id": trick_ids[suggestion_id]})
+            else:
+                results.append({"id": suggestion_id, "result": REJECTED})
+        return results
+
+    def _skipped_results(self, ids: set) -> Dict[int, str]:
+        """Почему предложение не попало в пачку: нет, уже отмодерировано или заблокировано"""
+        if not ids:
+            return {}
+        statuses = dict(self.db.execute(
+            select(TrickSuggestion.id, TrickSuggestion.status).where(TrickSuggestion.id.in_(ids))
+        ).all())
+        results = {}
+        for suggestion_id in ids:
+            status: Optional[SuggestionStatus] = statuses.get(suggestion_id)
+            if status is None:
+                results[suggestion_id] = NOT_FOUND
+            elif status != SuggestionStatus.PENDING:
+                results[suggestion_id] = ALREADY_MODERATED
+            else:
+                results[suggestion_id] = LOCKED
+        return results
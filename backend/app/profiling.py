@@ -0,0 +1,214 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+# Настройки профилирования (по семплированию; заголовок - только если явно разрешен,
+# иначе любой гость включает профилирование и получает Server-Timing)
+PROFILE_HEADER = "x-profile-request"
+PROFILE_HEADER_ENABLED = os.getenv("PROFILE_HEADER_ENABLED", "false").lower() == "true"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+_current_profile: contextvars.ContextVar = contextvars.ContextVar("request_profile", default=None)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_IN_LIST_RE = re.compile(r"\((?:\s*(?:\?|%\([^)]+\)s|%s)\s*,)+\s*(?:\?|%\([^)]+\)s|%s)\s*\)")
+
+
+def _statement_shape(statement: str) -> str:
+    """Нормализует SQL-запрос: одинаковые по структуре запросы дают одну форму"""
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    shape = _IN_LIST_RE.sub("(...)", shape)
+    return _NUMBER_RE.sub("N", shape)
+
+
+def _params_shape(parameters, executemany: bool):
+    """Описывает параметры запроса типами, без значений"""
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = parameters[0] if parameters else None
+        return {"executemany": len(parameters), "row": _params_shape(first, False)}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+class RequestProfile:
+    """Собранные за один HTTP-запрос SQL-запросы и тайминги"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.endpoint_finished: Optional[float] = None
+        self.response_started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.queries = []
+
+    def add_query(self, statement: str, duration_ms: float, params_shape) -> None:
+        self.queries.append({
+            "statement": statement,
+            "duration_ms": round(duration_ms, 3),
+            "params": params_shape,
+        })
+
+    @property
+    def db_ms(self) -> float:
+        return sum(q["duration_ms"] for q in self.queries)
+
+    def _elapsed_ms(self, end: Optional[float]) -> float:
+        end = end if end is not None else time.perf_counter()
+        return (end - self.started) * 1000
+
+    @property
+    def total_ms(self) -> float:
+        return self._elapsed_ms(self.finished)
+
+    @property
+    def serialize_ms(self) -> float:
+        """Время между возвратом из эндпоинта и началом отправки ответа"""
+        if self.endpoint_finished is None or self.response_started is None:
+            return 0.0
+        return max((self.response_started - self.endpoint_finished) * 1000, 0.0)
+
+    def n_plus_one(self) -> list:
+        """Формы запросов, повторившиеся подозрительно много раз"""
+        counts = Counter(_statement_shape(q["statement"]) for q in self.queries)
+        return [
+            {"shape": shape, "count": count}
+            for shape, count in counts.most_common()
+            if count >= N_PLUS_ONE_THRESHOLD
+        ]
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing для devtools браузера"""
+        response_ms = self._elapsed_ms(self.response_started)
+        db_ms = self.db_ms
+        serialize_ms = self.serialize_ms
+        app_ms = max(response_ms - db_ms - serialize_ms, 0.0)
+        return ", ".join([
+            f'db;dur={db_ms:.1f};desc="{len(self.queries)} queries"',
+            f"app;dur={app_ms:.1f}",
+            f"serialize;dur={serialize_ms:.1f}",
+            f"total;dur={response_ms:.1f}",
+        ])
+
+    def to_log(self) -> dict:
+        return {
+            "event": "slow_request",
+            "method": self.method,
+            "path": self.path,
+            "status": self.status_code,
+            "duration_ms": round(self.total_ms, 3),
+            "db_ms": round(self.db_ms, 3),
+            "serialize_ms": round(self.serialize_ms, 3),
+            "query_count": len(self.queries),
+            "n_plus_one": self.n_plus_one(),
+            "queries": self.queries,
+        }
+
+
+def get_current_profile() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+
+def install_sql_profiler(engine) -> None:
+    """Подписывается на события курсора; без активного профиля ничего не пишет"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_profile.get() is not None:
+            conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = _current_profile.get()
+        starts = conn.info.get("profile_query_start")
+        if profile is None or not starts:
+            return
+        duration_ms = (time.perf_counter() - starts.pop()) * 1000
+        profile.add_query(statement, duration_ms, _params_shape(parameters, executemany))
+
+
+def _should_profile(scope) -> bool:
+    if PROFILE_HEADER_ENABLED:
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER.encode() and value.strip() not in (b"", b"0", b"false"):
+                return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: профилирует выбранные запросы и пишет лог медленных"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = _current_profile.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                profile.response_started = time.perf_counter()
+                profile.status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", profile.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(token)
+            profile.finished = time.perf_counter()
+            if profile.total_ms >= SLOW_REQUEST_MS:
+                print(json.dumps(profile.to_log(), ensure_ascii=False, default=str))
+
+
+def _mark_endpoint_finished(endpoint):
+    """Оборачивает эндпоинт, чтобы отделить его работу от сериализации ответа"""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profile = _current_profile.get()
+                if profile is not None:
+                    profile.endpoint_finished = time.perf_counter()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                profile = _current_profile.get()
+                if profile is not None:
+                    profile.endpoint_finished = time.perf_counter()
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Маршрут, отмечающий момент завершения эндпоинта в профиле запроса"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _mark_endpoint_finished(endpoint), **kwargs)
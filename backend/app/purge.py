@@ -0,0 +1,277 @@
+"""Удаление пользователей вместе со всеми их данными.
+
+Каскадов в моделях нет, а db.delete(user) через ORM загрузил бы дочерние
+строки в память. Поэтому данные удаляются множественными DELETE ... WHERE
+user_id IN (...) пачками по PURGE_BATCH_SIZE строк с коммитом после каждой:
+блокировки на горячих таблицах (user_progress, user_achievements) держатся
+недолго. Таблицы с данными пользователя перечислены в USER_OWNED_TABLES -
+новую таблицу с user_id нужно добавить туда.
+
+Небольшие аккаунты удаляются сразу, крупные и массовые удаления идут
+фоновой задачей (purge_jobs) с прогрессом; прерванную задачу можно
+продолжить, уже удаленные пачки пользователей повторно не обходятся.
+
+Запуск: python -m app.purge --users 12,34 | --job 5
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .duplicates import reset_index
+from .events import mark_leaderboard_dirty
+from .images import remove_image_references
+from .models import (
+    CardReview, ChangeLog, LeaderboardBucket, PurgeJob, QuizAnswer, QuizTrickStats, RefreshToken, SuggestionStatus, TrickSuggestion, User, UserAchievement,
+    UserLearnedSet, UserProgress, UserStats
+)
+from .user_stats_service import UserStatsService
+
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "1000"))
+PURGE_SYNC_ROWS = int(os.getenv("PURGE_SYNC_ROWS", "1000"))  # Больше - удаление уходит в фоновую задачу
+PURGE_PAUSE_SECONDS = float(os.getenv("PURGE_PAUSE_SECONDS", "0"))  # Пауза между пачками для разгрузки БД
+PURGE_USER_CHUNK = 100
+PURGE_RETRIES = 3
+
+# Колонки-владельцы данных пользователя; удаляются в этом порядке, users - последней
+USER_OWNED_TABLES = (
+    UserProgress.user_id,
+    UserAchievement.user_id,
+    CardReview.user_id,
+    TrickSuggestion.suggested_by,
+    LeaderboardBucket.user_id,
+    UserLearnedSet.user_id,
+    RefreshToken.user_id,
+    ChangeLog.user_id,
+    QuizAnswer.user_id,
+    QuizTrickStats.user_id,
+    UserStats.user_id,
+)
+
+
+class PurgeService:
+    def __init__(self, db: Session, batch_size: int = PURGE_BATCH_SIZE, pause: float = PURGE_PAUSE_SECONDS):
+        self.db = db
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def estimate_rows(self, user_id: int) -> int:
+        """Объем данных пользователя по счетчикам user_stats, без COUNT по таблицам"""
+        stats = UserStatsService(self.db).get(user_id)
+        # Карточек не больше, чем трюков: изученные дают порядок величины
+        return 2 * stats.learned_count + stats.achievements_count + stats.suggestions_count
+
+    def _sleep(self) -> None:
+        if self.pause > 0:
+            time.sleep(self.pause)
+
+    def _delete_owned(self, column, user_ids: List[int]) -> int:
+        """Строки таблицы, принадлежащие пользователям, пачками по первичному ключу"""
+        model = column.class_
+        if model is TrickSuggestion:
+            return self._delete_suggestions(user_ids)
+        key = getattr(model, "id", None)
+        if key is None:
+            # Таблицы без суррогатного ключа (счетчики, корзины) - несколько строк на пользователя
+            result = self.db.execute(
+                delete(model).where(column.in_(user_ids)).execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+            return result.rowcount
+
+        deleted = 0
+        while True:
+            chunk = select(key).where(column.in_(user_ids)).limit(self.batch_size).scalar_subquery()
+            result = self.db.execute(
+                delete(model).where(key.in_(chunk)).execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+            deleted += result.rowcount
+            if result.rowcount < self.batch_size:
+                return deleted
+            self._sleep()
+
+    def _delete_suggestions(self, user_ids: List[int]) -> int:
+        """Предложения удаляются вместе со ссылками на их изображения"""
+        deleted = 0
+        while True:
+            rows = self.db.execute(
+                select(TrickSuggestion.id, TrickSuggestion.image_url, TrickSuggestion.status)
+                .where(TrickSuggestion.suggested_by.in_(user_ids))
+                .limit(self.batch_size)
+            ).all()
+            if not rows:
+                return deleted
+            # Ссылки отклоненных предложений уже сняты при модерации
+            remove_image_references(self.db, [
+                row.image_url for row in rows if row.status != SuggestionStatus.REJECTED
+            ])
+            self.db.execute(
+                delete(TrickSuggestion)
+                .where(TrickSuggestion.id.in_([row.id for row in rows]))
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+            deleted += len(rows)
+            if len(rows) < self.batch_size:
+                return deleted
+            self._sleep()
+
+    def _purge_chunk(self, user_ids: List[int], on_chunk: Optional[Callable[[int, int], None]]) -> int:
+        # Выключенный пользователь не пройдет get_current_active_user и не добавит новых строк
+        self.db.execute(
+            update(User).where(User.id.in_(user_ids)).values(is_active=False)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+
+        for attempt in range(PURGE_RETRIES):
+            deleted = sum(self._delete_owned(column, user_ids) for column in USER_OWNED_TABLES)
+            # Отмодерированные ими предложения остаются, без ссылки на модератора
+            self.db.execute(
+                update(TrickSuggestion).where(TrickSuggestion.moderated_by.in_(user_ids))
+                .values(moderated_by=None).execution_options(synchronize_session=False)
+            )
+            try:
+                result = self.db.execute(
+                    delete(User).where(User.id.in_(user_ids)).execution_options(synchronize_session=False)
+                )
+                deleted += result.rowcount
+                if on_chunk:
+                    # Прогресс задачи коммитится вместе с удалением пачки
+                    on_chunk(len(user_ids), deleted)
+                self.db.commit()
+                return deleted
+            except IntegrityError:
+                # Запрос, начатый до выключения, успел добавить строку - чистим еще раз
+                self.db.rollback()
+        raise RuntimeError(f"Не удалось удалить пользователей {user_ids}: данные продолжают появляться")
+
+    def purge_users(self, user_ids: List[int],
+                    on_chunk: Optional[Callable[[int, int], None]] = None) -> int:
+        """Удаляет пользователей и все их данные; возвращает число удаленных строк"""
+        total = 0
+        for start in range(0, len(user_ids), PURGE_USER_CHUNK):
+            total += self._purge_chunk(user_ids[start:start + PURGE_USER_CHUNK], on_chunk)
+        # Кэши в памяти процесса, которые могли ссылаться на удаленных
+        reset_index()
+        mark_leaderboard_dirty()
+        return total
+
+
+def create_job(db: Session, user_ids: List[int], requested_by: Optional[int] = None) -> PurgeJob:
+    job = PurgeJob(
+        status="queued",
+        user_ids=json.dumps(user_ids),
+        requested_by=requested_by,
+        users_total=len(user_ids)
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def job_status(job: PurgeJob) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "users_total": job.users_total,
+        "users_done": job.users_done,
+        "rows_deleted": job.rows_deleted,
+        "progress_percentage": round(job.users_done / job.users_total * 100, 1) if job.users_total else 100.0,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def run_purge_job(job_id: int) -> bool:
+    """Выполняет (или продолжает) задачу со своей сессией; False, если ее уже взял другой процесс"""
+    db = SessionLocal()
+    try:
+        claimed = db.execute(
+            update(PurgeJob)
+            .where(PurgeJob.id == job_id, PurgeJob.status.in_(("queued", "failed")))
+            .values(status="running", started_at=datetime.utcnow(), error=None)
+        )
+        db.commit()
+        if claimed.rowcount == 0:
+            return False
+
+        job = db.get(PurgeJob, job_id)
+        remaining = json.loads(job.user_ids)[job.users_done:]
+
+        def on_chunk(users: int, rows: int) -> None:
+            db.execute(
+                update(PurgeJob).where(PurgeJob.id == job_id).values(
+                    users_done=PurgeJob.users_done + users,
+                    rows_deleted=PurgeJob.rows_deleted + rows
+                )
+            )
+
+        started = time.perf_counter()
+        try:
+            PurgeService(db).purge_users(remaining, on_chunk)
+        except Exception as e:
+            db.rollback()
+            db.execute(update(PurgeJob).where(PurgeJob.id == job_id).values(status="failed", error=str(e)))
+            db.commit()
+            print(f"Ошибка удаления пользователей (задача {job_id}): {e}")
+            return True
+
+        db.execute(
+            update(PurgeJob).where(PurgeJob.id == job_id).values(status="done", finished_at=datetime.utcnow())
+        )
+        db.commit()
+        db.refresh(job)
+        print(json.dumps({
+            "event": "purge_job",
+            "job_id": job_id,
+            "users": job.users_done,
+            "rows_deleted": job.rows_deleted,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }))
+        return True
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Удаление пользователей со всеми данными")
+    parser.add_argument("--users", help="id через запятую: создать задачу и выполнить ее")
+    parser.add_argument("--job", type=int, help="продолжить задачу (queued или failed)")
+    args = parser.parse_args()
+
+    if args.users:
+        db = SessionLocal()
+        try:
+            job_id = create_job(db, [int(user_id) for user_id in args.users.split(",")]).id
+        finally:
+            db.close()
+    elif args.job:
+        job_id = args.job
+    else:
+        parser.print_help()
+        return
+
+    if not run_purge_job(job_id):
+        print(f"Задача {job_id} уже выполняется или завершена")
+        return
+    db = SessionLocal()
+    try:
+        print(job_status(db.get(PurgeJob, job_id)))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
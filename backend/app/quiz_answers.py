@@ -0,0 +1,259 @@
+"""Запись ответов викторины через буфер в памяти (write-behind).
+
+Ответ не пишется в БД в запросе: он попадает в буфер процесса, а фоновая
+задача сбрасывает буфер раз в QUIZ_FLUSH_INTERVAL_MS миллисекунд или сразу,
+как набралось QUIZ_FLUSH_ROWS ответов. Сброс - одна транзакция: пакетный
+INSERT в quiz_answers и один INSERT ... ON CONFLICT DO UPDATE по
+агрегату quiz_trick_stats (попытки и верные ответы пользователя по трюку).
+При остановке приложения буфер сбрасывается до конца.
+
+Агрегат используется для подбора вопросов: трюки, на которых пользователь
+ошибается, выпадают чаще.
+"""
+import asyncio
+import os
+import random
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func, insert, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .database import SessionLocal
+from .models import QuizAnswer, QuizTrickStats, Trick, User
+
+QUIZ_FLUSH_INTERVAL_MS = float(os.getenv("QUIZ_FLUSH_INTERVAL_MS", "500"))
+QUIZ_FLUSH_ROWS = int(os.getenv("QUIZ_FLUSH_ROWS", "500"))
+QUIZ_BUFFER_MAX = int(os.getenv("QUIZ_BUFFER_MAX", "20000"))  # Больше (БД недоступна) - старые ответы теряются
+
+
+class AnswerBuffer:
+    """Буфер ответов процесса; add() вызывается из обработчиков, сброс - фоновой задачей"""
+
+    def __init__(self, flush_interval_ms: float = QUIZ_FLUSH_INTERVAL_MS, flush_rows: int = QUIZ_FLUSH_ROWS,
+                 max_rows: int = QUIZ_BUFFER_MAX):
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_rows = flush_rows
+        self.max_rows = max_rows
+        self._rows: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Сброс из задачи и при остановке не идут одновременно
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushed = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, rows: List[dict]) -> None:
+        """Вызывается из event loop"""
+        with self._lock:
+            self._rows.extend(rows)
+            self._trim()
+            full = len(self._rows) >= self.flush_rows
+        if full and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _trim(self) -> None:
+        overflow = len(self._rows) - self.max_rows
+        if overflow > 0:
+            del self._rows[:overflow]
+            self.dropped += overflow
+
+    def flush(self) -> int:
+        """Пишет накопленное в БД; при ошибке возвращает ответы в буфер"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            db = SessionLocal()
+            try:
+                written = write_answers(db, rows)
+            except Exception as e:
+                db.rollback()
+                # Возвращаем перед ответами, пришедшими за время сброса; следующая попытка - по таймеру
+                with self._lock:
+                    self._rows[:0] = rows
+                    self._trim()
+                print(f"Ошибка записи ответов викторины ({len(rows)} в буфере): {e}")
+                return 0
+            finally:
+                db.close()
+            self.flushed += written
+            return written
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await run_in_threadpool(self.flush)
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает задачу и сбрасывает остаток"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        written = await run_in_threadpool(self.flush)
+        if written or len(self):
+            print(f"Ответы викторины при остановке: записано {written}, не записано {len(self)}")
+
+
+def _aggregate(rows: List[dict]) -> List[dict]:
+    stats: Dict[Tuple[int, int], dict] = {}
+    for row in rows:
+        key = (row["user_id"], row["trick_id"])
+        item = stats.setdefault(key, {
+            "user_id": row["user_id"], "trick_id": row["trick_id"],
+            "attempts": 0, "correct": 0, "last_answered_at": row["answered_at"]
+        })
+        item["attempts"] += 1
+        item["correct"] += int(row["correct"])
+        item["last_answered_at"] = max(item["last_answered_at"], row["answered_at"])
+    return list(stats.values())
+
+
+def _write(db: Session, rows: List[dict]) -> None:
+    # executemany: SQLAlchemy собирает его в многострочные INSERT ... VALUES
+    db.execute(insert(QuizAnswer), rows)
+    upsert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+    statement = upsert(QuizTrickStats).values(_aggregate(rows))
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "trick_id"],
+        set_={
+            "attempts": QuizTrickStats.attempts + statement.excluded.attempts,
+            "correct": QuizTrickStats.correct + statement.excluded.correct,
+            # Офлайн-ответы приходят с опозданием и старым временем: назад не откатываем
+            "last_answered_at": case(
+                (or_(
+                    QuizTrickStats.last_answered_at.is_(None),
+                    statement.excluded.last_answered_at > QuizTrickStats.last_answered_at
+                ), statement.excluded.last_answered_at),
+                else_=QuizTrickStats.last_answered_at
+            ),
+        }
+    )
+    db.execute(statement)
+    db.commit()
+
+
+def write_answers(db: Session, rows: List[dict]) -> int:
+    """Одна транзакция на пачку; ответы удаленных пользователей и трюков отбрасываются"""
+    try:
+        _write(db, rows)
+        return len(rows)
+    except IntegrityError:
+        db.rollback()
+    user_ids = set(db.scalars(select(User.id).where(User.id.in_({row["user_id"] for row in rows}))))
+    trick_ids = set(db.scalars(select(Trick.id).where(Trick.id.in_({row["trick_id"] for row in rows}))))
+    valid = [row for row in rows if row["user_id"] in user_ids and row["trick_id"] in trick_ids]
+    if valid:
+        _write(db, valid)
+    if len(valid) < len(rows):
+        print(f"Отброшено ответов викторины удаленных пользователей или трюков: {len(rows) - len(valid)}")
+    return len(valid)
+
+
+answer_buffer = AnswerBuffer()
+
+
+def _answered_at(value: Optional[datetime], now: datetime) -> datetime:
+    # Время с устройства - в UTC без tzinfo, как в БД; из будущего не принимаем
+    if value is None:
+        return now
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(value, now)
+
+
+def record_answers(user_id: int, answers: List[dict]) -> int:
+    """Кладет ответы [{trick_id, chosen_trick_id, answered_at}] в буфер"""
+    now = datetime.utcnow()
+    answer_buffer.add([
+        {
+            "user_id": user_id,
+            "trick_id": answer["trick_id"],
+            "chosen_trick_id": answer["chosen_trick_id"],
+            "correct": answer["chosen_trick_id"] == answer["trick_id"],
+            "answered_at": _answered_at(answer.get("answered_at"), now),
+        }
+        for answer in answers
+    ])
+    return len(answers)
+
+
+def pick_weak_trick(db: Session, user_id: int, trick_ids: List[int]) -> int:
+    """Случайный трюк с весом по доле ошибок пользователя (со сглаживанием: новые трюки - 0.5)"""
+    stats = dict(
+        (trick_id, (attempts, correct))
+        for trick_id, attempts, correct in db.execute(
+            select(QuizTrickStats.trick_id, QuizTrickStats.attempts, QuizTrickStats.correct)
+            .where(QuizTrickStats.user_id == user_id)
+        )
+    )
+    weights = []
+    for trick_id in trick_ids:
+        attempts, correct = stats.get(trick_id, (0, 0))
+        weights.append((attempts - correct + 1) / (attempts + 2))
+    return random.choices(trick_ids, weights=weights)[0]
+
+
+def quiz_stats(db: Session, user_id: int) -> List[dict]:
+    """Точность пользователя по трюкам, от слабых к сильным"""
+    rows = db.execute(
+        select(QuizTrickStats.trick_id, Trick.name, QuizTrickStats.attempts, QuizTrickStats.correct)
+        .join(Trick, Trick.id == QuizTrickStats.trick_id)
+        .where(QuizTrickStats.user_id == user_id)
+    ).all()
+    result = [
+        {
+            "trick_id": trick_id,
+            "name": name,
+            "attempts": attempts,
+            "correct": correct,
+            "accuracy": round(correct / attempts, 3) if attempts else 0.0,
+        }
+        for trick_id, name, attempts, correct in rows
+    ]
+    result.sort(key=lambda item: (item["accuracy"], -item["attempts"], item["trick_id"]))
+    return result
+
+
+def trick_difficulty(db: Session) -> List[dict]:
+    """Доля верных ответов по трюкам среди всех пользователей, от сложных к простым"""
+    rows = db.execute(
+        select(
+            QuizTrickStats.trick_id,
+            func.sum(QuizTrickStats.attempts),
+            func.sum(QuizTrickStats.correct),
+            func.count()
+        ).group_by(QuizTrickStats.trick_id)
+    ).all()
+    result = [
+        {
+            "trick_id": trick_id,
+            "attempts": int(attempts),
+            "accuracy": round(int(correct) / int(attempts), 3) if attempts else 0.0,
+            "users": users,
+        }
+        for trick_id, attempts, correct, users in rows
+    ]
+    result.sort(key=lambda item: (item["accuracy"], item["trick_id"]))
+    return result
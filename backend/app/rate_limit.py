@@ -0,0 +1,182 @@
+import math
+import os
+import time
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from jose import JWTError, jwt
+
+from .auth import ALGORITHM, SECRET_KEY
+
+# Настройки ограничения частоты запросов
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "5"))  # токенов в секунду
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "60"))  # емкость ведра
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", os.getenv("REDIS_URL"))
+# X-Real-IP/X-Forwarded-For доверяем только за nginx: напрямую их подделает любой клиент
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+
+# Стоимость запроса в токенах по классу эндпоинта
+ROUTE_COSTS = {
+    "auth": 10,          # bcrypt
+    "upload": 10,        # Pillow
+    "achievements": 3,   # проверка всех условий достижений
+    "leaderboard": 2,    # агрегация по всем пользователям
+}
+
+# Максимум одновременных запросов на класс эндпоинтов (на процесс)
+CONCURRENCY_LIMITS = {
+    "auth": int(os.getenv("CONCURRENCY_LIMIT_AUTH", "4")),
+    "upload": int(os.getenv("CONCURRENCY_LIMIT_UPLOAD", "4")),
+    "achievements": int(os.getenv("CONCURRENCY_LIMIT_ACHIEVEMENTS", "16")),
+    "leaderboard": int(os.getenv("CONCURRENCY_LIMIT_LEADERBOARD", "16")),
+}
+
+
+class InMemoryTokenBucketStore:
+    """Token bucket в памяти процесса"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+
+    async def consume(self, key: str, cost: float, rate: float, burst: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+
+        if tokens >= cost:
+            self._buckets[key] = (tokens - cost, now)
+            allowed, retry_after = True, 0.0
+        else:
+            self._buckets[key] = (tokens, now)
+            allowed, retry_after = False, (cost - tokens) / rate
+
+        if len(self._buckets) > self.max_keys:
+            self._evict(now, rate, burst)
+        return allowed, retry_after
+
+    def _evict(self, now: float, rate: float, burst: float) -> None:
+        """Удаляет ведра, которые уже успели наполниться целиком"""
+        full_after = burst / rate
+        for key in [k for k, (_, updated) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
+
+
+class RedisTokenBucketStore:
+    """Token bucket в Redis: общий для всех воркеров"""
+
+    # Атомарно пополняет и списывает токены; возвращает {allowed, retry_after_ms}
+    SCRIPT = """
+    local key = KEYS[1]
+    local cost = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local burst = tonumber(ARGV[3])
+    local now = tonumber(ARGV[4])
+    local bucket = redis.call('HMGET', key, 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or burst
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + (now - updated) * rate)
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    else
+        retry_after = math.ceil((cost - tokens) / rate * 1000)
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'updated', now)
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000))
+    return {allowed, retry_after}
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    async def consume(self, key: str, cost: float, rate: float, burst: float) -> Tuple[bool, float]:
+        try:
+            allowed, retry_after_ms = await self.script(
+                keys=[f"ratelimit:{key}"], args=[cost, rate, burst, time.time()]
+            )
+        except Exception as e:
+            # Недоступный Redis не должен класть API
+            print(f"Ошибка rate limiter (Redis): {e}")
+            return True, 0.0
+        return bool(allowed), retry_after_ms / 1000
+
+
+def _create_store():
+    if RATE_LIMIT_REDIS_URL:
+        try:
+            return RedisTokenBucketStore(RATE_LIMIT_REDIS_URL)
+        except ImportError:
+            print("Пакет redis не установлен, rate limiter работает в памяти")
+    return InMemoryTokenBucketStore()
+
+
+bucket_store = _create_store()
+_in_flight = {endpoint_class: 0 for endpoint_class in CONCURRENCY_LIMITS}
+
+
+def client_key(request: Request) -> str:
+    """Ключ клиента: пользователь из JWT (без запроса к БД) или IP"""
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            payload = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM])
+            if payload.get("sub"):
+                return f"user:{payload['sub']}"
+        except JWTError:
+            pass
+
+    if TRUST_PROXY_HEADERS:
+        real_ip = request.headers.get("x-real-ip")
+        if real_ip:
+            return f"ip:{real_ip}"
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def rate_limit(endpoint_class: str, cost: Optional[float] = None):
+    """Зависимость FastAPI: token bucket на клиента и лимит одновременных запросов"""
+    request_cost = cost if cost is not None else ROUTE_COSTS.get(endpoint_class, 1)
+    concurrency_limit = CONCURRENCY_LIMITS.get(endpoint_class)
+
+    async def dependency(request: Request):
+        if not RATE_LIMIT_ENABLED:
+            yield
+            return
+
+        allowed, retry_after = await bucket_store.consume(
+            client_key(request), request_cost, RATE_LIMIT_RATE, RATE_LIMIT_BURST
+        )
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Слишком много запросов, попробуйте позже",
+                headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+            )
+
+        if concurrency_limit is None:
+            yield
+            return
+
+        # Быстрый отказ вместо очереди: перегрузка не должна копить задержку
+        if _in_flight[endpoint_class] >= concurrency_limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервер перегружен, попробуйте позже",
+                headers={"Retry-After": "1"},
+            )
+        _in_flight[endpoint_class] += 1
+        try:
+            yield
+        finally:
+            _in_flight[endpoint_class] -= 1
+
+    return dependency
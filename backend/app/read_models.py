@@ -0,0 +1,291 @@
+"""Легкие модели чтения для GET-эндпоинтов.
+
+Строки выбираются через Core select() только нужных колонок и упаковываются
+в dataclass со __slots__: без identity map, отслеживания изменений и прокси
+связей. Поля совпадают со схемами ответов, поэтому объекты проходят и
+валидацию response_model, и прямую сериализацию orjson.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
+
+from .models import (
+    Achievement, AchievementType, CardReview, SuggestionStatus, Trick, TrickSuggestion,
+    User, UserAchievement, UserProgress, UserRole
+)
+
+
+@dataclass(slots=True)
+class TrickRead:
+    id: int
+    name: str
+    category: str
+    description: str
+    image_url: Optional[str]
+    technique: Optional[str]
+    video_url: Optional[str]
+    created_at: datetime
+
+
+TRICK_COLUMNS = (
+    Trick.id, Trick.name, Trick.category, Trick.description,
+    Trick.image_url, Trick.technique, Trick.video_url, Trick.created_at
+)
+
+
+@dataclass(slots=True)
+class TrickSummary:
+    id: int
+    name: str
+    category: str
+    description: str
+    image_url: Optional[str]
+    technique: Optional[str]
+    video_url: Optional[str]
+
+
+@dataclass(slots=True)
+class LearnedTrickRead:
+    learned_at: datetime
+    trick: TrickSummary
+
+
+@dataclass(slots=True)
+class UserRead:
+    id: int
+    username: str
+    email: str
+    role: UserRole
+    created_at: datetime
+    is_active: bool
+
+
+USER_COLUMNS = ("id", "username", "email", "role", "created_at", "is_active")
+
+
+@dataclass(slots=True)
+class ProgressRead:
+    id: int
+    user_id: int
+    trick_id: int
+    learned_at: datetime
+
+
+@dataclass(slots=True)
+class SuggestionRead:
+    id: int
+    name: str
+    category: str
+    description: str
+    image_url: Optional[str]
+    technique: Optional[str]
+    video_url: Optional[str]
+    suggested_by: int
+    status: SuggestionStatus
+    moderated_by: Optional[int]
+    moderation_comment: Optional[str]
+    created_at: datetime
+    moderated_at: Optional[datetime]
+
+
+SUGGESTION_COLUMNS = (
+    TrickSuggestion.id, TrickSuggestion.name, TrickSuggestion.category, TrickSuggestion.description,
+    TrickSuggestion.image_url, TrickSuggestion.technique, TrickSuggestion.video_url,
+    TrickSuggestion.suggested_by, TrickSuggestion.status, TrickSuggestion.moderated_by,
+    TrickSuggestion.moderation_comment, TrickSuggestion.created_at, TrickSuggestion.moderated_at
+)
+
+
+@dataclass(slots=True)
+class SuggestionWithUsersRead(SuggestionRead):
+    suggester: Optional[UserRead] = None
+    moderator: Optional[UserRead] = None
+    possible_duplicates: List[dict] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class AchievementRead:
+    id: int
+    name: str
+    description: str
+    icon: Optional[str]
+    type: AchievementType
+    condition_type: str
+    condition_value: Optional[int]
+    condition_data: Optional[str]
+    points: int
+    badge_color: str
+    created_at: datetime
+    is_active: bool
+
+
+ACHIEVEMENT_COLUMNS = (
+    Achievement.id, Achievement.name, Achievement.description, Achievement.icon, Achievement.type,
+    Achievement.condition_type, Achievement.condition_value, Achievement.condition_data,
+    Achievement.points, Achievement.badge_color, Achievement.created_at, Achievement.is_active
+)
+
+
+@dataclass(slots=True)
+class UserAchievementRead:
+    id: int
+    user_id: int
+    achievement_id: int
+    earned_at: datetime
+    achievement: AchievementRead
+
+
+@dataclass(slots=True)
+class LeaderboardRow:
+    user_id: int
+    username: str
+    total_points: int
+    achievements_count: int
+    rank: int
+    learned_count: int = 0
+
+
+@dataclass(slots=True)
+class FlashcardRead:
+    id: int
+    name: str
+    category: str
+    description: str
+    image_url: Optional[str]
+    due_at: Optional[datetime]
+    repetitions: int
+
+
+@dataclass(slots=True)
+class QuizTrickRead:
+    id: int
+    name: str
+    image_url: Optional[str]
+    category: str
+
+
+def load_tricks(db: Session, category: Optional[str] = None) -> List[TrickRead]:
+    query = select(*TRICK_COLUMNS).order_by(Trick.id)
+    if category:
+        query = query.where(Trick.category == category)
+    return [TrickRead(*row) for row in db.execute(query)]
+
+
+def load_trick(db: Session, trick_id: int) -> Optional[TrickRead]:
+    row = db.execute(select(*TRICK_COLUMNS).where(Trick.id == trick_id)).first()
+    return TrickRead(*row) if row else None
+
+
+def user_exists(db: Session, user_id: int) -> bool:
+    return db.execute(select(User.id).where(User.id == user_id)).first() is not None
+
+
+def load_user(db: Session, user_id: int) -> Optional[UserRead]:
+    columns = [getattr(User, column) for column in USER_COLUMNS]
+    row = db.execute(select(*columns).where(User.id == user_id)).first()
+    return UserRead(*row) if row else None
+
+
+def load_users(db: Session) -> List[UserRead]:
+    columns = [getattr(User, column) for column in USER_COLUMNS]
+    return [UserRead(*row) for row in db.execute(select(*columns).order_by(User.id))]
+
+
+def load_user_progress(db: Session, user_id: int) -> List[ProgressRead]:
+    query = select(
+        UserProgress.id, UserProgress.user_id, UserProgress.trick_id, UserProgress.learned_at
+    ).where(UserProgress.user_id == user_id)
+    return [ProgressRead(*row) for row in db.execute(query)]
+
+
+def load_learned_tricks(db: Session, user_id: int) -> List[LearnedTrickRead]:
+    query = select(
+        UserProgress.learned_at, Trick.id, Trick.name, Trick.category, Trick.description,
+        Trick.image_url, Trick.technique, Trick.video_url
+    ).join(
+        Trick, UserProgress.trick_id == Trick.id
+    ).where(
+        UserProgress.user_id == user_id
+    ).order_by(UserProgress.learned_at.desc())
+    return [LearnedTrickRead(row[0], TrickSummary(*row[1:])) for row in db.execute(query)]
+
+
+def load_user_suggestions(db: Session, user_id: int) -> List[SuggestionRead]:
+    query = select(*SUGGESTION_COLUMNS).where(
+        TrickSuggestion.suggested_by == user_id
+    ).order_by(TrickSuggestion.created_at.desc())
+    return [SuggestionRead(*row) for row in db.execute(query)]
+
+
+def load_suggestions_with_users(db: Session, status: Optional[SuggestionStatus] = None) -> List[SuggestionWithUsersRead]:
+    """Предложения с авторами и модераторами одним запросом"""
+    suggester = aliased(User)
+    moderator = aliased(User)
+    query = select(
+        *SUGGESTION_COLUMNS,
+        *(getattr(suggester, column) for column in USER_COLUMNS),
+        *(getattr(moderator, column) for column in USER_COLUMNS)
+    ).join(
+        suggester, TrickSuggestion.suggested_by == suggester.id
+    ).outerjoin(
+        moderator, TrickSuggestion.moderated_by == moderator.id
+    )
+    if status:
+        query = query.where(TrickSuggestion.status == status)
+
+    suggestion_end = len(SUGGESTION_COLUMNS)
+    suggester_end = suggestion_end + len(USER_COLUMNS)
+    result = []
+    for row in db.execute(query.order_by(TrickSuggestion.created_at.desc())):
+        moderator_row = row[suggester_end:]
+        result.append(SuggestionWithUsersRead(
+            *row[:suggestion_end],
+            suggester=UserRead(*row[suggestion_end:suggester_end]),
+            moderator=UserRead(*moderator_row) if moderator_row[0] is not None else None
+        ))
+    return result
+
+
+def load_active_achievements(db: Session) -> List[AchievementRead]:
+    query = select(*ACHIEVEMENT_COLUMNS).where(Achievement.is_active == True)
+    return [AchievementRead(*row) for row in db.execute(query)]
+
+
+def load_user_achievements(db: Session, user_id: int) -> List[UserAchievementRead]:
+    query = select(
+        UserAchievement.id, UserAchievement.user_id, UserAchievement.achievement_id,
+        UserAchievement.earned_at, *ACHIEVEMENT_COLUMNS
+    ).join(
+        Achievement, UserAchievement.achievement_id == Achievement.id
+    ).where(
+        UserAchievement.user_id == user_id
+    ).order_by(UserAchievement.earned_at.desc())
+    return [UserAchievementRead(*row[:4], AchievementRead(*row[4:])) for row in db.execute(query)]
+
+
+def load_due_flashcards(db: Session, user_id: int, now: datetime, limit: int,
+                        category: Optional[str] = None) -> List[FlashcardRead]:
+    """Карточки к повторению: range scan по индексу (user_id, due_at)"""
+    query = select(
+        Trick.id, Trick.name, Trick.category, Trick.description, Trick.image_url,
+        CardReview.due_at, CardReview.repetitions
+    ).join(
+        CardReview, CardReview.trick_id == Trick.id
+    ).where(
+        CardReview.user_id == user_id,
+        CardReview.due_at <= now
+    )
+    if category:
+        query = query.where(Trick.category == category)
+    return [FlashcardRead(*row) for row in db.execute(query.order_by(CardReview.due_at).limit(limit))]
+
+
+def load_quiz_tricks(db: Session, category: Optional[str] = None) -> List[QuizTrickRead]:
+    """Трюки для вопроса викторины: только колонки, нужные для вопроса и вариантов"""
+    query = select(Trick.id, Trick.name, Trick.image_url, Trick.category)
+    if category:
+        query = query.where(Trick.category == category)
+    return [QuizTrickRead(*row) for row in db.execute(query)]
@@ -0,0 +1,239 @@
+"""Рекомендации следующего трюка по истории user_progress.
+
+Периодически строится матрица трюк x трюк: косинусная близость по
+совместной изученности плюс вероятность перехода "после A учат B" (по
+порядку learned_at). От каждой строки хранятся только RECOMMENDER_NEIGHBORS
+лучших соседей, снимок пишется в .npy-файлы и открывается через mmap:
+воркеры делят одни страницы в page cache. Запрос - это сумма строк
+соседей изученных трюков (np.bincount) без обращений к БД за матрицей.
+
+Сборка вручную: python -m app.recommendations --build
+"""
+import argparse
+import asyncio
+import fcntl
+import json
+import os
+import shutil
+import time
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .database import SessionLocal
+from .learned_sets import bits_to_bytes
+from .models import Trick, UserProgress
+
+SNAPSHOT_DIR = os.getenv("RECOMMENDER_DIR", "recommender")
+NEIGHBORS = int(os.getenv("RECOMMENDER_NEIGHBORS", "50"))
+REBUILD_MINUTES = float(os.getenv("RECOMMENDER_REBUILD_MINUTES", "60"))  # 0 - только вручную
+TRANSITION_WEIGHT = 0.5   # Вес "после A обычно учат B" относительно совместной изученности
+POPULARITY_WEIGHT = 0.01  # Разводит равные оценки и выручает пользователей без истории
+USER_CHUNK = 4096
+RELOAD_CHECK_SECONDS = 30
+KEEP_SNAPSHOTS = 2
+
+
+def _load_history(db: Session):
+    """user_progress, упорядоченный по пользователю и дате изучения"""
+    rows = db.execute(
+        select(UserProgress.user_id, UserProgress.trick_id)
+        .order_by(UserProgress.user_id, UserProgress.learned_at, UserProgress.id)
+    ).all()
+    if not rows:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    history = np.array(rows, dtype=np.int64)
+    return history[:, 0], history[:, 1]
+
+
+def build_matrices(users: np.ndarray, tricks: np.ndarray, size: int, neighbors: int = NEIGHBORS):
+    """Соседи и веса (size x neighbors) и популярность трюков; память сборки - O(size^2)"""
+    cooccurrence = np.zeros((size, size), np.float32)
+    _, user_index = np.unique(users, return_inverse=True)
+    for start in range(0, int(user_index.max(initial=-1)) + 1, USER_CHUNK):
+        # Матрица пользователи x трюки по пачке пользователей: C += X^T X
+        in_chunk = (user_index >= start) & (user_index < start + USER_CHUNK)
+        chunk = np.zeros((USER_CHUNK, size), np.float32)
+        chunk[user_index[in_chunk] - start, tricks[in_chunk]] = 1
+        cooccurrence += chunk.T @ chunk
+
+    learned_by = np.diag(cooccurrence).copy()
+    norm = np.sqrt(np.outer(learned_by, learned_by))
+    scores = np.divide(cooccurrence, norm, out=np.zeros_like(cooccurrence), where=norm > 0)
+    del cooccurrence, norm
+
+    # Переходы между соседними по времени трюками одного пользователя
+    same_user = users[1:] == users[:-1]
+    transitions = np.zeros((size, size), np.float32)
+    np.add.at(transitions, (tricks[:-1][same_user], tricks[1:][same_user]), 1)
+    row_sums = transitions.sum(axis=1, keepdims=True)
+    scores += TRANSITION_WEIGHT * np.divide(transitions, row_sums, out=transitions, where=row_sums > 0)
+    np.fill_diagonal(scores, 0)
+
+    k = min(neighbors, size)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < size else np.tile(np.arange(size), (size, 1))
+    weights = np.take_along_axis(scores, top, axis=1)
+    # Пустые слоты указывают на id 0 (его нет в каталоге) с нулевым весом
+    top[weights <= 0] = 0
+    weights[weights <= 0] = 0
+
+    popularity = learned_by / learned_by.max() if learned_by.size and learned_by.max() > 0 else learned_by
+    return top.astype(np.int32), weights.astype(np.float32), popularity.astype(np.float32)
+
+
+def build_snapshot(db: Session, directory: str = SNAPSHOT_DIR) -> dict:
+    """Строит снимок и атомарно переключает на него указатель current"""
+    started = time.perf_counter()
+    users, tricks = _load_history(db)
+    max_trick_id = db.scalar(select(func.max(Trick.id))) or 0
+    size = int(max(max_trick_id, tricks.max(initial=0))) + 1
+    neighbors, weights, popularity = build_matrices(users, tricks, size)
+
+    version = str(time.time_ns())  # Одинаковая длина - сортировка по имени совпадает с порядком сборок
+    target = os.path.join(directory, version)
+    os.makedirs(target, exist_ok=True)
+    np.save(os.path.join(target, "neighbors.npy"), neighbors)
+    np.save(os.path.join(target, "weights.npy"), weights)
+    np.save(os.path.join(target, "popularity.npy"), popularity)
+
+    pointer = os.path.join(directory, "current")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+
+    # Старые снимки удаляем; уже открытые mmap продолжают работать до перезагрузки
+    versions = sorted(name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name)))
+    for old in versions[:-KEEP_SNAPSHOTS]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+
+    return {
+        "version": version,
+        "tricks": size - 1,
+        "progress_rows": int(tricks.size),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+class Recommender:
+    """Снимок в памяти воркера (mmap); перечитывается, когда сменился current"""
+
+    def __init__(self, directory: str = SNAPSHOT_DIR):
+        self.directory = directory
+        self.version: Optional[str] = None
+        self._checked_at = 0.0
+        self._neighbors = self._weights = self._popularity = None
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self.version is not None and now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            with open(os.path.join(self.directory, "current")) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return
+        if version == self.version:
+            return
+        target = os.path.join(self.directory, version)
+        try:
+            arrays = [
+                np.load(os.path.join(target, name), mmap_mode="r")
+                for name in ("neighbors.npy", "weights.npy", "popularity.npy")
+            ]
+        except FileNotFoundError:
+            # Снимок удалили между чтением указателя и открытием - попробуем в следующий раз
+            return
+        self._neighbors, self._weights, self._popularity = arrays
+        self.version = version
+
+    def ready(self) -> bool:
+        self._refresh()
+        return self.version is not None
+
+    def recommend(self, learned: int, catalog: int, limit: int = 10) -> List[dict]:
+        """Лучшие неизученные трюки из каталога по битовым картам изученного и каталога"""
+        self._refresh()
+        if self.version is None:
+            return []
+        size = self._popularity.shape[0]
+
+        learned_mask = np.unpackbits(np.frombuffer(bits_to_bytes(learned), np.uint8), bitorder="little")[:size]
+        learned_ids = np.flatnonzero(learned_mask)
+        scores = POPULARITY_WEIGHT * np.asarray(self._popularity)
+        if learned_ids.size:
+            scores = scores + np.bincount(
+                self._neighbors[learned_ids].ravel(),
+                weights=self._weights[learned_ids].ravel(),
+                minlength=size
+            )
+
+        candidates = np.zeros(size, bool)
+        catalog_mask = np.unpackbits(np.frombuffer(bits_to_bytes(catalog), np.uint8), bitorder="little")[:size]
+        candidates[:catalog_mask.size] = catalog_mask.astype(bool)
+        candidates[learned_ids] = False
+        candidate_ids = np.flatnonzero(candidates)
+        if not candidate_ids.size:
+            return []
+
+        candidate_scores = scores[candidate_ids]
+        k = min(limit, candidate_ids.size)
+        best = np.argpartition(-candidate_scores, k - 1)[:k]
+        best = best[np.argsort(-candidate_scores[best], kind="stable")]
+        return [
+            {"trick_id": int(candidate_ids[i]), "score": round(float(candidate_scores[i]), 4)}
+            for i in best
+        ]
+
+
+recommender = Recommender()
+
+
+def rebuild_if_free(directory: str = SNAPSHOT_DIR) -> Optional[dict]:
+    """Сборка под файловой блокировкой: из нескольких воркеров строит один"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "build.lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        db = SessionLocal()
+        try:
+            stats = build_snapshot(db, directory)
+        finally:
+            db.close()
+    print(json.dumps({"event": "recommender_build", **stats}))
+    return stats
+
+
+async def periodic_rebuild(interval_minutes: float = REBUILD_MINUTES) -> None:
+    """Сборка при старте (если снимка нет) и далее по расписанию"""
+    if not recommender.ready():
+        try:
+            await run_in_threadpool(rebuild_if_free)
+        except Exception as e:
+            print(f"Ошибка сборки рекомендаций: {e}")
+    while interval_minutes > 0:
+        await asyncio.sleep(interval_minutes * 60)
+        try:
+            await run_in_threadpool(rebuild_if_free)
+        except Exception as e:
+            print(f"Ошибка сборки рекомендаций: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Снимок матрицы рекомендаций")
+    parser.add_argument("--build", action="store_true", help="построить снимок по user_progress")
+    args = parser.parse_args()
+    if not args.build:
+        parser.print_help()
+        return
+    if rebuild_if_free() is None:
+        print("Сборка уже выполняется")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Refresh-токены: продление входа без проверки пароля.
+
+Access-токен живет ACCESS_TOKEN_EXPIRE_MINUTES, после чего клиент меняет
+refresh-токен на новую пару вместо повторного входа с bcrypt. Refresh-токен
+непрозрачный (случайные 32 байта); в БД хранится только его HMAC-SHA256,
+поэтому поиск - один запрос по уникальному индексу, а утечка таблицы не
+дает рабочих токенов. Каждое обновление выдает новый токен (ротация);
+предъявление уже замененного токена отзывает сессию устройства целиком.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from .auth import SECRET_KEY
+from .models import RefreshToken, User
+
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))  # Без обновлений сессия истекает
+REFRESH_TOKEN_SECRET = os.getenv("REFRESH_TOKEN_SECRET", SECRET_KEY)
+REUSE_GRACE_SECONDS = 30  # Две вкладки могут обновиться одним токеном почти одновременно
+
+_key = REFRESH_TOKEN_SECRET.encode("utf-8")
+
+
+def hash_token(token: str) -> str:
+    return hmac.new(_key, token.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _invalid_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Сессия истекла, войдите снова",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _token_already_rotated() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Токен уже обновлен")
+
+
+class RefreshTokenService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def issue(self, user_id: int, device: Optional[str] = None) -> str:
+        """Новая сессия устройства при входе"""
+        now = datetime.utcnow()
+        # Истекшие и отозванные сессии пользователя убираем здесь: вход редкий, запрос по индексу
+        self.db.execute(
+            delete(RefreshToken)
+            .where(RefreshToken.user_id == user_id)
+            .where((RefreshToken.expires_at <= now) | RefreshToken.revoked_at.isnot(None))
+            .execution_options(synchronize_session=False)
+        )
+        token = secrets.token_urlsafe(32)
+        self.db.add(RefreshToken(
+            user_id=user_id,
+            token_hash=hash_token(token),
+            device=(device or "")[:200] or None,
+            last_used_at=now,
+            expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        ))
+        self.db.commit()
+        return token
+
+    def rotate(self, token: str) -> Tuple[User, str]:
+        """Меняет refresh-токен на новый; возвращает пользователя для access-токена"""
+        digest = hash_token(token)
+        now = datetime.utcnow()
+        row = self.db.execute(
+            select(RefreshToken.id, User)
+            .join(User, User.id == RefreshToken.user_id)
+            .where(
+                RefreshToken.token_hash == digest,
+                RefreshToken.revoked_at.is_(None),
+                RefreshToken.expires_at > now,
+                User.is_active.is_(True)
+            )
+        ).first()
+        if row is None:
+            self._check_reuse(digest, now)
+            raise _invalid_token()
+
+        new_token = secrets.token_urlsafe(32)
+        # Условие на старый хэш: из двух одновременных обновлений одним токеном проходит одно
+        result = self.db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.id == row.id, RefreshToken.token_hash == digest)
+            .values(
+                token_hash=hash_token(new_token),
+                previous_hash=digest,
+                last_used_at=now,
+                expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+            )
+        )
+        self.db.commit()
+        if result.rowcount == 0:
+            raise _token_already_rotated()
+        return row.User, new_token
+
+    def _check_reuse(self, digest: str, now: datetime) -> None:
+        """Старый токен сессии: гонка вкладок или повтор украденного токена"""
+        session = self.db.execute(
+            select(
+                RefreshToken.id,
+                (RefreshToken.last_used_at > now - timedelta(seconds=REUSE_GRACE_SECONDS)).label("just_rotated")
+            )
+            .where(RefreshToken.previous_hash == digest, RefreshToken.revoked_at.is_(None))
+        ).first()
+        if session is None:
+            return
+        if session.just_rotated:
+            # Новый токен только что получила соседняя вкладка - клиент возьмет его из хранилища
+            raise _token_already_rotated()
+        self.revoke(session.id)
+        print(f"Повторное использование refresh-токена, сессия {session.id} отозвана")
+
+    def revoke(self, session_id: int) -> None:
+        self.db.execute(
+            update(RefreshToken).where(RefreshToken.id == session_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+        )
+        self.db.commit()
+
+    def revoke_token(self, token: str) -> None:
+        """Выход на устройстве по его refresh-токену"""
+        self.db.execute(
+            update(RefreshToken).where(RefreshToken.token_hash == hash_token(token), RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+        )
+        self.db.commit()
+
+    def revoke_all(self, user_id: int, keep_token: Optional[str] = None) -> int:
+        """Отзывает все сессии пользователя, кроме текущей (после смены пароля)"""
+        query = update(RefreshToken).where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        if keep_token:
+            query = query.where(RefreshToken.token_hash != hash_token(keep_token))
+        result = self.db.execute(query.values(revoked_at=datetime.utcnow()))
+        self.db.commit()
+        return result.rowcount
+
+    def active_sessions(self, user_id: int) -> List[RefreshToken]:
+        return self.db.scalars(
+            select(RefreshToken)
+            .where(
+                RefreshToken.user_id == user_id,
+                RefreshToken.revoked_at.is_(None),
+                RefreshToken.expires_at > datetime.utcnow()
+            )
+            .order_by(RefreshToken.last_used_at.desc())
+        ).all()
+
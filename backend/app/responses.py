@@ -0,0 +1,19 @@
+import os
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+# Быстрый путь сериализации: orjson вместо stdlib json (включается FAST_JSON=true)
+FAST_JSON_ENABLED = os.getenv("FAST_JSON", "false").lower() == "true"
+
+DefaultResponse = ORJSONResponse if FAST_JSON_ENABLED else JSONResponse
+
+
+def trusted_response(content):
+    """Отдает данные, собранные из строк БД, без повторной валидации response_model.
+
+    Форма данных должна совпадать с response_model эндпоинта: схема остается
+    в OpenAPI, а при выключенном FAST_JSON данные проходят обычную валидацию.
+    """
+    if FAST_JSON_ENABLED:
+        return ORJSONResponse(content)
+    return content
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from .models import UserRole, SuggestionStatus, AchievementType
 
 # Схемы для трюков
@@ -22,6 +22,9 @@ class TrickResponse(TrickBase):
     class Config:
         from_attributes = True
 
+class TrickPrerequisitesUpdate(BaseModel):
+    prerequisite_ids: List[int] = []
+
 # Схемы для пользователей
 class UserBase(BaseModel):
     username: str
@@ -43,6 +46,24 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class SyncProgressMark(BaseModel):
+    trick_id: int
+    learned_at: Optional[datetime] = None  # Когда отмечено на устройстве
+
+class SyncUpload(BaseModel):
+    progress: List[SyncProgressMark] = Field(..., min_length=1, max_length=1000)
+
+class QuizAnswerItem(BaseModel):
+    trick_id: int  # Трюк в вопросе (correct_answer_id)
+    chosen_trick_id: int
+    answered_at: Optional[datetime] = None
+
+class QuizAnswersRequest(BaseModel):
+    answers: List[QuizAnswerItem] = Field(..., min_length=1, max_length=100)
+
+class PurgeRequest(BaseModel):
+    user_ids: List[int] = Field(..., min_length=1, max_length=10000)
+
 class UserUpdate(BaseModel):
     username: Optional[str] = None
     email: Optional[EmailStr] = None
@@ -53,14 +74,29 @@ class UserUpdate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
     user: UserResponse
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class SessionResponse(BaseModel):
+    id: int
+    device: Optional[str] = None
+    created_at: Optional[datetime] = None
+    last_used_at: Optional[datetime] = None
+    expires_at: datetime
+    
+    class Config:
+        from_attributes = True
+
 class TokenData(BaseModel):
     username: Optional[str] = None
 
 class PasswordChange(BaseModel):
     current_password: str
     new_password: str
+    refresh_token: Optional[str] = None  # Сессия этого устройства остается, остальные отзываются
 
 # Схемы для прогресса пользователя
 class UserProgressBase(BaseModel):
@@ -98,14 +134,30 @@ class TrickSuggestionResponse(TrickSuggestionBase):
     class Config:
         from_attributes = True
 
+class DuplicateCandidate(BaseModel):
+    type: str  # trick или suggestion
+    id: int
+    name: str
+    score: float
+
+class TrickSuggestionCreated(TrickSuggestionResponse):
+    possible_duplicates: List[DuplicateCandidate] = []
+
 class TrickSuggestionWithUsers(TrickSuggestionResponse):
     suggester: UserResponse
     moderator: Optional[UserResponse] = None
+    possible_duplicates: List[DuplicateCandidate] = []  # Только для ожидающих модерации
 
 class ModerationRequest(BaseModel):
     status: SuggestionStatus  # APPROVED или REJECTED
     comment: Optional[str] = None
 
+class BatchModerationItem(ModerationRequest):
+    id: int
+
+class BatchModerationRequest(BaseModel):
+    items: List[BatchModerationItem] = Field(..., min_length=1, max_length=500)
+
 # Схемы для достижений
 class AchievementBase(BaseModel):
     name: str
@@ -144,3 +196,27 @@ class UserWithAchievements(UserResponse):
     total_points: int = 0
     achievements_count: int = 0
     recent_achievements: list[UserAchievementResponse] = []
+
+# Схемы для флешкарт (интервальное повторение)
+class FlashcardResponse(BaseModel):
+    id: int
+    name: str
+    category: str
+    description: str
+    image_url: Optional[str] = None
+    due_at: Optional[datetime] = None  # None - новая карточка
+    repetitions: int = 0
+
+class CardReviewRequest(BaseModel):
+    grade: int = Field(..., ge=0, le=5)  # 0 - не вспомнил, 5 - идеально
+
+class CardReviewResponse(BaseModel):
+    trick_id: int
+    due_at: datetime
+    interval_days: float
+    ease_factor: float
+    repetitions: int
+    lapses: int
+    
+    class Config:
+        from_attributes = True
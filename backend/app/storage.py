@@ -0,0 +1,289 @@
+"""Хранилище загруженных файлов: локальный диск или S3-совместимое (MinIO, AWS S3).
+
+В БД всегда хранится стабильный URL вида /uploads/<key>. Локальные файлы
+отдает StaticFiles или nginx, для S3 эндпоинт-резолвер перенаправляет на
+публичный или подписанный URL объекта, и байты идут мимо Python.
+
+Выбор бэкенда: STORAGE_BACKEND=local|s3.
+Перенос локальных файлов в бакет: python -m app.storage --migrate-from uploads
+"""
+import argparse
+import asyncio
+import mimetypes
+import os
+import uuid
+from typing import AsyncIterable, Iterator, NamedTuple, Optional
+
+import aiofiles
+from starlette.concurrency import run_in_threadpool
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+UPLOADS_ROOT = os.getenv("UPLOADS_DIR", "uploads")
+UPLOADS_URL_PREFIX = "/uploads/"
+
+S3_BUCKET = os.getenv("S3_BUCKET", "snowbetter-uploads")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # Для MinIO: http://minio:9000
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL")  # Публичный адрес бакета/CDN; без него - подписанные URL
+S3_PRESIGN_EXPIRES = int(os.getenv("S3_PRESIGN_EXPIRES", "3600"))
+S3_PART_SIZE = 8 * 1024 * 1024  # Минимум для S3 - 5MB на часть (кроме последней)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    modified: float  # Unix time
+
+
+async def iter_chunks(data: bytes, chunk_size: int = CHUNK_SIZE):
+    """Отдает готовые байты кусками для потоковой записи"""
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+class LocalStorage:
+    """Файлы в каталоге на диске (по умолчанию uploads/)"""
+
+    def __init__(self, root: str = UPLOADS_ROOT):
+        self.root = root
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def url(self, key: str) -> str:
+        return UPLOADS_URL_PREFIX + key
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.local_path(key))
+
+    def touch(self, key: str) -> bool:
+        """Обновляет время изменения; False, если файла нет"""
+        try:
+            os.utime(self.local_path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def save(self, key: str, chunks: AsyncIterable[bytes], content_type: str,
+                   cache_control: Optional[str] = None) -> int:
+        """Потоковая атомарная запись: читатели не увидят недописанный файл"""
+        full_path = self.local_path(key)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        tmp_path = f"{full_path}.{uuid.uuid4().hex}.tmp"
+        size = 0
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as buffer:
+                async for chunk in chunks:
+                    await buffer.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return size
+
+    def delete(self, key: str) -> bool:
+        full_path = self.local_path(key)
+        try:
+            os.remove(full_path)
+        except FileNotFoundError:
+            return False
+        self._prune_empty_dirs(os.path.dirname(full_path))
+        return True
+
+    def _prune_empty_dirs(self, directory: str) -> None:
+        # Пустые каталоги шардов (ab/cd) больше не нужны, верхний уровень (images) оставляем
+        while os.path.dirname(os.path.relpath(directory, self.root)) not in ("", "."):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
+
+    def iter_objects(self, prefix: str) -> Iterator[StoredObject]:
+        """Обход дерева через os.scandir без построения полного списка файлов"""
+        stack = [self.local_path(prefix.rstrip("/"))]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            try:
+                                stat_result = entry.stat(follow_symlinks=False)
+                            except FileNotFoundError:
+                                continue
+                            key = os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+                            yield StoredObject(key, stat_result.st_size, stat_result.st_mtime)
+            except FileNotFoundError:
+                continue
+
+
+class S3Storage:
+    """Объекты в S3-совместимом бакете; boto3 работает в пуле потоков"""
+
+    def __init__(self, bucket: str = S3_BUCKET, client=None, public_url: Optional[str] = S3_PUBLIC_URL,
+                 presign_expires: int = S3_PRESIGN_EXPIRES):
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("Для STORAGE_BACKEND=s3 нужен пакет boto3")
+            # Ключи доступа берутся из стандартных переменных AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY
+            client = boto3.client("s3", endpoint_url=S3_ENDPOINT_URL, region_name=S3_REGION)
+        self.client = client
+        self.bucket = bucket
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.presign_expires = presign_expires
+
+    def url(self, key: str) -> str:
+        """Адрес, по которому объект отдается напрямую из хранилища"""
+        if self.public_url:
+            return f"{self.public_url}/{key}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=self.presign_expires
+        )
+
+    def _head(self, key: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def exists(self, key: str) -> bool:
+        return self._head(key) is not None
+
+    def touch(self, key: str) -> bool:
+        """Обновляет LastModified копированием объекта в себя; False, если объекта нет"""
+        head = self._head(key)
+        if head is None:
+            return False
+        # Копия в себя разрешена только с заменой метаданных - переносим их как есть
+        extra = {"ContentType": head.get("ContentType", "application/octet-stream")}
+        if head.get("CacheControl"):
+            extra["CacheControl"] = head["CacheControl"]
+        self.client.copy_object(
+            Bucket=self.bucket,
+            Key=key,
+            CopySource={"Bucket": self.bucket, "Key": key},
+            Metadata=head.get("Metadata", {}),
+            MetadataDirective="REPLACE",
+            **extra
+        )
+        return True
+
+    async def save(self, key: str, chunks: AsyncIterable[bytes], content_type: str,
+                   cache_control: Optional[str] = None) -> int:
+        """Потоковая запись: куски копятся до S3_PART_SIZE и уходят частями multipart upload"""
+        extra = {"ContentType": content_type}
+        if cache_control:
+            extra["CacheControl"] = cache_control
+
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+        size = 0
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                size += len(chunk)
+                if len(buffer) >= S3_PART_SIZE:
+                    if upload_id is None:
+                        response = await run_in_threadpool(
+                            self.client.create_multipart_upload, Bucket=self.bucket, Key=key, **extra
+                        )
+                        upload_id = response["UploadId"]
+                    await self._upload_part(key, upload_id, parts, bytes(buffer))
+                    buffer.clear()
+
+            if upload_id is None:
+                # Маленький файл - одним запросом
+                await run_in_threadpool(self.client.put_object, Bucket=self.bucket, Key=key, Body=bytes(buffer), **extra)
+            else:
+                if buffer:
+                    await self._upload_part(key, upload_id, parts, bytes(buffer))
+                await run_in_threadpool(
+                    self.client.complete_multipart_upload,
+                    Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+                )
+        except BaseException:
+            if upload_id is not None:
+                await run_in_threadpool(
+                    self.client.abort_multipart_upload, Bucket=self.bucket, Key=key, UploadId=upload_id
+                )
+            raise
+        return size
+
+    async def _upload_part(self, key: str, upload_id: str, parts: list, body: bytes) -> None:
+        part_number = len(parts) + 1
+        response = await run_in_threadpool(
+            self.client.upload_part,
+            Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=body
+        )
+        parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    def delete(self, key: str) -> bool:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        return True
+
+    def iter_objects(self, prefix: str) -> Iterator[StoredObject]:
+        """Листинг страницами list_objects_v2 (до 1000 ключей за запрос)"""
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get("Contents", ()):
+                yield StoredObject(item["Key"], item["Size"], item["LastModified"].timestamp())
+
+
+def create_storage():
+    if STORAGE_BACKEND == "s3":
+        return S3Storage()
+    return LocalStorage()
+
+
+storage = create_storage()
+
+
+async def _read_file(path: str):
+    async with aiofiles.open(path, 'rb') as source:
+        while True:
+            chunk = await source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def migrate_local(source: LocalStorage, target, prefix: str = "images/") -> int:
+    """Копирует локальные файлы в целевое хранилище под теми же ключами"""
+    copied = 0
+    for item in source.iter_objects(prefix):
+        if await run_in_threadpool(target.exists, item.key):
+            continue
+        content_type = mimetypes.guess_type(item.key)[0] or "application/octet-stream"
+        await target.save(item.key, _read_file(source.local_path(item.key)), content_type)
+        copied += 1
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перенос загрузок в настроенное хранилище")
+    parser.add_argument("--migrate-from", required=True, help="локальный каталог uploads")
+    args = parser.parse_args()
+
+    if isinstance(storage, LocalStorage):
+        print("STORAGE_BACKEND=local: переносить некуда")
+        return
+    copied = asyncio.run(migrate_local(LocalStorage(args.migrate_from), storage))
+    print(f"Скопировано файлов: {copied}")
+
+
+if __name__ == "__main__":
+    main()
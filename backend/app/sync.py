@@ -0,0 +1,227 @@
+"""Дельта-синхронизация для клиентов со слабой связью.
+
+Изменения каталога трюков и прогресса/достижений пользователя пишутся в
+change_log в той же транзакции, что и сами данные. Клиент хранит курсор
+(id последней полученной записи) и запрашивает только то, что появилось
+после него: при отсутствии изменений ответ - пустые списки. Удаления
+приходят как tombstone-списки id.
+
+id выдаются при INSERT, а коммиты идут в своем порядке: запись с меньшим
+id может стать видимой позже записи с большим. Поэтому курсор не
+переходит записи моложе SYNC_SETTLE_SECONDS - они придут повторно
+(применение идемпотентно), зато не потеряются.
+
+Без курсора или с курсором старше хранимого журнала (SYNC_LOG_RETENTION_DAYS)
+клиент получает полный снимок (full=true).
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .database import SessionLocal
+from .leaderboards import LeaderboardService
+from .learned_sets import LearnedSetService
+from .models import Achievement, ChangeLog, Trick, UserAchievement, UserProgress
+from .read_models import ACHIEVEMENT_COLUMNS, TRICK_COLUMNS, AchievementRead, TrickRead
+from .user_stats_service import UserStatsService
+
+SYNC_LOG_RETENTION_DAYS = float(os.getenv("SYNC_LOG_RETENTION_DAYS", "30"))
+SYNC_SETTLE_SECONDS = 5  # Дольше этого транзакции с записями в журнал не живут
+SYNC_MAX_CHANGES = 5000  # Записей журнала на ответ; остальное - следующим запросом (has_more)
+PRUNE_INTERVAL_HOURS = 24
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+
+def record_change(db: Session, entity: str, entity_id: int, op: str = UPSERT, user_id: Optional[int] = None) -> None:
+    """Запись в журнал; коммит - на вызывающем"""
+    record_changes(db, entity, [entity_id], op, user_id)
+
+
+def record_changes(db: Session, entity: str, entity_ids: Iterable[int], op: str = UPSERT,
+                   user_id: Optional[int] = None) -> None:
+    now = datetime.utcnow()
+    rows = [
+        {"entity": entity, "entity_id": entity_id, "op": op, "user_id": user_id, "created_at": now}
+        for entity_id in entity_ids
+    ]
+    if rows:
+        db.execute(insert(ChangeLog), rows)
+
+
+class SyncService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def changes(self, user_id: Optional[int], since: int = 0) -> dict:
+        """Изменения после курсора; user_id=None - только каталог (гость)"""
+        first_id = self.db.scalar(select(func.min(ChangeLog.id)))
+        # Пустой журнал при курсоре > 0 - его очистили: удаления и правки до очистки потеряны
+        if since <= 0 or first_id is None or since < first_id - 1:
+            return self._snapshot(user_id)
+
+        visible = ChangeLog.user_id.is_(None) if user_id is None else or_(
+            ChangeLog.user_id.is_(None), ChangeLog.user_id == user_id
+        )
+        rows = self.db.execute(
+            select(ChangeLog.id, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op, ChangeLog.created_at)
+            .where(ChangeLog.id > since, visible)
+            .order_by(ChangeLog.id)
+            .limit(SYNC_MAX_CHANGES + 1)
+        ).all()
+        has_more = len(rows) > SYNC_MAX_CHANGES
+        rows = rows[:SYNC_MAX_CHANGES]
+
+        cursor = since
+        horizon = datetime.utcnow() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+        for row in rows:
+            if row.created_at.replace(tzinfo=None) > horizon:
+                break
+            cursor = row.id
+
+        # Последняя операция по каждой сущности
+        latest: Dict[Tuple[str, int], str] = {}
+        for row in rows:
+            latest[(row.entity, row.entity_id)] = row.op
+        upserts = {"trick": [], "progress": [], "achievement": []}
+        deletes = {"trick": [], "progress": [], "achievement": []}
+        for (entity, entity_id), op in latest.items():
+            (upserts if op == UPSERT else deletes)[entity].append(entity_id)
+
+        tricks = self._tricks(upserts["trick"])
+        progress = self._progress(user_id, upserts["progress"])
+        achievements = self._achievements(user_id, upserts["achievement"])
+        # Запись удалили после upsert в журнале - для клиента это тоже удаление
+        deletes["trick"] += sorted(set(upserts["trick"]) - {trick.id for trick in tricks})
+        deletes["progress"] += sorted(set(upserts["progress"]) - {item["trick_id"] for item in progress})
+
+        return {
+            "cursor": cursor,
+            "full": False,
+            "has_more": has_more,
+            "tricks": tricks,
+            "progress": progress,
+            "achievements": achievements,
+            "deleted": {
+                "tricks": sorted(deletes["trick"]),
+                "progress": sorted(deletes["progress"]),
+                "achievements": sorted(deletes["achievement"]),
+            },
+        }
+
+    def _snapshot(self, user_id: Optional[int]) -> dict:
+        # Курсор - до снимка: изменения, зафиксированные во время чтения, придут повторно
+        horizon = datetime.utcnow() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+        cursor = self.db.scalar(select(func.max(ChangeLog.id)).where(ChangeLog.created_at <= horizon)) or 0
+        return {
+            "cursor": cursor,
+            "full": True,
+            "has_more": False,
+            "tricks": self._tricks(None),
+            "progress": self._progress(user_id, None),
+            "achievements": self._achievements(user_id, None),
+            "deleted": {"tricks": [], "progress": [], "achievements": []},
+        }
+
+    def _tricks(self, trick_ids: Optional[List[int]]) -> List[TrickRead]:
+        query = select(*TRICK_COLUMNS).order_by(Trick.id)
+        if trick_ids is not None:
+            if not trick_ids:
+                return []
+            query = query.where(Trick.id.in_(trick_ids))
+        return [TrickRead(*row) for row in self.db.execute(query)]
+
+    def _progress(self, user_id: Optional[int], trick_ids: Optional[List[int]]) -> List[dict]:
+        if user_id is None or trick_ids == []:
+            return []
+        query = select(UserProgress.trick_id, UserProgress.learned_at).where(UserProgress.user_id == user_id)
+        if trick_ids is not None:
+            query = query.where(UserProgress.trick_id.in_(trick_ids))
+        return [{"trick_id": trick_id, "learned_at": learned_at} for trick_id, learned_at in self.db.execute(query)]
+
+    def _achievements(self, user_id: Optional[int], achievement_ids: Optional[List[int]]) -> List[dict]:
+        if user_id is None or achievement_ids == []:
+            return []
+        query = select(UserAchievement.earned_at, *ACHIEVEMENT_COLUMNS).join(
+            Achievement, UserAchievement.achievement_id == Achievement.id
+        ).where(UserAchievement.user_id == user_id)
+        if achievement_ids is not None:
+            query = query.where(UserAchievement.achievement_id.in_(achievement_ids))
+        return [
+            {"achievement_id": row[1], "earned_at": row[0], "achievement": AchievementRead(*row[1:])}
+            for row in self.db.execute(query)
+        ]
+
+    def upload_progress(self, user_id: int, marks: List[dict]) -> dict:
+        """Отметки "изучено", накопленные офлайн: одна транзакция на всю пачку; достижения проверяет вызывающий"""
+        now = datetime.utcnow()
+        learned_at: Dict[int, datetime] = {}
+        for mark in marks:
+            # Время с устройства: переводим в UTC, из будущего не принимаем, из нескольких отметок берем раннюю
+            when = mark.get("learned_at") or now
+            if when.tzinfo is not None:
+                when = when.astimezone(timezone.utc).replace(tzinfo=None)
+            when = min(when, now)
+            trick_id = mark["trick_id"]
+            learned_at[trick_id] = min(learned_at.get(trick_id, when), when)
+
+        categories = dict(self.db.execute(
+            select(Trick.id, Trick.category).where(Trick.id.in_(learned_at))
+        ).all())
+        already = set(self.db.scalars(
+            select(UserProgress.trick_id).where(UserProgress.user_id == user_id, UserProgress.trick_id.in_(learned_at))
+        ))
+        new_ids = sorted(trick_id for trick_id in learned_at if trick_id in categories and trick_id not in already)
+
+        if new_ids:
+            self.db.execute(insert(UserProgress), [
+                {"user_id": user_id, "trick_id": trick_id, "learned_at": learned_at[trick_id]}
+                for trick_id in new_ids
+            ])
+            UserStatsService(self.db).increment(user_id, learned_count=len(new_ids))
+            LearnedSetService(self.db).add_many(user_id, new_ids)
+            leaderboards = LeaderboardService(self.db)
+            for trick_id in new_ids:
+                leaderboards.record_learned(user_id, categories[trick_id], learned_at[trick_id])
+            record_changes(self.db, "progress", new_ids, user_id=user_id)
+            self.db.commit()
+
+        return {
+            "accepted": new_ids,
+            "already_learned": sorted(already),
+            "unknown_tricks": sorted(set(learned_at) - set(categories)),
+        }
+
+    def prune(self, days: float = SYNC_LOG_RETENTION_DAYS) -> int:
+        """Удаляет старые записи журнала; клиенты с более старым курсором получат полный снимок"""
+        result = self.db.execute(
+            delete(ChangeLog).where(ChangeLog.created_at < datetime.utcnow() - timedelta(days=days))
+        )
+        self.db.commit()
+        return result.rowcount
+
+
+def _prune() -> int:
+    db = SessionLocal()
+    try:
+        return SyncService(db).prune()
+    finally:
+        db.close()
+
+
+async def periodic_prune(interval_hours: float = PRUNE_INTERVAL_HOURS) -> None:
+    """Ежедневная очистка журнала, не блокируя event loop"""
+    while True:
+        try:
+            removed = await run_in_threadpool(_prune)
+            if removed:
+                print(f"Удалено записей журнала синхронизации: {removed}")
+        except Exception as e:
+            print(f"Ошибка очистки журнала синхронизации: {e}")
+        await asyncio.sleep(interval_hours * 3600)
@@ -0,0 +1,167 @@
+"""Граф зависимостей трюков (trick_prerequisites).
+
+Граф строится в памяти процесса двумя запросами на версию каталога (и не
+реже раза в CATALOG_MASKS_TTL, чтобы увидеть правки из других воркеров).
+Сразу считаются топологический порядок, транзитивное замыкание в виде
+битовых карт (бит N = трюк с id N, как в learned_sets) и глубина трюка
+внутри своей категории. Путь к трюку и список открытых трюков - операции
+над этими картами, без запросов на каждый узел.
+
+Проверка графа: python -m app.trick_graph --check
+"""
+import argparse
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .learned_sets import CATALOG_MASKS_TTL, catalog_version
+from .models import Trick, TrickPrerequisite
+
+
+def _ids(bits: int) -> List[int]:
+    ids = []
+    while bits:
+        low = bits & -bits
+        ids.append(low.bit_length() - 1)
+        bits ^= low
+    return ids
+
+
+@dataclass(frozen=True)
+class TrickGraph:
+    names: Dict[int, str] = field(default_factory=dict)
+    categories: Dict[int, str] = field(default_factory=dict)
+    requires: Dict[int, int] = field(default_factory=dict)  # Прямые зависимости
+    closure: Dict[int, int] = field(default_factory=dict)   # Все зависимости транзитивно
+    order: List[int] = field(default_factory=list)          # Зависимости раньше зависимых
+    depth: Dict[int, int] = field(default_factory=dict)     # Длина цепочки внутри категории
+    cyclic: List[int] = field(default_factory=list)         # Трюки в циклах (ошибка данных)
+    version: int = 0
+    built_at: float = 0.0
+
+    @property
+    def category_depth(self) -> Dict[str, int]:
+        """Максимальная глубина по категориям"""
+        depths: Dict[str, int] = {}
+        for trick_id, depth in self.depth.items():
+            category = self.categories[trick_id]
+            depths[category] = max(depths.get(category, 0), depth)
+        return depths
+
+    def _in_order(self, bits: int) -> List[int]:
+        return [trick_id for trick_id in self.order if bits >> trick_id & 1]
+
+    def prerequisites(self, trick_id: int) -> List[int]:
+        """Прямые зависимости трюка"""
+        return _ids(self.requires.get(trick_id, 0))
+
+    def path(self, trick_id: int) -> List[int]:
+        """Все зависимости трюка в порядке изучения, последним - сам трюк"""
+        return self._in_order(self.closure.get(trick_id, 0)) + [trick_id]
+
+    def unlocked(self, learned: int) -> List[int]:
+        """Неизученные трюки, все прямые зависимости которых изучены"""
+        return [
+            trick_id for trick_id in self.order
+            if not learned >> trick_id & 1 and self.requires.get(trick_id, 0) & ~learned == 0
+        ]
+
+    def creates_cycle(self, trick_id: int, prerequisite_ids: Iterable[int]) -> bool:
+        """Замкнет ли цикл назначение трюку таких зависимостей"""
+        return any(
+            prerequisite_id == trick_id or self.closure.get(prerequisite_id, 0) >> trick_id & 1
+            for prerequisite_id in prerequisite_ids
+        )
+
+
+def build_graph(db: Session, version: int = 0) -> TrickGraph:
+    """Граф по каталогу: один запрос за трюками и один за ребрами"""
+    names: Dict[int, str] = {}
+    categories: Dict[int, str] = {}
+    for trick_id, name, category in db.execute(select(Trick.id, Trick.name, Trick.category)):
+        names[trick_id] = name
+        categories[trick_id] = category
+
+    requires: Dict[int, int] = dict.fromkeys(names, 0)
+    dependents: Dict[int, List[int]] = {trick_id: [] for trick_id in names}
+    for trick_id, prerequisite_id in db.execute(select(TrickPrerequisite.trick_id, TrickPrerequisite.prerequisite_id)):
+        if trick_id in names and prerequisite_id in names:
+            requires[trick_id] |= 1 << prerequisite_id
+            dependents[prerequisite_id].append(trick_id)
+
+    # Алгоритм Кана; среди готовых - по возрастанию id, чтобы порядок был стабильным
+    pending = {trick_id: bits.bit_count() for trick_id, bits in requires.items()}
+    ready = sorted(trick_id for trick_id, count in pending.items() if count == 0)
+    order: List[int] = []
+    closure: Dict[int, int] = {}
+    depth: Dict[int, int] = {}
+    while ready:
+        next_ready = []
+        for trick_id in ready:
+            order.append(trick_id)
+            bits = 0
+            trick_depth = 0
+            for prerequisite_id in _ids(requires[trick_id]):
+                bits |= closure[prerequisite_id] | (1 << prerequisite_id)
+                if categories[prerequisite_id] == categories[trick_id]:
+                    trick_depth = max(trick_depth, depth[prerequisite_id] + 1)
+            closure[trick_id] = bits
+            depth[trick_id] = trick_depth
+            for dependent in dependents[trick_id]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    next_ready.append(dependent)
+        ready = sorted(next_ready)
+
+    # Циклы возможны только при ручной правке БД: такие трюки не блокируют остальные
+    cyclic = sorted(set(names) - set(order))
+    if cyclic:
+        print(f"Циклические зависимости трюков: {cyclic}")
+        for trick_id in cyclic:
+            order.append(trick_id)
+            closure[trick_id] = requires[trick_id]
+            depth[trick_id] = 0
+
+    return TrickGraph(names, categories, requires, closure, order, depth, cyclic, version, time.monotonic())
+
+
+_graph: Optional[TrickGraph] = None
+
+
+def trick_graph(db: Session) -> TrickGraph:
+    """Граф текущей версии каталога"""
+    global _graph
+    graph = _graph
+    version = catalog_version()
+    if graph is not None and graph.version == version and time.monotonic() - graph.built_at < CATALOG_MASKS_TTL:
+        return graph
+    graph = build_graph(db, version)
+    _graph = graph
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Граф зависимостей трюков")
+    parser.add_argument("--check", action="store_true", help="построить граф и вывести сводку")
+    args = parser.parse_args()
+    if not args.check:
+        parser.print_help()
+        return
+
+    db = SessionLocal()
+    try:
+        graph = build_graph(db)
+    finally:
+        db.close()
+    edges = sum(bits.bit_count() for bits in graph.requires.values())
+    print(f"Трюков: {len(graph.order)}, зависимостей: {edges}, циклов: {len(graph.cyclic)}")
+    for category, depth in sorted(graph.category_depth.items()):
+        print(f"  {category}: глубина {depth}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Отдача загруженных файлов без прокачки байт через Python.
+
+Бэкенд только решает, можно ли отдать файл, и передает его nginx через
+X-Accel-Redirect (включается UPLOADS_X_ACCEL_PREFIX): ETag, Last-Modified
+и Range nginx обрабатывает сам. Без nginx перед бэкендом (разработка,
+прямые запросы) файл отдается здесь же, с условными запросами и Range.
+Для S3 выполняется редирект на URL объекта.
+"""
+import mimetypes
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+
+import aiofiles
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+
+from .images import CONTENT_ADDRESSED_PATH, IMMUTABLE_CACHE_CONTROL
+from .storage import CHUNK_SIZE, LocalStorage, storage
+
+# Внутренний location nginx с alias на каталог uploads, например /_protected_uploads/
+X_ACCEL_PREFIX = os.getenv("UPLOADS_X_ACCEL_PREFIX", "")
+# Старые имена (uuid) могут быть перезаписаны - кэшируем их ограниченно
+MUTABLE_CACHE_CONTROL = "public, max-age=86400"
+REDIRECT_CACHE_CONTROL = "public, max-age=300"
+
+_KEY_PATTERN = re.compile(r"^images/[A-Za-z0-9._/-]+$")
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def upload_access_allowed(key: str) -> bool:
+    """Наружу отдаются только файлы из images/, без обхода каталогов и временных файлов"""
+    if not _KEY_PATTERN.match(key) or key.endswith(".tmp"):
+        return False
+    return all(part not in ("", ".", "..") for part in key.split("/"))
+
+
+def _cache_headers(key: str) -> dict:
+    immutable = CONTENT_ADDRESSED_PATH.match(key)
+    return {"Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else MUTABLE_CACHE_CONTROL}
+
+
+def _etag(key: str, stat_result: os.stat_result) -> str:
+    match = CONTENT_ADDRESSED_PATH.match(key)
+    if match:
+        # Имя = хэш содержимого: ETag одинаков на всех серверах
+        return f'"{match.group(3)}"'
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _parse_range(request: Request, etag: str, last_modified: str, size: int) -> Optional[Tuple[int, int]]:
+    """Диапазон (start, end) включительно; None - отдать файл целиком"""
+    header = request.headers.get("range")
+    if not header:
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range and if_range not in (etag, last_modified):
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        # Несколько диапазонов не поддерживаем - по RFC 9110 можно отдать весь файл
+        return None
+    start, end = match.groups()
+    if start:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    elif end:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Запрошенный диапазон недоступен",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+async def _read_range(path: str, start: int, end: int):
+    async with aiofiles.open(path, 'rb') as source:
+        await source.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await source.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def upload_response(request: Request, key: str) -> Response:
+    if not upload_access_allowed(key):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+
+    if not isinstance(storage, LocalStorage):
+        # Объектное хранилище отдает байты само
+        return RedirectResponse(storage.url(key), status_code=307, headers={"Cache-Control": REDIRECT_CACHE_CONTROL})
+
+    path = storage.local_path(key)
+    try:
+        stat_result = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+
+    headers = _cache_headers(key)
+    if X_ACCEL_PREFIX:
+        # nginx сам отдаст файл с ETag/Last-Modified/Range; Cache-Control он сохраняет из ответа
+        headers["X-Accel-Redirect"] = X_ACCEL_PREFIX + key
+        return Response(headers=headers, media_type=None)
+
+    etag = _etag(key, stat_result)
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    headers.update({"ETag": etag, "Last-Modified": last_modified, "Accept-Ranges": "bytes"})
+
+    if _not_modified(request, etag, stat_result):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = _parse_range(request, etag, last_modified, stat_result.st_size)
+    if byte_range is None:
+        return FileResponse(path, stat_result=stat_result, headers=headers)
+
+    start, end = byte_range
+    headers.update({
+        "Content-Range": f"bytes {start}-{end}/{stat_result.st_size}",
+        "Content-Length": str(end - start + 1),
+    })
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if request.method == "HEAD":
+        return Response(status_code=206, headers=headers, media_type=media_type)
+    return StreamingResponse(_read_range(path, start, end), status_code=206, headers=headers, media_type=media_type)
@@ -0,0 +1,135 @@
+"""Счетчики пользователя (изученные трюки, очки, достижения, предложения).
+
+Строка user_stats обновляется атомарным UPDATE ... SET x = x + n в той же
+транзакции, что и изменение исходных данных, поэтому чтение профиля и
+лидерборда - это выборка по первичному ключу или индексу без COUNT/SUM.
+
+Проверка и пересборка: python -m app.user_stats_service [--fix]
+"""
+import argparse
+from typing import List
+
+from sqlalchemy import exists, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import Achievement, TrickSuggestion, User, UserAchievement, UserProgress, UserStats
+
+COUNTERS = ("learned_count", "total_points", "achievements_count", "suggestions_count")
+
+
+def _computed_counters(user_id_column):
+    """Значения счетчиков, посчитанные по исходным таблицам (коррелированные подзапросы)"""
+    return (
+        select(func.count(UserProgress.id))
+        .where(UserProgress.user_id == user_id_column).scalar_subquery(),
+        select(func.coalesce(func.sum(Achievement.points), 0))
+        .join(UserAchievement, UserAchievement.achievement_id == Achievement.id)
+        .where(UserAchievement.user_id == user_id_column).scalar_subquery(),
+        select(func.count(UserAchievement.id))
+        .where(UserAchievement.user_id == user_id_column).scalar_subquery(),
+        select(func.count(TrickSuggestion.id))
+        .where(TrickSuggestion.suggested_by == user_id_column).scalar_subquery(),
+    )
+
+
+class UserStatsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, user_id: int) -> UserStats:
+        """Счетчики по первичному ключу; для пользователя без строки - расчет на лету"""
+        stats = self.db.get(UserStats, user_id)
+        if stats is None:
+            stats = UserStats(user_id=user_id, **dict(zip(COUNTERS, self._compute(user_id))))
+        return stats
+
+    def increment(self, user_id: int, **deltas: int) -> None:
+        """Атомарно сдвигает счетчики; коммит - на вызывающем"""
+        result = self.db.execute(
+            update(UserStats)
+            .where(UserStats.user_id == user_id)
+            .values({getattr(UserStats, name): getattr(UserStats, name) + delta for name, delta in deltas.items()})
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            # Строки еще нет: считаем по исходным данным, которые уже включают это изменение
+            self._create(user_id)
+
+    def _compute(self, user_id: int) -> tuple:
+        return tuple(self.db.execute(select(*_computed_counters(user_id))).one())
+
+    def _create(self, user_id: int) -> None:
+        self.db.flush()
+        try:
+            with self.db.begin_nested():
+                self.db.execute(insert(UserStats).values(user_id=user_id, **dict(zip(COUNTERS, self._compute(user_id)))))
+        except IntegrityError:
+            # Параллельная транзакция создала строку первой - пересчитываем ее
+            self.rebuild([user_id])
+
+    def backfill(self) -> int:
+        """Создает недостающие строки для существующих пользователей"""
+        missing = select(User.id, *_computed_counters(User.id)).where(
+            ~exists().where(UserStats.user_id == User.id)
+        )
+        result = self.db.execute(insert(UserStats).from_select(["user_id", *COUNTERS], missing))
+        self.db.commit()
+        return result.rowcount
+
+    def rebuild(self, user_ids: List[int]) -> None:
+        """Пересчитывает счетчики указанных пользователей по исходным таблицам"""
+        self.db.execute(
+            update(UserStats)
+            .where(UserStats.user_id.in_(user_ids))
+            .values(dict(zip(COUNTERS, _computed_counters(UserStats.user_id))))
+            .execution_options(synchronize_session=False)
+        )
+
+    def verify(self, fix: bool = False) -> dict:
+        """Сверяет счетчики с исходными данными; с fix=True исправляет расхождения"""
+        query = select(UserStats.user_id, *(getattr(UserStats, name) for name in COUNTERS),
+                       *_computed_counters(UserStats.user_id))
+        mismatched = []
+        checked = 0
+        for row in self.db.execute(query):
+            checked += 1
+            stored, actual = row[1:1 + len(COUNTERS)], row[1 + len(COUNTERS):]
+            if tuple(stored) != tuple(actual):
+                mismatched.append({
+                    "user_id": row.user_id,
+                    "stored": dict(zip(COUNTERS, stored)),
+                    "actual": dict(zip(COUNTERS, actual)),
+                })
+
+        missing = self.db.scalar(
+            select(func.count(User.id)).where(~exists().where(UserStats.user_id == User.id))
+        )
+        if fix:
+            if mismatched:
+                self.rebuild([item["user_id"] for item in mismatched])
+                self.db.commit()
+            if missing:
+                self.backfill()
+
+        return {"checked": checked, "missing": missing, "mismatched": mismatched, "fixed": fix}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка счетчиков user_stats")
+    parser.add_argument("--fix", action="store_true", help="исправить расхождения и создать недостающие строки")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = UserStatsService(db).verify(fix=args.fix)
+    finally:
+        db.close()
+    print(f"Проверено: {report['checked']}, без строки: {report['missing']}, расхождений: {len(report['mismatched'])}")
+    for item in report["mismatched"][:20]:
+        print(f"  user {item['user_id']}: {item['stored']} -> {item['actual']}")
+
+
+if __name__ == "__main__":
+    main()
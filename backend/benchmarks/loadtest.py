@@ -0,0 +1,297 @@
+"""Нагрузочный тест API: конкурентный асинхронный клиент против живого сервера"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.seed import BENCH_PASSWORD, BENCH_USER_PREFIX, seed_dataset  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, "loadtest_baseline.json")
+PROFILE_HEADERS = {"X-Profile-Request": "1"}
+_QUERY_COUNT_RE = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    latencies_ms: list = field(default_factory=list)
+    query_counts: list = field(default_factory=list)
+    errors: int = 0
+    elapsed_s: float = 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+    def summary(self) -> dict:
+        return {
+            "requests": len(self.latencies_ms),
+            "errors": self.errors,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "throughput_rps": round(len(self.latencies_ms) / self.elapsed_s, 1) if self.elapsed_s else 0.0,
+            "queries_per_request": round(statistics.mean(self.query_counts), 1) if self.query_counts else None,
+        }
+
+
+class BenchContext:
+    """Токены и идентификаторы, общие для всех сценариев"""
+
+    def __init__(self, users: list, trick_ids: list, image_bytes: bytes):
+        self.users = users  # [(user_id, token)]
+        self.trick_ids = trick_ids
+        self.image_bytes = image_bytes
+
+    def random_user(self, rng: random.Random):
+        return rng.choice(self.users)
+
+
+def _auth(token: str) -> dict:
+    return {**PROFILE_HEADERS, "Authorization": f"Bearer {token}"}
+
+
+async def scenario_tricks(client, ctx, rng):
+    return await client.get("/api/tricks", headers=PROFILE_HEADERS)
+
+
+async def scenario_quiz(client, ctx, rng):
+    return await client.get("/api/quiz/random", headers=PROFILE_HEADERS)
+
+
+async def scenario_stats(client, ctx, rng):
+    user_id, _ = ctx.random_user(rng)
+    return await client.get(f"/api/users/{user_id}/stats", headers=PROFILE_HEADERS)
+
+
+async def scenario_leaderboard(client, ctx, rng):
+    return await client.get("/api/leaderboard", params={"limit": 50}, headers=PROFILE_HEADERS)
+
+
+async def scenario_progress(client, ctx, rng):
+    user_id, token = ctx.random_user(rng)
+    trick_id = rng.choice(ctx.trick_ids)
+    return await client.post(f"/api/users/{user_id}/progress/{trick_id}", headers=_auth(token))
+
+
+async def scenario_upload(client, ctx, rng):
+    _, token = ctx.random_user(rng)
+    files = {"file": ("bench.png", ctx.image_bytes, "image/png")}
+    return await client.post("/api/upload/image", files=files, headers=_auth(token))
+
+
+async def scenario_login(client, ctx, rng):
+    index = rng.randrange(len(ctx.users))
+    return await client.post(
+        "/api/auth/login",
+        data={"username": f"{BENCH_USER_PREFIX}{index}", "password": BENCH_PASSWORD},
+        headers=PROFILE_HEADERS,
+    )
+
+
+SCENARIOS = {
+    "tricks": scenario_tricks,
+    "quiz": scenario_quiz,
+    "stats": scenario_stats,
+    "leaderboard": scenario_leaderboard,
+    "progress": scenario_progress,
+    "upload": scenario_upload,
+    "login": scenario_login,
+}
+
+
+def _make_image() -> bytes:
+    image = Image.new("RGB", (1600, 1200))
+    pixels = image.load()
+    for x in range(0, 1600, 8):
+        for y in range(0, 1200, 8):
+            pixels[x, y] = (x % 256, y % 256, (x + y) % 256)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def prepare_context(client: httpx.AsyncClient, user_count: int) -> BenchContext:
+    """Логинит часть синтетических пользователей и получает список трюков"""
+    users = []
+    for index in range(user_count):
+        response = await client.post(
+            "/api/auth/login",
+            data={"username": f"{BENCH_USER_PREFIX}{index}", "password": BENCH_PASSWORD},
+        )
+        response.raise_for_status()
+        payload = response.json()
+        users.append((payload["user"]["id"], payload["access_token"]))
+    tricks = (await client.get("/api/tricks")).json()
+    return BenchContext(users, [t["id"] for t in tricks], _make_image())
+
+
+async def run_scenario(client, ctx, name: str, total: int, concurrency: int, seed: int) -> ScenarioResult:
+    result = ScenarioResult(name)
+    rng = random.Random(seed)
+    remaining = iter(range(total))
+    scenario = SCENARIOS[name]
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await scenario(client, ctx, rng)
+            except httpx.HTTPError:
+                result.errors += 1
+                continue
+            result.latencies_ms.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                result.errors += 1
+            match = _QUERY_COUNT_RE.search(response.headers.get("server-timing", ""))
+            if match:
+                result.query_counts.append(int(match.group(1)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed_s = time.perf_counter() - started
+    return result
+
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    """Возвращает список регрессий относительно сохраненного baseline"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {current[metric]}")
+        if previous.get("queries_per_request") is not None and current.get("queries_per_request") is not None:
+            if current["queries_per_request"] > previous["queries_per_request"]:
+                regressions.append(
+                    f"{name}: queries_per_request {previous['queries_per_request']} -> {current['queries_per_request']}"
+                )
+    return regressions
+
+
+def print_report(results: dict) -> None:
+    header = f"{'scenario':<12} {'req':>6} {'err':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'rps':>8} {'queries':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, s in results.items():
+        queries = "-" if s["queries_per_request"] is None else s["queries_per_request"]
+        print(f"{name:<12} {s['requests']:>6} {s['errors']:>5} {s['p50_ms']:>9} {s['p95_ms']:>9} "
+              f"{s['p99_ms']:>9} {s['throughput_rps']:>8} {queries:>8}")
+
+
+def spawn_server(database_url: str, port: int) -> subprocess.Popen:
+    """Поднимает uvicorn с указанной базой для локального прогона"""
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "PROFILE_HEADER_ENABLED": "true",
+        "RATE_LIMIT_ENABLED": "false",
+        "SLOW_REQUEST_MS": os.getenv("SLOW_REQUEST_MS", "10000"),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.join(os.path.dirname(__file__), ".."),
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=0.5)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Сервер не запустился")
+
+
+async def run(args) -> dict:
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30.0) as client:
+        ctx = await prepare_context(client, args.login_users)
+        results = {}
+        for name in args.scenarios:
+            result = await run_scenario(client, ctx, name, args.requests, args.concurrency, args.seed)
+            results[name] = result.summary()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--database-url", default=None,
+                        help="Засеять эту базу и поднять локальный сервер (SQLite или Postgres)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tricks-scale", type=int, default=10)
+    parser.add_argument("--login-users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="Запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое ухудшение (0.2 = 20%%)")
+    parser.add_argument("--output", default=None, help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    server: Optional[subprocess.Popen] = None
+    if args.database_url:
+        seed_dataset(args.database_url, args.users, args.tricks_scale, args.seed)
+        server = spawn_server(args.database_url, args.port)
+        args.base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print_report(results)
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": {
+        "users": args.users, "tricks_scale": args.tricks_scale, "requests": args.requests,
+        "concurrency": args.concurrency,
+    }, "scenarios": results}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Baseline сохранен: {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Регрессии относительно baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("Регрессий относительно baseline нет")
+
+
+if __name__ == "__main__":
+    main()
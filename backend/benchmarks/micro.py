@@ -0,0 +1,427 @@
+"""Микробенчмарки горячих внутренних функций: достижения, лидерборд, картинки, JWT"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from PIL import Image  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.achievements_service import AchievementsService  # noqa: E402
+from app.auth import ALGORITHM, SECRET_KEY, create_access_token, get_current_user  # noqa: E402
+from app.user_stats_service import UserStatsService  # noqa: E402
+from app.learned_sets import invalidate_catalog  # noqa: E402
+from app.models import (  # noqa: E402
+    Achievement, AchievementType, Base, Trick, User, UserAchievement, UserProgress, UserRole
+)
+from jose import jwt  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, "micro_baseline.json")
+CATEGORIES = ["spins", "grabs", "flips", "jibbing", "off-axis", "combo"]
+
+BENCHMARKS = []
+
+
+def benchmark(name: str, params: list, full_params: list = ()):
+    """Регистрирует бенчмарк; full_params прогоняются только с --full"""
+    def decorator(func):
+        BENCHMARKS.append((name, func, list(params), list(full_params)))
+        return func
+    return decorator
+
+
+def measure(func, setup=None, min_rounds: int = 5, min_time: float = 0.2) -> dict:
+    """Запускает func, пока не наберется min_rounds и min_time; setup не учитывается во времени"""
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < min_rounds or time.perf_counter() - started < min_time:
+        args = setup() if setup else ()
+        t0 = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - t0) * 1000)
+        if len(timings) >= 10000:
+            break
+    return {
+        "rounds": len(timings),
+        "min_ms": round(min(timings), 4),
+        "median_ms": round(statistics.median(timings), 4),
+        "mean_ms": round(statistics.mean(timings), 4),
+    }
+
+
+class BenchDatabase:
+    """Отдельная база на каждый набор параметров"""
+
+    def __init__(self, database_url: str):
+        if database_url in ("sqlite://", "sqlite:///:memory:"):
+            self.engine = create_engine(database_url, poolclass=StaticPool,
+                                        connect_args={"check_same_thread": False})
+        else:
+            self.engine = create_engine(database_url)
+        Base.metadata.drop_all(bind=self.engine)
+        Base.metadata.create_all(bind=self.engine)
+        self.session = Session(self.engine)
+
+    def close(self):
+        self.session.close()
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+
+    def add_tricks(self, count: int) -> list:
+        self.session.execute(insert(Trick), [
+            {"name": f"Trick {i}", "category": CATEGORIES[i % len(CATEGORIES)], "description": "bench"}
+            for i in range(count)
+        ])
+        # Маски каталога кэшируются в процессе, а база у каждого набора своя
+        invalidate_catalog()
+        return [row.id for row in self.session.query(Trick.id).order_by(Trick.id)]
+
+    def add_users(self, count: int, batch_size: int = 10000) -> list:
+        for start in range(0, count, batch_size):
+            self.session.execute(insert(User), [
+                {"username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x",
+                 "role": UserRole.USER, "is_active": True}
+                for i in range(start, min(start + batch_size, count))
+            ])
+        return [row.id for row in self.session.query(User.id).order_by(User.id)]
+
+    def add_progress(self, user_id: int, trick_ids: list, days: int = 1) -> None:
+        now = datetime.now()
+        self.session.execute(insert(UserProgress), [
+            {"user_id": user_id, "trick_id": trick_id, "learned_at": now - timedelta(days=i % days)}
+            for i, trick_id in enumerate(trick_ids)
+        ])
+
+
+def _database_url(args) -> str:
+    return args.database_url
+
+
+@benchmark("check_user_achievements", [
+    {"achievements": 13, "progress": 10},
+    {"achievements": 13, "progress": 200},
+    {"achievements": 100, "progress": 200},
+], full_params=[{"achievements": 500, "progress": 1000}])
+def bench_check_user_achievements(args, achievements: int, progress: int):
+    db = BenchDatabase(_database_url(args))
+    try:
+        trick_ids = db.add_tricks(max(progress * 2, 50))
+        user_id = db.add_users(1)[0]
+        db.add_progress(user_id, trick_ids[:progress], days=30)
+        service = AchievementsService(db.session)
+        service.create_default_achievements()
+        # Недостижимые достижения проверяются при каждом вызове
+        extra = achievements - db.session.query(Achievement).count()
+        for i in range(max(extra, 0)):
+            db.session.add(Achievement(
+                name=f"bench {i}", description="bench", type=AchievementType.LEARNING,
+                condition_type=["tricks_learned", "category_mastered", "daily_streak"][i % 3],
+                condition_value=10 ** 6,
+                condition_data=json.dumps({"category": CATEGORIES[i % len(CATEGORIES)]}),
+            ))
+        db.session.commit()
+        UserStatsService(db.session).backfill()
+        service.check_user_achievements(user_id)
+        return measure(lambda: service.check_user_achievements(user_id))
+    finally:
+        db.close()
+
+
+@benchmark("calculate_daily_streak", [{"days": 30}, {"days": 365}], full_params=[{"days": 3650}])
+def bench_daily_streak(args, days: int):
+    db = BenchDatabase(_database_url(args))
+    try:
+        trick_ids = db.add_tricks(days)
+        user_id = db.add_users(1)[0]
+        db.add_progress(user_id, trick_ids, days=days)
+        db.session.commit()
+        service = AchievementsService(db.session)
+        return measure(lambda: service._calculate_daily_streak(user_id))
+    finally:
+        db.close()
+
+
+@benchmark("get_leaderboard", [{"users": 10000}], full_params=[{"users": 100000}])
+def bench_leaderboard(args, users: int):
+    db = BenchDatabase(_database_url(args))
+    try:
+        AchievementsService(db.session).create_default_achievements()
+        achievement_ids = [row.id for row in db.session.query(Achievement.id)]
+        user_ids = db.add_users(users)
+        rows = [
+            {"user_id": user_id, "achievement_id": achievement_ids[j]}
+            for i, user_id in enumerate(user_ids)
+            for j in range(i % len(achievement_ids))
+        ]
+        for start in range(0, len(rows), 50000):
+            db.session.execute(insert(UserAchievement), rows[start:start + 50000])
+        db.session.commit()
+        UserStatsService(db.session).backfill()
+        service = AchievementsService(db.session)
+        return measure(lambda: service.get_leaderboard(50), min_rounds=3)
+    finally:
+        db.close()
+
+
+@benchmark("get_leaderboard_week", [{"users": 10000}], full_params=[{"users": 100000}])
+def bench_leaderboard_week(args, users: int):
+    from app.leaderboards import LeaderboardService
+
+    db = BenchDatabase(_database_url(args))
+    try:
+        AchievementsService(db.session).create_default_achievements()
+        achievement_ids = [row.id for row in db.session.query(Achievement.id)]
+        user_ids = db.add_users(users)
+        rows = [
+            {"user_id": user_id, "achievement_id": achievement_ids[j]}
+            for i, user_id in enumerate(user_ids)
+            for j in range(i % len(achievement_ids))
+        ]
+        for start in range(0, len(rows), 50000):
+            db.session.execute(insert(UserAchievement), rows[start:start + 50000])
+        db.session.commit()
+        LeaderboardService(db.session).rebuild()
+        service = AchievementsService(db.session)
+        return measure(lambda: service.get_leaderboard(50, "week"), min_rounds=3)
+    finally:
+        db.close()
+
+
+def _image_bytes(fmt: str, size: tuple) -> bytes:
+    image = Image.new("RGB", size)
+    pixels = image.load()
+    for x in range(0, size[0], 16):
+        for y in range(0, size[1], 16):
+            pixels[x, y] = (x % 256, y % 256, (x * y) % 256)
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@benchmark("resize_image", [
+    {"format": "JPEG", "width": 1024, "height": 768},
+    {"format": "PNG", "width": 1024, "height": 768},
+    {"format": "WEBP", "width": 1024, "height": 768},
+    {"format": "JPEG", "width": 4000, "height": 3000},
+], full_params=[
+    {"format": "PNG", "width": 4000, "height": 3000},
+    {"format": "WEBP", "width": 4000, "height": 3000},
+])
+def bench_resize_image(args, format: str, width: int, height: int):
+    from app.images import resize_image
+
+    source = _image_bytes(format, (width, height))
+    return measure(lambda: resize_image(source), min_rounds=3)
+
+
+@benchmark("learned_set", [{"tricks": 5000, "learned": 1000}], full_params=[{"tricks": 50000, "learned": 10000}])
+def bench_learned_set(args, tricks: int, learned: int):
+    """Чтение карты изученных, освоение всех категорий и кодирование ответа"""
+    from app.learned_sets import LearnedSetService, catalog_masks, encode_bitset
+
+    db = BenchDatabase(_database_url(args))
+    try:
+        trick_ids = db.add_tricks(tricks)
+        user_id = db.add_users(1)[0]
+        db.add_progress(user_id, trick_ids[::max(tricks // learned, 1)][:learned])
+        db.session.commit()
+        LearnedSetService(db.session).rebuild()
+        service = LearnedSetService(db.session)
+
+        def run():
+            bits, _ = service.get(user_id)
+            masks = catalog_masks(db.session)
+            mastered = [name for name, mask in masks.categories.items() if bits & mask == mask]
+            return encode_bitset(bits), mastered
+
+        return measure(run, min_rounds=50)
+    finally:
+        db.close()
+
+
+@benchmark("trick_graph", [{"tricks": 5000}], full_params=[{"tricks": 50000}])
+def bench_trick_graph(args, tricks: int):
+    """Сборка графа зависимостей (цепочки внутри категорий) и открытые трюки пользователя"""
+    from app.models import TrickPrerequisite
+    from app.trick_graph import build_graph
+
+    db = BenchDatabase(_database_url(args))
+    try:
+        trick_ids = db.add_tricks(tricks)
+        step = len(CATEGORIES)
+        db.session.execute(insert(TrickPrerequisite), [
+            {"trick_id": trick_id, "prerequisite_id": trick_ids[i - step]}
+            for i, trick_id in enumerate(trick_ids) if i >= step
+        ])
+        db.session.commit()
+        learned = sum(1 << trick_id for trick_id in trick_ids[:tricks // 3])
+
+        def run():
+            graph = build_graph(db.session)
+            return graph.path(trick_ids[-1]), graph.unlocked(learned)
+
+        return measure(run, min_rounds=5)
+    finally:
+        db.close()
+
+
+@benchmark("recommend", [{"tricks": 500, "learned": 50}], full_params=[{"tricks": 5000, "learned": 500}])
+def bench_recommend(args, tricks: int, learned: int):
+    """Оценка неизученных трюков по снимку в mmap (матрица строится из синтетической истории)"""
+    import random
+    import tempfile
+
+    import numpy as np
+    from app.recommendations import Recommender, build_matrices
+
+    rng = random.Random(42)
+    users, history = [], []
+    for user_id in range(tricks * 20):
+        start = rng.randrange(1, tricks)
+        for trick_id in range(start, min(start + rng.randint(1, 20), tricks)):
+            users.append(user_id)
+            history.append(trick_id)
+    neighbors, weights, popularity = build_matrices(np.array(users), np.array(history), tricks + 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "bench"))
+        for name, array in (("neighbors", neighbors), ("weights", weights), ("popularity", popularity)):
+            np.save(os.path.join(directory, "bench", f"{name}.npy"), array)
+        with open(os.path.join(directory, "current"), "w") as f:
+            f.write("bench")
+        recommender = Recommender(directory)
+        learned_bits = sum(1 << trick_id for trick_id in rng.sample(range(1, tricks + 1), learned))
+        catalog = (1 << (tricks + 1)) - 2
+        result = measure(lambda: recommender.recommend(learned_bits, catalog, 10), min_rounds=100)
+        del recommender
+        return result
+
+
+@benchmark("find_duplicates", [{"entries": 5000}], full_params=[{"entries": 50000}])
+def bench_find_duplicates(args, entries: int):
+    """Поиск похожих по LSH-индексу MinHash (случайные названия и описания из словаря)"""
+    import random
+    import string
+
+    from app.duplicates import DuplicateIndex
+
+    rng = random.Random(42)
+    vocabulary = [
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+        for _ in range(3000)
+    ]
+    index = DuplicateIndex()
+    for item_id in range(entries):
+        index.add(("trick", item_id), " ".join(rng.sample(vocabulary, 2)), " ".join(rng.sample(vocabulary, 15)))
+    name, description = " ".join(rng.sample(vocabulary, 2)), " ".join(rng.sample(vocabulary, 15))
+    return measure(lambda: index.find(name, description), min_rounds=100)
+
+
+@benchmark("jwt_encode", [{}])
+def bench_jwt_encode(args):
+    return measure(lambda: create_access_token({"sub": "rider"}, timedelta(minutes=30)), min_rounds=100)
+
+
+@benchmark("jwt_decode", [{}])
+def bench_jwt_decode(args):
+    token = create_access_token({"sub": "rider"}, timedelta(minutes=30))
+    return measure(lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), min_rounds=100)
+
+
+@benchmark("get_current_user", [{}])
+def bench_get_current_user(args):
+    db = BenchDatabase(_database_url(args))
+    try:
+        db.session.add(User(username="rider", email="rider@example.com", password_hash="x"))
+        db.session.commit()
+        token = create_access_token({"sub": "rider"}, timedelta(minutes=30))
+        loop = asyncio.new_event_loop()
+        try:
+            return measure(lambda: loop.run_until_complete(get_current_user(token, db.session)), min_rounds=100)
+        finally:
+            loop.close()
+    finally:
+        db.close()
+
+
+def _case_id(name: str, params: dict) -> str:
+    if not params:
+        return name
+    return name + "[" + ",".join(f"{k}={v}" for k, v in params.items()) + "]"
+
+
+def run_benchmarks(args) -> dict:
+    results = {}
+    for name, func, params, full_params in BENCHMARKS:
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        for case in params + (full_params if args.full else []):
+            case_id = _case_id(name, case)
+            result = func(args, **case)
+            results[case_id] = result
+            print(f"{case_id:<60} median {result['median_ms']:>10.3f} ms  "
+                  f"min {result['min_ms']:>10.3f} ms  rounds {result['rounds']}")
+    return results
+
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for case_id, current in results.items():
+        previous = baseline.get("results", {}).get(case_id)
+        if previous and current["median_ms"] > previous["median_ms"] * (1 + tolerance):
+            regressions.append(f"{case_id}: median {previous['median_ms']} -> {current['median_ms']} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарки внутренних функций")
+    parser.add_argument("--database-url", default="sqlite://",
+                        help="По умолчанию SQLite в памяти; можно указать Postgres")
+    parser.add_argument("--full", action="store_true", help="Добавить тяжелые размеры (100k пользователей и т.п.)")
+    parser.add_argument("--only", nargs="*", default=None, help="Префиксы имен бенчмарков")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Допустимое замедление медианы (0.5 = 50%%)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "machine": platform.platform(),
+                "python": platform.python_version(),
+                "database": args.database_url.split("@")[-1],
+                "results": results,
+            }, f, indent=2)
+        print(f"Baseline сохранен: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("Baseline не найден, сравнение пропущено")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+    if regressions:
+        print("Регрессии относительно baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("Регрессий относительно baseline нет")
+
+
+if __name__ == "__main__":
+    main()
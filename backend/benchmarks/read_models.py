@@ -0,0 +1,87 @@
+"""Память и время чтения списков: ORM-объекты против моделей чтения (dataclass со __slots__)"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.models import Trick, UserProgress  # noqa: E402
+from app.read_models import load_learned_tricks, load_tricks  # noqa: E402
+from benchmarks.micro import BenchDatabase  # noqa: E402
+
+
+def seed(db: BenchDatabase, tricks: int) -> int:
+    db.session.execute(insert(Trick), [
+        {"name": f"Trick {i}", "category": "spins", "description": "Описание трюка " * 10,
+         "technique": "1. Шаг техники\n" * 6, "image_url": f"/uploads/images/{i}.jpg",
+         "video_url": "https://www.youtube.com/watch?v=example"}
+        for i in range(tricks)
+    ])
+    user_id = db.add_users(1)[0]
+    db.add_progress(user_id, [row.id for row in db.session.query(Trick.id)])
+    db.session.commit()
+    return user_id
+
+
+def profile(func, rounds: int) -> dict:
+    """Пик памяти (tracemalloc) и лучшее время одного вызова"""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return {"peak_kb": round(peak / 1024, 1), "ms": round(best * 1000, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение ORM и моделей чтения")
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--tricks", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    db = BenchDatabase(args.database_url)
+    try:
+        user_id = seed(db, args.tricks)
+        session = db.session
+
+        def tricks_orm():
+            session.expunge_all()
+            return session.query(Trick).all()
+
+        def learned_orm():
+            # Прежний путь: прогресс + ленивая загрузка трюка по связи
+            session.expunge_all()
+            return [(p.learned_at, p.trick) for p in session.query(UserProgress).filter(UserProgress.user_id == user_id)]
+
+        cases = {
+            "tricks: ORM": tricks_orm,
+            "tricks: read model": lambda: load_tricks(session),
+            "learned-tricks: ORM": learned_orm,
+            "learned-tricks: read model": lambda: load_learned_tricks(session, user_id),
+        }
+        results = {name: profile(func, args.rounds) for name, func in cases.items()}
+    finally:
+        db.close()
+
+    for name, value in results.items():
+        print(f"{name:<30} {value['peak_kb']:>10.1f} KiB {value['ms']:>10.3f} ms")
+    print(json.dumps({"tricks": args.tricks, "results": results}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
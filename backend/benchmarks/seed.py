@@ -0,0 +1,143 @@
+"""Генерация синтетического набора данных для нагрузочных тестов"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.achievements_service import AchievementsService  # noqa: E402
+from app.auth import get_password_hash  # noqa: E402
+from app.user_stats_service import UserStatsService  # noqa: E402
+from app.models import (  # noqa: E402
+    Achievement, Base, Trick, User, UserAchievement, UserProgress, UserRole
+)
+
+BENCH_USER_PREFIX = "bench_user_"
+BENCH_PASSWORD = "benchpass"
+TRICKS_JSON_PATHS = [
+    os.path.join(os.path.dirname(__file__), "..", "tricks.json"),
+    os.path.join(os.path.dirname(__file__), "..", "..", "tricks.json"),
+]
+
+
+def load_base_tricks() -> list:
+    for path in TRICKS_JSON_PATHS:
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)["tricks"]
+    raise FileNotFoundError("tricks.json не найден")
+
+
+def _learned_count(rng: random.Random, total_tricks: int) -> int:
+    """Сколько трюков изучил пользователь: большинство - немного, единицы - почти всё"""
+    return min(int(rng.paretovariate(1.2)) - 1, total_tricks)
+
+
+def seed_dataset(database_url: str, users: int, tricks_scale: int, seed: int = 42,
+                 batch_size: int = 5000) -> dict:
+    """Заполняет базу пользователями, трюками, прогрессом и достижениями"""
+    rng = random.Random(seed)
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+
+    with Session(engine) as db:
+        if db.scalar(select(User.id).where(User.username.like(f"{BENCH_USER_PREFIX}%")).limit(1)):
+            print("Синтетические данные уже загружены, пропускаем")
+            return {"skipped": True}
+
+        # Трюки: базовый каталог, размноженный tricks_scale раз
+        base_tricks = load_base_tricks()
+        trick_rows = []
+        for copy in range(tricks_scale):
+            for trick in base_tricks:
+                suffix = f" #{copy + 1}" if copy else ""
+                trick_rows.append({
+                    "name": trick["name"] + suffix,
+                    "category": trick["category"],
+                    "description": trick["description"],
+                    "image_url": trick.get("image"),
+                    "technique": trick.get("technique"),
+                    "video_url": trick.get("video_url"),
+                })
+        db.execute(insert(Trick), trick_rows)
+        trick_ids = list(db.scalars(select(Trick.id)))
+
+        AchievementsService(db).create_default_achievements()
+        learning_achievements = db.execute(
+            select(Achievement.id, Achievement.condition_value)
+            .where(Achievement.condition_type == "tricks_learned")
+        ).all()
+
+        # Все пользователи получают один хеш: bcrypt на каждого занял бы минуты
+        password_hash = get_password_hash(BENCH_PASSWORD)
+        user_rows = [
+            {
+                "username": f"{BENCH_USER_PREFIX}{i}",
+                "email": f"{BENCH_USER_PREFIX}{i}@example.com",
+                "password_hash": password_hash,
+                "role": UserRole.USER,
+                "is_active": True,
+            }
+            for i in range(users)
+        ]
+        for start in range(0, len(user_rows), batch_size):
+            db.execute(insert(User), user_rows[start:start + batch_size])
+        user_ids = list(db.scalars(
+            select(User.id).where(User.username.like(f"{BENCH_USER_PREFIX}%")).order_by(User.id)
+        ))
+
+        # Прогресс и достижения за количество изученных трюков
+        now = datetime.utcnow()
+        progress_rows, achievement_rows = [], []
+        for user_id in user_ids:
+            learned = rng.sample(trick_ids, _learned_count(rng, len(trick_ids)))
+            for trick_id in learned:
+                progress_rows.append({
+                    "user_id": user_id,
+                    "trick_id": trick_id,
+                    "learned_at": now - timedelta(days=rng.randint(0, 60), seconds=rng.randint(0, 86400)),
+                })
+            for achievement_id, condition_value in learning_achievements:
+                if len(learned) >= condition_value:
+                    achievement_rows.append({"user_id": user_id, "achievement_id": achievement_id})
+
+            if len(progress_rows) >= batch_size:
+                db.execute(insert(UserProgress), progress_rows)
+                progress_rows = []
+        if progress_rows:
+            db.execute(insert(UserProgress), progress_rows)
+        for start in range(0, len(achievement_rows), batch_size):
+            db.execute(insert(UserAchievement), achievement_rows[start:start + batch_size])
+
+        db.commit()
+        # Счетчики считаются одним INSERT ... SELECT по уже загруженным данным
+        UserStatsService(db).backfill()
+        stats = {
+            "users": len(user_ids),
+            "tricks": len(trick_ids),
+            "progress": db.query(UserProgress).count(),
+            "user_achievements": len(achievement_rows),
+        }
+    print(f"Загружены синтетические данные: {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетические данные для бенчмарков")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./bench.db"))
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tricks-scale", type=int, default=10,
+                        help="Во сколько раз размножить каталог tricks.json")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    seed_dataset(args.database_url, args.users, args.tricks_scale, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""CPU на сериализацию ответа /api/tricks и /api/leaderboard: старый путь против быстрого"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import orjson  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.achievements_service import AchievementsService  # noqa: E402
+from app.models import Achievement, Trick, UserAchievement  # noqa: E402
+from app.schemas import TrickResponse  # noqa: E402
+from app.user_stats_service import UserStatsService  # noqa: E402
+from benchmarks.micro import BenchDatabase  # noqa: E402
+
+TRICK_COLUMNS = (
+    Trick.id, Trick.name, Trick.category, Trick.description,
+    Trick.image_url, Trick.technique, Trick.video_url, Trick.created_at
+)
+
+
+def cpu_per_call(func, rounds: int) -> float:
+    """Медианное процессорное время одного вызова, мс"""
+    samples = []
+    for _ in range(rounds):
+        t0 = time.process_time()
+        func()
+        samples.append((time.process_time() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def seed(db: BenchDatabase, tricks: int, users: int) -> None:
+    db.session.execute(insert(Trick), [
+        {"name": f"Trick {i}", "category": "spins", "description": "Описание трюка " * 10,
+         "technique": "1. Шаг техники\n" * 6, "image_url": f"/uploads/images/{i}.jpg",
+         "video_url": "https://www.youtube.com/watch?v=example"}
+        for i in range(tricks)
+    ])
+    AchievementsService(db.session).create_default_achievements()
+    achievement_ids = [row.id for row in db.session.query(Achievement.id)]
+    user_ids = db.add_users(users)
+    db.session.execute(insert(UserAchievement), [
+        {"user_id": user_id, "achievement_id": achievement_ids[j]}
+        for i, user_id in enumerate(user_ids)
+        for j in range(i % len(achievement_ids))
+    ])
+    db.session.commit()
+    UserStatsService(db.session).backfill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение путей сериализации")
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--tricks", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    db = BenchDatabase(args.database_url)
+    loop = asyncio.new_event_loop()
+    try:
+        seed(db, args.tricks, args.users)
+        session = db.session
+        tricks_field = create_response_field(name="Response_get_tricks", type_=List[TrickResponse])
+
+        def tricks_orm_pydantic():
+            # ORM-объекты -> валидация response_model -> stdlib json
+            session.expunge_all()
+            tricks = session.query(Trick).all()
+            content = loop.run_until_complete(serialize_response(field=tricks_field, response_content=tricks))
+            JSONResponse(content).body
+
+        def tricks_core_orjson():
+            rows = [dict(row) for row in session.execute(select(*TRICK_COLUMNS).order_by(Trick.id)).mappings()]
+            orjson.dumps(rows)
+
+        service = AchievementsService(session)
+
+        def leaderboard_default():
+            JSONResponse(jsonable_encoder(service.get_leaderboard(50))).body
+
+        def leaderboard_orjson():
+            orjson.dumps(service.get_leaderboard(50))
+
+        cases = {
+            "tricks: ORM + pydantic + json": tricks_orm_pydantic,
+            "tricks: Core rows + orjson": tricks_core_orjson,
+            "leaderboard: jsonable_encoder + json": leaderboard_default,
+            "leaderboard: orjson": leaderboard_orjson,
+        }
+        results = {name: round(cpu_per_call(func, args.rounds), 3) for name, func in cases.items()}
+    finally:
+        loop.close()
+        db.close()
+
+    for name, value in results.items():
+        print(f"{name:<40} {value:>9.3f} ms CPU")
+    print(json.dumps({"tricks": args.tricks, "users": args.users, "cpu_ms": results}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
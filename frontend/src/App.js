@@ -6,6 +6,7 @@ import { motion } from 'framer-motion';
 // Components
 import Header from './components/Header';
 import Footer from './components/Footer';
+import LiveAchievements from './components/LiveAchievements';
 import HomePage from './pages/HomePage';
 import TricksPage from './pages/TricksPage';
 import FlashcardsPage from './pages/FlashcardsPage';
@@ -39,6 +40,7 @@ function App() {
     <AuthProvider>
       <AppContainer>
         <Header />
+        <LiveAchievements />
         <MainContent
           initial={{ opacity: 0 }}
           animate={{ opacity: 1 }}
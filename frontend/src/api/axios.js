@@ -20,13 +20,64 @@ api.interceptors.request.use(
   }
 );
 
+// Один запрос обновления на все параллельные 401
+let refreshPromise = null;
+
+const refreshTokens = async () => {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) {
+    throw new Error('No refresh token');
+  }
+  try {
+    // Отдельный axios без interceptors, чтобы 401 обновления не зациклился
+    const response = await axios.post(`${api.defaults.baseURL}/api/auth/refresh`, {
+      refresh_token: refreshToken,
+    });
+    const { access_token, refresh_token } = response.data;
+    localStorage.setItem('access_token', access_token);
+    localStorage.setItem('refresh_token', refresh_token);
+    api.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
+    return access_token;
+  } catch (error) {
+    // Токен уже обновила другая вкладка - берем новый из хранилища
+    if (error.response?.status === 409 && localStorage.getItem('refresh_token') !== refreshToken) {
+      return localStorage.getItem('access_token');
+    }
+    throw error;
+  }
+};
+
 // Добавляем interceptors для обработки ошибок
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const original = error.config;
+    // Истек access-токен: обновляем его по refresh-токену и повторяем запрос
+    if (
+      error.response?.status === 401 &&
+      original &&
+      !original._retry &&
+      !original.url?.startsWith('/api/auth/login') &&
+      localStorage.getItem('refresh_token')
+    ) {
+      original._retry = true;
+      try {
+        if (!refreshPromise) {
+          refreshPromise = refreshTokens().finally(() => {
+            refreshPromise = null;
+          });
+        }
+        const accessToken = await refreshPromise;
+        original.headers.Authorization = `Bearer ${accessToken}`;
+        return api(original);
+      } catch (refreshError) {
+        // Сессия истекла или отозвана - ниже как при недействительном токене
+      }
+    }
     // Если токен недействителен, удаляем его
     if (error.response?.status === 401) {
       localStorage.removeItem('access_token');
+      localStorage.removeItem('refresh_token');
       // Перенаправляем на страницу входа, если это не гостевой запрос
       if (window.location.pathname !== '/' && window.location.pathname !== '/tricks') {
         window.location.href = '/login';
@@ -0,0 +1,60 @@
+import api from './axios';
+
+// Одно SSE-соединение на вкладку: страницы подписываются на нужные события
+const listeners = new Map();
+let source = null;
+let sourceToken = null;
+
+const dispatch = (eventName, event) => {
+  const callbacks = listeners.get(eventName);
+  if (!callbacks) return;
+  const data = JSON.parse(event.data);
+  callbacks.forEach((callback) => callback(data));
+};
+
+const disconnect = () => {
+  if (source) {
+    source.close();
+    source = null;
+    sourceToken = null;
+  }
+};
+
+const connect = () => {
+  const token = localStorage.getItem('access_token');
+  if (source && sourceToken === token) return;
+  disconnect();
+
+  const baseURL = api.defaults.baseURL || '';
+  const url = token
+    ? `${baseURL}/api/events?token=${encodeURIComponent(token)}`
+    : `${baseURL}/api/events`;
+
+  source = new EventSource(url);
+  sourceToken = token;
+  ['achievements', 'leaderboard'].forEach((eventName) => {
+    source.addEventListener(eventName, (event) => dispatch(eventName, event));
+  });
+  // Сервер отключил отставшего клиента: переподключаемся и перечитываем данные
+  source.addEventListener('reset', () => {
+    disconnect();
+    dispatch('reset', { data: '{}' });
+    connect();
+  });
+};
+
+export const subscribeEvents = (eventName, callback) => {
+  if (!listeners.has(eventName)) {
+    listeners.set(eventName, new Set());
+  }
+  listeners.get(eventName).add(callback);
+  connect();
+
+  return () => {
+    listeners.get(eventName)?.delete(callback);
+    const hasListeners = Array.from(listeners.values()).some((callbacks) => callbacks.size > 0);
+    if (!hasListeners) {
+      disconnect();
+    }
+  };
+};
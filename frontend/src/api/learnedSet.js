@@ -0,0 +1,18 @@
+import api from './axios';
+
+// Изученные трюки приходят битсетом: бит N (младший бит байта первым) = трюк с id N
+export const decodeLearnedSet = (data) => {
+  const binary = atob(data || '');
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i += 1) {
+    bytes[i] = binary.charCodeAt(i);
+  }
+  return {
+    has: (trickId) => (((bytes[trickId >> 3] || 0) >> (trickId & 7)) & 1) === 1,
+  };
+};
+
+export const fetchLearnedSet = async (userId) => {
+  const response = await api.get(`/api/users/${userId}/learned-set`);
+  return decodeLearnedSet(response.data.data);
+};
@@ -0,0 +1,43 @@
+import React, { useEffect, useState } from 'react';
+import { useQueryClient } from 'react-query';
+import { useNavigate } from 'react-router-dom';
+import AchievementNotification from './AchievementNotification';
+import { useAuth } from '../contexts/AuthContext';
+import { subscribeEvents } from '../api/events';
+
+// Показывает новые достижения, пришедшие по push-каналу
+function LiveAchievements() {
+  const { user } = useAuth();
+  const queryClient = useQueryClient();
+  const navigate = useNavigate();
+  const [achievements, setAchievements] = useState([]);
+
+  useEffect(() => {
+    if (!user?.id) return undefined;
+
+    return subscribeEvents('achievements', (newAchievements) => {
+      setAchievements((current) => [...newAchievements, ...current]);
+      queryClient.invalidateQueries(['userAchievements', user.id]);
+      queryClient.invalidateQueries(['userStats', user.id]);
+    });
+  }, [user?.id, queryClient]);
+
+  const handleClose = (index) => {
+    setAchievements((current) => current.filter((_, i) => i !== index));
+  };
+
+  const handleViewAll = () => {
+    setAchievements([]);
+    navigate('/achievements');
+  };
+
+  return (
+    <AchievementNotification
+      achievements={achievements}
+      onClose={handleClose}
+      onViewAll={handleViewAll}
+    />
+  );
+}
+
+export default LiveAchievements;
@@ -1,7 +1,9 @@
 import React from 'react';
+import { useQuery } from 'react-query';
 import styled from 'styled-components';
 import { motion, AnimatePresence } from 'framer-motion';
-import { X, Play, BookOpen, ExternalLink, CheckCircle } from 'lucide-react';
+import { X, Play, BookOpen, ExternalLink, CheckCircle, GitBranch } from 'lucide-react';
+import api from '../api/axios';
 import TrickImage from './TrickImage';
 import { useAuth } from '../contexts/AuthContext';
 
@@ -142,6 +144,29 @@ const TechniqueStep = styled.li`
   padding-left: 30px;
 `;
 
+const PathList = styled.div`
+  display: flex;
+  flex-wrap: wrap;
+  align-items: center;
+  gap: 8px;
+`;
+
+const PathStep = styled.span`
+  background: ${props => props.learned ? '#ecfdf5' : '#f8f9fa'};
+  color: ${props => props.learned ? '#059669' : '#333'};
+  border: 1px solid ${props => props.learned ? '#a7f3d0' : '#e5e7eb'};
+  padding: 6px 12px;
+  border-radius: 15px;
+  font-size: 0.9rem;
+  display: inline-flex;
+  align-items: center;
+  gap: 6px;
+`;
+
+const PathArrow = styled.span`
+  color: #999;
+`;
+
 const VideoSection = styled.div`
   background: #f8f9fa;
   padding: 20px;
@@ -218,9 +243,19 @@ const categoryTranslations = {
   'combo': 'Комбо'
 };
 
-function TrickDetailModal({ trick, isOpen, onClose, onMarkLearned }) {
+function TrickDetailModal({ trick, isOpen, onClose, onMarkLearned, isLearned = false, learnedSet = null }) {
   const { isAuthenticated } = useAuth();
 
+  // Цепочка зависимостей: без самого трюка, в порядке изучения
+  const { data: path } = useQuery(
+    ['trickPath', trick?.id],
+    async () => {
+      const response = await api.get(`/api/tricks/${trick.id}/path`);
+      return response.data.path.slice(0, -1);
+    },
+    { enabled: !!trick && isOpen, staleTime: 5 * 60 * 1000 }
+  );
+
   if (!trick) return null;
 
   const handleOverlayClick = (e) => {
@@ -285,6 +320,26 @@ function TrickDetailModal({ trick, isOpen, onClose, onMarkLearned }) {
 
               <Description>{trick.description}</Description>
 
+              {path?.length > 0 && (
+                <Section>
+                  <SectionTitle>
+                    <GitBranch size={20} />
+                    Сначала освойте
+                  </SectionTitle>
+                  <PathList>
+                    {path.map((step, index) => (
+                      <React.Fragment key={step.id}>
+                        {index > 0 && <PathArrow>→</PathArrow>}
+                        <PathStep learned={!!learnedSet?.has(step.id)}>
+                          {learnedSet?.has(step.id) && <CheckCircle size={14} />}
+                          {step.name}
+                        </PathStep>
+                      </React.Fragment>
+                    ))}
+                  </PathList>
+                </Section>
+              )}
+
               <Section>
                 <SectionTitle>
                   <BookOpen size={20} />
@@ -314,9 +369,9 @@ function TrickDetailModal({ trick, isOpen, onClose, onMarkLearned }) {
 
             {isAuthenticated() && (
               <ActionSection>
-                <LearnButton onClick={() => onMarkLearned(trick.id)}>
+                <LearnButton onClick={() => onMarkLearned(trick.id)} disabled={isLearned}>
                   <CheckCircle size={18} />
-                  Отметить как изученное
+                  {isLearned ? 'Уже изучено' : 'Отметить как изученное'}
                 </LearnButton>
               </ActionSection>
             )}
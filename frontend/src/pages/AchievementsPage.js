@@ -209,27 +209,35 @@ function AchievementsPage() {
   const { user, isAuthenticated } = useAuth();
   const [activeFilter, setActiveFilter] = useState('all');
 
-  const { data: allAchievements, isLoading: achievementsLoading } = useQuery(
+  const hasUser = !!user?.id && isAuthenticated();
+
+  // Гостям - только список достижений, пользователю - список и свои одним запросом
+  const { data: publicAchievements, isLoading: achievementsLoading } = useQuery(
     'achievements',
     async () => {
       const response = await api.get('/api/achievements');
       return response.data;
+    },
+    {
+      enabled: !hasUser
     }
   );
 
-  const { data: userAchievements, isLoading: userAchievementsLoading } = useQuery(
+  const { data: dashboard, isLoading: userAchievementsLoading } = useQuery(
     ['userAchievements', user?.id],
     async () => {
       if (!user?.id) return null;
-      const response = await api.get(`/api/users/${user.id}/achievements`);
+      const response = await api.get(`/api/users/${user.id}/dashboard?include=achievements,all_achievements`);
       return response.data;
     },
     {
-      enabled: !!user?.id && isAuthenticated()
+      enabled: hasUser
     }
   );
+  const allAchievements = hasUser ? dashboard?.all_achievements : publicAchievements;
+  const userAchievements = dashboard?.achievements;
 
-  const isLoading = achievementsLoading || (isAuthenticated() && userAchievementsLoading);
+  const isLoading = hasUser ? userAchievementsLoading : achievementsLoading;
 
   if (isLoading) {
     return (
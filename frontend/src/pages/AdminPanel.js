@@ -89,6 +89,25 @@ const AddButton = styled.button`
   }
 `;
 
+const BulkActions = styled.div`
+  display: flex;
+  align-items: center;
+  gap: 10px;
+  margin-bottom: 20px;
+  color: #666;
+
+  button {
+    margin-bottom: 0;
+  }
+
+  button:disabled {
+    opacity: 0.5;
+    cursor: not-allowed;
+    transform: none;
+    box-shadow: none;
+  }
+`;
+
 const Table = styled.table`
   width: 100%;
   border-collapse: collapse;
@@ -109,6 +128,12 @@ const Td = styled.td`
   vertical-align: top;
 `;
 
+const DuplicateHint = styled.div`
+  margin-top: 4px;
+  font-size: 0.75rem;
+  color: #d97706;
+`;
+
 const StatusBadge = styled.span`
   padding: 4px 12px;
   border-radius: 12px;
@@ -233,6 +258,7 @@ function AdminPanel() {
   const [tricks, setTricks] = useState([]);
   const [users, setUsers] = useState([]);
   const [suggestions, setSuggestions] = useState([]);
+  const [selectedSuggestions, setSelectedSuggestions] = useState([]);
   const [loading, setLoading] = useState(false);
   const [showModal, setShowModal] = useState(false);
   const [editingItem, setEditingItem] = useState(null);
@@ -299,6 +325,7 @@ function AdminPanel() {
       setLoading(true);
       const response = await api.get('/api/suggestions/tricks');
       setSuggestions(response.data);
+      setSelectedSuggestions([]);
     } catch (error) {
       toast.error('Ошибка загрузки предложений');
     } finally {
@@ -321,6 +348,42 @@ function AdminPanel() {
     }
   };
 
+  const pendingSuggestionIds = suggestions
+    .filter(suggestion => suggestion.status === 'pending')
+    .map(suggestion => suggestion.id);
+
+  const toggleSuggestion = (suggestionId) => {
+    setSelectedSuggestions(selected =>
+      selected.includes(suggestionId)
+        ? selected.filter(id => id !== suggestionId)
+        : [...selected, suggestionId]
+    );
+  };
+
+  const toggleAllSuggestions = () => {
+    setSelectedSuggestions(selected =>
+      selected.length === pendingSuggestionIds.length ? [] : pendingSuggestionIds
+    );
+  };
+
+  // Все выбранные предложения - одним запросом и одной транзакцией
+  const handleModerateSelected = async (status) => {
+    try {
+      const response = await api.post('/api/suggestions/tricks/moderate:batch', {
+        items: selectedSuggestions.map(id => ({ id, status }))
+      });
+      const { processed, results } = response.data;
+      const skipped = results.length - processed;
+      toast.success(`Обработано предложений: ${processed}`);
+      if (skipped > 0) {
+        toast.error(`Пропущено (уже модерируются или отмодерированы): ${skipped}`);
+      }
+      loadSuggestions();
+    } catch (error) {
+      toast.error(error.response?.data?.detail || 'Ошибка при модерации предложений');
+    }
+  };
+
   const handleViewSuggestion = (suggestion) => {
     setEditingItem(suggestion);
     setFormData({
@@ -375,9 +438,10 @@ function AdminPanel() {
         loadTricks();
         toast.success('Трюк удален');
       } else if (activeTab === 'users') {
-        await api.delete(`/api/admin/users/${id}`);
+        const response = await api.delete(`/api/admin/users/${id}`);
         loadUsers();
-        toast.success('Пользователь удален');
+        // Крупный аккаунт удаляется фоновой задачей
+        toast.success(response.status === 202 ? 'Удаление запущено в фоне' : 'Пользователь удален');
       }
     } catch (error) {
       toast.error('Ошибка удаления');
@@ -558,9 +622,35 @@ function AdminPanel() {
             ) : suggestions.length === 0 ? (
               <div>Нет предложений для модерации</div>
             ) : (
+              <>
+              <BulkActions>
+                <AddButton
+                  disabled={selectedSuggestions.length === 0}
+                  onClick={() => handleModerateSelected('approved')}
+                >
+                  <Check size={16} />
+                  Одобрить выбранные
+                </AddButton>
+                <AddButton
+                  disabled={selectedSuggestions.length === 0}
+                  onClick={() => handleModerateSelected('rejected')}
+                >
+                  <XCircle size={16} />
+                  Отклонить выбранные
+                </AddButton>
+                {selectedSuggestions.length > 0 && <span>Выбрано: {selectedSuggestions.length}</span>}
+              </BulkActions>
               <Table>
                 <thead>
                   <tr>
+                    <Th>
+                      <input
+                        type="checkbox"
+                        checked={pendingSuggestionIds.length > 0 && selectedSuggestions.length === pendingSuggestionIds.length}
+                        onChange={toggleAllSuggestions}
+                        title="Выбрать все ожидающие"
+                      />
+                    </Th>
                     <Th>ID</Th>
                     <Th>Название</Th>
                     <Th>Категория</Th>
@@ -573,8 +663,28 @@ function AdminPanel() {
                 <tbody>
                   {suggestions.map((suggestion) => (
                     <tr key={suggestion.id}>
+                      <Td>
+                        {suggestion.status === 'pending' && (
+                          <input
+                            type="checkbox"
+                            checked={selectedSuggestions.includes(suggestion.id)}
+                            onChange={() => toggleSuggestion(suggestion.id)}
+                          />
+                        )}
+                      </Td>
                       <Td>{suggestion.id}</Td>
-                      <Td>{suggestion.name}</Td>
+                      <Td>
+                        {suggestion.name}
+                        {suggestion.possible_duplicates?.length > 0 && (
+                          <DuplicateHint
+                            title={suggestion.possible_duplicates
+                              .map(item => `${item.type === 'trick' ? 'Трюк' : 'Предложение'} #${item.id}: ${item.name} (${Math.round(item.score * 100)}%)`)
+                              .join('\n')}
+                          >
+                            Похоже на: {suggestion.possible_duplicates.map(item => item.name).join(', ')}
+                          </DuplicateHint>
+                        )}
+                      </Td>
                       <Td>{suggestion.category}</Td>
                       <Td>{suggestion.suggester?.username || 'N/A'}</Td>
                       <Td>{new Date(suggestion.created_at).toLocaleDateString('ru-RU')}</Td>
@@ -617,6 +727,7 @@ function AdminPanel() {
                   ))}
                 </tbody>
               </Table>
+              </>
             )}
           </>
         )}
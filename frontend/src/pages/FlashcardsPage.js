@@ -6,6 +6,10 @@ import { ChevronLeft, ChevronRight, Check, X, Shuffle } from 'lucide-react';
 import api from '../api/axios';
 import toast from 'react-hot-toast';
 import TrickImage from '../components/TrickImage';
+import { useAuth } from '../contexts/AuthContext';
+
+// Сколько карточек к повторению загружать за раз
+const REVIEW_BATCH_SIZE = 20;
 
 const Container = styled.div`
   max-width: 800px;
@@ -252,20 +256,29 @@ function FlashcardsPage() {
   const [currentIndex, setCurrentIndex] = useState(0);
   const [isFlipped, setIsFlipped] = useState(false);
   const [shuffledTricks, setShuffledTricks] = useState([]);
+  const { isAuthenticated } = useAuth();
+  // Для авторизованных - серверная очередь повторения вместо всего каталога
+  const useReviewQueue = isAuthenticated();
 
-  const { data: tricks, isLoading } = useQuery(
-    ['tricks', selectedCategory],
+  const { data: tricks, isLoading, refetch } = useQuery(
+    [useReviewQueue ? 'flashcardsDue' : 'tricks', selectedCategory],
     async () => {
-      const url = selectedCategory 
-        ? `/api/tricks?category=${selectedCategory}`
-        : '/api/tricks';
+      let url;
+      if (useReviewQueue) {
+        url = `/api/flashcards/due?limit=${REVIEW_BATCH_SIZE}`;
+        if (selectedCategory) url += `&category=${selectedCategory}`;
+      } else {
+        url = selectedCategory 
+          ? `/api/tricks?category=${selectedCategory}`
+          : '/api/tricks';
+      }
       const response = await api.get(url);
       return response.data;
     },
     {
       onSuccess: (data) => {
-        const shuffled = [...data].sort(() => Math.random() - 0.5);
-        setShuffledTricks(shuffled);
+        const cards = useReviewQueue ? data : [...data].sort(() => Math.random() - 0.5);
+        setShuffledTricks(cards);
         setCurrentIndex(0);
         setIsFlipped(false);
       }
@@ -307,14 +320,34 @@ function FlashcardsPage() {
     }
   };
 
-  const handleCorrect = () => {
-    toast.success('Правильно! 🎉');
+  const submitReview = async (grade) => {
+    if (!useReviewQueue || !currentTrick) return;
+    try {
+      await api.post(`/api/flashcards/${currentTrick.id}/review`, { grade });
+    } catch (error) {
+      toast.error('Не удалось сохранить ответ');
+    }
+  };
+
+  const advance = () => {
+    // Очередь закончилась - подгружаем следующую порцию к повторению
+    if (useReviewQueue && currentIndex === shuffledTricks.length - 1) {
+      refetch();
+      return;
+    }
     handleNext();
   };
 
-  const handleIncorrect = () => {
+  const handleCorrect = async () => {
+    await submitReview(4);
+    toast.success('Правильно! 🎉');
+    advance();
+  };
+
+  const handleIncorrect = async () => {
+    await submitReview(1);
     toast.error('Попробуйте еще раз! 💪');
-    handleNext();
+    advance();
   };
 
   if (isLoading) {
@@ -370,10 +403,12 @@ function FlashcardsPage() {
             </option>
           ))}
         </CategorySelect>
-        <ControlButton onClick={handleShuffle}>
-          <Shuffle size={18} />
-          Перемешать
-        </ControlButton>
+        {!useReviewQueue && (
+          <ControlButton onClick={handleShuffle}>
+            <Shuffle size={18} />
+            Перемешать
+          </ControlButton>
+        )}
       </Controls>
 
       <Navigation>
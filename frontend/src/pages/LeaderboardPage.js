@@ -1,10 +1,11 @@
-import React, { useState } from 'react';
-import { useQuery } from 'react-query';
+import React, { useState, useEffect } from 'react';
+import { useQuery, useQueryClient } from 'react-query';
 import { Link } from 'react-router-dom';
 import styled from 'styled-components';
 import { motion } from 'framer-motion';
 import { Trophy, Medal, Award, Crown, TrendingUp, Users, Star, UserPlus } from 'lucide-react';
 import api from '../api/axios';
+import { subscribeEvents } from '../api/events';
 import { useAuth } from '../contexts/AuthContext';
 
 const Container = styled.div`
@@ -36,6 +37,39 @@ const Subtitle = styled.p`
   margin-bottom: 10px;
 `;
 
+const Filters = styled.div`
+  display: flex;
+  justify-content: center;
+  flex-wrap: wrap;
+  gap: 10px;
+  margin-top: 20px;
+`;
+
+const WindowButton = styled.button`
+  padding: 8px 18px;
+  border-radius: 20px;
+  border: 2px solid rgba(255, 255, 255, 0.6);
+  background: ${props => props.active ? 'white' : 'transparent'};
+  color: ${props => props.active ? '#667eea' : 'white'};
+  font-weight: 500;
+  cursor: pointer;
+`;
+
+const CategorySelect = styled.select`
+  padding: 8px 14px;
+  border-radius: 20px;
+  border: 2px solid rgba(255, 255, 255, 0.6);
+  background: white;
+  color: #333;
+  cursor: pointer;
+`;
+
+const windowNames = {
+  all: 'Все время',
+  month: 'Месяц',
+  week: 'Неделя'
+};
+
 const LeaderboardCard = styled(motion.div)`
   background: rgba(255, 255, 255, 0.95);
   backdrop-filter: blur(10px);
@@ -257,17 +291,59 @@ const CallToActionButton = styled(Link)`
 
 function LeaderboardPage() {
   const { isGuest } = useAuth();
+  const queryClient = useQueryClient();
+  const [period, setPeriod] = useState('all');
+  const [category, setCategory] = useState('');
   const { data: leaderboard, isLoading, error } = useQuery(
-    'leaderboard',
+    ['leaderboard', period, category],
     async () => {
-      const response = await api.get('/api/leaderboard?limit=50');
+      const params = new URLSearchParams({ limit: 50, window: period });
+      if (category) params.append('category', category);
+      const response = await api.get(`/api/leaderboard?${params}`);
       return response.data;
-    },
-    {
-      refetchInterval: 30000, // Обновляем каждые 30 секунд
     }
   );
 
+  const { data: categories } = useQuery('categories', async () => {
+    const response = await api.get('/api/categories');
+    return response.data;
+  });
+
+  // Свежий общий топ приходит по push-каналу вместо опроса
+  useEffect(() => {
+    const unsubscribeLeaderboard = subscribeEvents('leaderboard', (data) => {
+      queryClient.setQueryData(['leaderboard', 'all', ''], data);
+    });
+    const unsubscribeReset = subscribeEvents('reset', () => {
+      queryClient.invalidateQueries('leaderboard');
+    });
+    return () => {
+      unsubscribeLeaderboard();
+      unsubscribeReset();
+    };
+  }, [queryClient]);
+
+  // По категории рейтинг считается по изученным трюкам, иначе - по очкам
+  const scoreLabel = (user) => (category
+    ? `${user.learned_count} трюков`
+    : `${user.total_points} очков`);
+
+  const filters = (
+    <Filters>
+      {Object.entries(windowNames).map(([value, label]) => (
+        <WindowButton key={value} active={period === value} onClick={() => setPeriod(value)}>
+          {label}
+        </WindowButton>
+      ))}
+      <CategorySelect value={category} onChange={(e) => setCategory(e.target.value)}>
+        <option value="">Все категории</option>
+        {categories?.map(name => (
+          <option key={name} value={name}>{name}</option>
+        ))}
+      </CategorySelect>
+    </Filters>
+  );
+
   const getRankIcon = (rank) => {
     switch (rank) {
       case 1: return <Crown color="white" size={32} />;
@@ -285,6 +361,7 @@ function LeaderboardPage() {
             <Trophy size={40} />
             Лидерборд
           </Title>
+          {filters}
         </Header>
         <LeaderboardCard>
           <LoadingState>Загружаем рейтинг...</LoadingState>
@@ -301,6 +378,7 @@ function LeaderboardPage() {
             <Trophy size={40} />
             Лидерборд
           </Title>
+          {filters}
         </Header>
         <LeaderboardCard>
           <EmptyState>
@@ -321,6 +399,7 @@ function LeaderboardPage() {
             <Trophy size={40} />
             Лидерборд
           </Title>
+          {filters}
         </Header>
         <LeaderboardCard>
           <EmptyState>
@@ -344,6 +423,7 @@ function LeaderboardPage() {
           Лидерборд
         </Title>
         <Subtitle>Топ райдеров по очкам достижений</Subtitle>
+        {filters}
       </Header>
 
       <LeaderboardCard
@@ -365,7 +445,7 @@ function LeaderboardPage() {
                   {getRankIcon(user.rank)}
                 </PodiumIcon>
                 <PodiumName>{user.username}</PodiumName>
-                <PodiumPoints>{user.total_points} очков</PodiumPoints>
+                <PodiumPoints>{scoreLabel(user)}</PodiumPoints>
                 <PodiumAchievements>
                   <Star size={14} />
                   {user.achievements_count} достижений
@@ -394,7 +474,7 @@ function LeaderboardPage() {
                     </span>
                   </UserStats>
                 </UserInfo>
-                <Points>{user.total_points} очков</Points>
+                <Points>{scoreLabel(user)}</Points>
               </LeaderboardItem>
             ))}
           </RestOfLeaderboard>
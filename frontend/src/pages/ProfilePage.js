@@ -252,7 +252,9 @@ function ProfilePage() {
     try {
       await api.post('/api/auth/change-password', {
         current_password: passwordData.current_password,
-        new_password: passwordData.new_password
+        new_password: passwordData.new_password,
+        // Сессия этого устройства сохраняется, остальные завершаются
+        refresh_token: localStorage.getItem('refresh_token')
       });
 
       toast.success('Пароль успешно изменен!');
@@ -225,29 +225,21 @@ function ProgressPage() {
   const [showTrickDetail, setShowTrickDetail] = useState(false);
   const [selectedTrick, setSelectedTrick] = useState(null);
 
-  const { data: userStats, isLoading: statsLoading } = useQuery(
+  // Статистика и изученные трюки одним запросом вместо двух
+  const { data: dashboard, isLoading: statsLoading } = useQuery(
     ['userStats', user?.id],
     async () => {
       if (!user?.id) return null;
-      const response = await api.get(`/api/users/${user.id}/stats`);
+      const response = await api.get(`/api/users/${user.id}/dashboard?include=stats,learned`);
       return response.data;
     },
     {
       enabled: !!user?.id
     }
   );
-
-  const { data: learnedTricks, isLoading: learnedTricksLoading } = useQuery(
-    ['learnedTricks', user?.id],
-    async () => {
-      if (!user?.id) return [];
-      const response = await api.get(`/api/users/${user.id}/learned-tricks`);
-      return response.data;
-    },
-    {
-      enabled: !!user?.id && showLearnedTricks
-    }
-  );
+  const userStats = dashboard?.stats;
+  const learnedTricks = dashboard?.learned;
+  const learnedTricksLoading = statsLoading;
 
   const handleLearnedTricksClick = () => {
     setShowLearnedTricks(true);
@@ -4,6 +4,7 @@ import styled from 'styled-components';
 import { motion } from 'framer-motion';
 import { Play, RotateCcw, Trophy, Target } from 'lucide-react';
 import api from '../api/axios';
+import { useAuth } from '../contexts/AuthContext';
 import toast from 'react-hot-toast';
 import TrickImage from '../components/TrickImage';
 
@@ -242,6 +243,7 @@ const categoryNames = {
 
 
 function QuizPage() {
+  const { user } = useAuth();
   const [selectedCategory, setSelectedCategory] = useState('');
   const [quizStarted, setQuizStarted] = useState(false);
   const [currentQuestion, setCurrentQuestion] = useState(null);
@@ -283,6 +285,13 @@ function QuizPage() {
     if (showAnswer) return;
     setSelectedAnswer(optionId);
     setShowAnswer(true);
+
+    if (user) {
+      // Статистика ответов для подбора вопросов; ошибка записи не мешает викторине
+      api.post('/api/quiz/answers', {
+        answers: [{ trick_id: currentQuestion.correct_answer_id, chosen_trick_id: optionId }],
+      }).catch(() => {});
+    }
     
     if (optionId === currentQuestion.correct_answer_id) {
       setScore(score + 1);
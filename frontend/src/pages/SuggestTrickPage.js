@@ -239,8 +239,15 @@ function SuggestTrickPage() {
   const suggestionMutation = useMutation(
     (suggestionData) => api.post('/api/suggestions/tricks', suggestionData),
     {
-      onSuccess: () => {
+      onSuccess: (response) => {
         toast.success('Предложение отправлено на модерацию!');
+        const duplicates = response.data.possible_duplicates || [];
+        if (duplicates.length > 0) {
+          toast(`Похожие трюки уже есть: ${duplicates.map(item => item.name).join(', ')}. Модератор проверит, не дубликат ли это.`, {
+            icon: '⚠️',
+            duration: 6000
+          });
+        }
         setFormData({
           name: '',
           category: '',
@@ -1,8 +1,9 @@
 import React, { useState } from 'react';
-import { useQuery } from 'react-query';
+import { useQuery, useQueryClient } from 'react-query';
 import styled from 'styled-components';
 import { motion } from 'framer-motion';
 import api from '../api/axios';
+import { fetchLearnedSet } from '../api/learnedSet';
 import TrickImage from '../components/TrickImage';
 import TrickDetailModal from '../components/TrickDetailModal';
 import { useAuth } from '../contexts/AuthContext';
@@ -137,6 +138,46 @@ const TrickCategory = styled.span`
   margin-bottom: 15px;
 `;
 
+const LearnedBadge = styled.span`
+  display: inline-block;
+  background: linear-gradient(135deg, #10B981, #059669);
+  color: white;
+  padding: 4px 12px;
+  border-radius: 15px;
+  font-size: 0.8rem;
+  font-weight: 500;
+  margin: 0 0 15px 8px;
+`;
+
+const Recommendations = styled.div`
+  background: rgba(255, 255, 255, 0.95);
+  border-radius: 20px;
+  padding: 20px 25px;
+  margin-bottom: 30px;
+  box-shadow: 0 10px 30px rgba(0, 0, 0, 0.1);
+`;
+
+const RecommendationsTitle = styled.h3`
+  color: #333;
+  margin-bottom: 12px;
+`;
+
+const RecommendationList = styled.div`
+  display: flex;
+  flex-wrap: wrap;
+  gap: 10px;
+`;
+
+const RecommendationChip = styled.button`
+  background: linear-gradient(135deg, #667eea, #764ba2);
+  color: white;
+  border: none;
+  border-radius: 20px;
+  padding: 8px 16px;
+  font-size: 0.9rem;
+  cursor: pointer;
+`;
+
 const TrickDescription = styled.p`
   color: #666;
   line-height: 1.6;
@@ -179,6 +220,7 @@ function TricksPage() {
   const [selectedTrick, setSelectedTrick] = useState(null);
   const [isModalOpen, setIsModalOpen] = useState(false);
   const { user, isAuthenticated } = useAuth();
+  const queryClient = useQueryClient();
 
   const { data: tricks, isLoading, error } = useQuery(
     ['tricks', selectedCategory],
@@ -191,6 +233,22 @@ function TricksPage() {
     }
   );
 
+  const { data: learnedSet } = useQuery(
+    ['learnedSet', user?.id],
+    () => fetchLearnedSet(user.id),
+    { enabled: !!user && isAuthenticated() }
+  );
+
+  // Рекомендации есть не всегда (снимок строится в фоне) - без повторов и тостов
+  const { data: recommendations } = useQuery(
+    ['recommendations', user?.id],
+    async () => {
+      const response = await api.get(`/api/users/${user.id}/recommendations?limit=6`);
+      return response.data;
+    },
+    { enabled: !!user && isAuthenticated(), retry: false }
+  );
+
   const { data: categories } = useQuery('categories', async () => {
     const response = await api.get('/api/categories');
     return response.data;
@@ -220,6 +278,8 @@ function TricksPage() {
     try {
       await api.post(`/api/users/${user.id}/progress/${trickId}`);
       toast.success('Трюк отмечен как изученный!');
+      queryClient.invalidateQueries(['learnedSet', user.id]);
+      queryClient.invalidateQueries(['recommendations', user.id]);
       handleCloseModal();
     } catch (error) {
       const message = error.response?.data?.detail || 'Ошибка при отметке трюка';
@@ -227,6 +287,10 @@ function TricksPage() {
     }
   };
 
+  const recommendedTricks = (recommendations || [])
+    .map(item => tricks?.find(trick => trick.id === item.trick_id))
+    .filter(Boolean);
+
   if (isLoading) {
     return (
       <Container>
@@ -274,6 +338,19 @@ function TricksPage() {
         </CategoryFilter>
       </FilterSection>
 
+      {!selectedCategory && !searchTerm && recommendedTricks.length > 0 && (
+        <Recommendations>
+          <RecommendationsTitle>Что изучить дальше</RecommendationsTitle>
+          <RecommendationList>
+            {recommendedTricks.map(trick => (
+              <RecommendationChip key={trick.id} onClick={() => handleTrickClick(trick)}>
+                {trick.name}
+              </RecommendationChip>
+            ))}
+          </RecommendationList>
+        </Recommendations>
+      )}
+
       <TricksGrid>
         {filteredTricks.map((trick, index) => (
           <TrickCard
@@ -291,6 +368,7 @@ function TricksPage() {
               <TrickCategory>
                 {categoryNames[trick.category] || trick.category}
               </TrickCategory>
+              {learnedSet?.has(trick.id) && <LearnedBadge>✓ Изучено</LearnedBadge>}
               <TrickDescription>{trick.description}</TrickDescription>
             </TrickContent>
           </TrickCard>
@@ -308,6 +386,8 @@ function TricksPage() {
         isOpen={isModalOpen}
         onClose={handleCloseModal}
         onMarkLearned={handleMarkLearned}
+        isLearned={!!selectedTrick && !!learnedSet?.has(selectedTrick.id)}
+        learnedSet={learnedSet}
       />
     </Container>
   );